@@ -12,6 +12,15 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
+def tool_command(binary: str) -> list:
+    """
+    Command prefix for an FFmpeg/FFprobe binary. Python scripts (the simulator
+    in app/sim) are started with the current interpreter.
+    """
+    if binary.endswith('.py'):
+        return [sys.executable, binary]
+    return [binary]
+
 class Config:
     """Application configuration and constants."""
     
@@ -43,6 +52,36 @@ class Config:
             # 4. Final fallback, just try the command "ffmpeg" and hope
             FFMPEG_BIN = "ffmpeg"
         
+    # FFprobe executable path (shipped next to FFmpeg, otherwise from PATH)
+    _probe_name = 'ffprobe.exe' if FFMPEG_BIN.lower().endswith('.exe') else 'ffprobe'
+    _local_probe = os.path.join(os.path.dirname(FFMPEG_BIN), _probe_name)
+    if os.path.dirname(FFMPEG_BIN) and os.path.exists(_local_probe):
+        FFPROBE_BIN = _local_probe
+    else:
+        import shutil
+        FFPROBE_BIN = shutil.which('ffprobe') or "ffprobe"
+
+    # Explicit overrides (e.g. the simulator: VIDEO_APP_FFMPEG=app/sim/fake_ffmpeg.py)
+    FFMPEG_BIN = os.environ.get('VIDEO_APP_FFMPEG') or FFMPEG_BIN
+    FFPROBE_BIN = os.environ.get('VIDEO_APP_FFPROBE') or FFPROBE_BIN
+
+    # Cache (probe results and other per-file metadata, keyed by file signature)
+    CACHE_DIR = os.path.join(os.path.expanduser("~"), ".video_app", "cache")
+    PROBE_CACHE_DIR = os.path.join(CACHE_DIR, "probe")
+
+    # Keyframe/Scene Index (binary sidecars next to the probe cache entries)
+    INDEX_SCENES = False                    # Also score scene changes (one downscaled decode)
+    INDEX_SCENE_THRESHOLD = 0.3             # Minimum scene score recorded as a cut
+    INDEX_SCENE_WIDTH = 160                 # Decode width for scene scoring
+    INDEX_WORKERS = 1                       # Background index builds at once (own pool, never the validation pool)
+
+    @classmethod
+    def use_simulator(cls):
+        """Point FFmpeg/FFprobe at the bundled stand-ins (app/sim) for orchestration load tests."""
+        sim_dir = os.path.join(cls.BASE_DIR, 'app', 'sim')
+        cls.FFMPEG_BIN = os.path.join(sim_dir, 'fake_ffmpeg.py')
+        cls.FFPROBE_BIN = os.path.join(sim_dir, 'fake_ffprobe.py')
+
     # Validation
     @classmethod
     def validate(cls):
@@ -61,6 +100,45 @@ class Config:
     NVENC_PRESET = 'p5'     # p1 (fastest) to p7 (slowest)
     DEFAULT_CQ = 28         # CQ for NVENC VBR
 
+    # Normalization (applied first in the filter chain; never upscales)
+    MAX_OUTPUT_HEIGHT = None    # e.g. 1080
+    MAX_OUTPUT_FPS = None       # e.g. 30
+
+    # Content Mode
+    CONTENT_MODE = 'default'                # 'default' or 'lecture' (slides/static content)
+    LECTURE_MPDECIMATE = 'hi=768:lo=320:frac=0.33:max=60'   # max: keep >= 1 frame per 60
+    LECTURE_GOP = 600                       # Frames (after duplicate dropping)
+    LECTURE_KEYFRAME_INTERVAL = 10          # Seconds; upper bound for seeking
+
+    # Preview Rendering
+    PREVIEW_WINDOW = 3.0            # Seconds per sample window
+    PREVIEW_NVENC_PRESET = 'p1'
+    PREVIEW_X265_PRESET = 'ultrafast'
+    PREVIEW_MAX_PARALLEL = 2        # Stay well below NVENC session limits
+
+    # Audio
+    AUDIO_POLICY = 'auto'                   # 'auto' | 'copy' | 'transcode'
+    AUDIO_CODEC = 'aac'                     # or 'libopus'
+    AUDIO_BITRATE = '128k'
+    AUDIO_MONO_BITRATE = '64k'
+    AUDIO_MONO = False                      # Downmix speech to mono
+    AUDIO_LOUDNORM = False                  # EBU R128 normalization (cached measurement)
+    AUDIO_SAMPLE_RATE = 48000               # Output rate after loudnorm when the source rate is unknown
+    LOUDNORM_TARGET = 'I=-16:TP=-1.5:LRA=11'
+    AUDIO_EFFICIENT_CODECS = ('aac', 'opus', 'mp3')
+
+    # Segmented Packaging (HLS/DASH)
+    SEGMENT_DURATION = 6    # Seconds; keyframes are forced on every boundary
+
+    # Subtitle Delivery
+    SUBTITLE_MODE = 'burn'              # 'burn' (into pixels) or 'mux' (selectable track)
+    SOFT_SUBTITLE_COPY_VIDEO = True     # In 'mux' mode, copy the video when no filter needs it
+    DEFAULT_SUBTITLE_LANGUAGE = 'ara'   # ISO 639-2 tag when the SRT name has no language suffix
+    SUBTITLE_LANGUAGES = {              # SRT name suffix -> ISO 639-2 tag
+        'ar': 'ara', 'ar_auto': 'ara', 'ara': 'ara',
+        'en': 'eng', 'eng': 'eng',
+    }
+
     # Subtitle Styles (SRT - Simple & Professional)
     # Noto Naskh Arabic is used in SRT mode to maintain simplicity while ensuring 
     # excellent Arabic legibility and BiDi support without ASS conversion.
@@ -78,6 +156,87 @@ class Config:
     # UI Behavior
     AUTO_REMOVE_AFTER_SUCCESS = True
 
+    # Output Validation
+    VALIDATION_WORKERS = 2              # Validate/commit off the encode thread
+    DURATION_TOLERANCE_SEC = 1.0        # Allowed |output - input| duration drift
+    DURATION_TOLERANCE_RATIO = 0.01     # ...or this fraction of the input, whichever is larger
+
+    # Read-ahead Prefetch (inputs on NAS/USB storage)
+    PREFETCH_ENABLED = False
+    PREFETCH_DIR = os.path.join(CACHE_DIR, "prefetch")
+    PREFETCH_MAX_BYTES = 20 * 1024 ** 3     # Local cache cap
+    PREFETCH_LOOKAHEAD = 2                  # Upcoming inputs copied ahead of the encoder
+
+    # Scheduling
+    MAX_CONCURRENT_JOBS = 1     # NVENC consumer cards limit concurrent sessions
+    PRIORITY_URGENT = 0         # Lower value runs first
+    PRIORITY_NORMAL = 10
+    PRIORITY_LOW = 20
+
+    # Persistent Job Queue
+    JOB_DB_PATH = os.path.join(os.path.expanduser("~"), ".video_app", "jobs.sqlite3")
+    JOB_MAX_ATTEMPTS = 3        # Interrupted runs before a job is marked failed
+
+    # Size/Time Prediction and Disk Admission
+    PREDICT_HISTORY_PATH = os.path.join(CACHE_DIR, "encode_history.json")
+    PREDICT_SAMPLE_SECONDS = 10             # Sample encode for unknown profiles; 0 disables
+    DISK_SAFETY_MARGIN = 1.2                # Reserve this multiple of the predicted output
+    DISK_RESERVE_BYTES = 1024 ** 3          # Always leave this much free
+
+    # Fragmented MP4 Output (readable while written; interrupted encodes resume)
+    FRAGMENTED_OUTPUT = False
+    FRAGMENT_FASTSTART = False              # Remux into a regular faststart MP4 before the commit
+    FRAGMENT_RESUME_MIN_SECONDS = 30        # Shorter leftovers are encoded again from the start
+
+    # S3-compatible Object Storage (s3://bucket/key inputs and outputs)
+    S3_ENDPOINT = os.environ.get('VIDEO_APP_S3_ENDPOINT')       # e.g. http://minio.local:9000
+    S3_ACCESS_KEY = os.environ.get('VIDEO_APP_S3_ACCESS_KEY')
+    S3_SECRET_KEY = os.environ.get('VIDEO_APP_S3_SECRET_KEY')
+    S3_REGION = os.environ.get('VIDEO_APP_S3_REGION') or 'us-east-1'
+    S3_MAX_CONNECTIONS = 8                  # Pooled keep-alive connections per client
+    S3_UPLOAD_CONCURRENCY = 4               # Parts in flight per upload
+    S3_PART_SIZE = 16 * 1024 * 1024         # Multipart part size (S3 minimum is 5 MiB)
+    S3_PRESIGN_EXPIRES = 6 * 3600           # Seconds FFmpeg may read the source URL
+
+    # Smart Re-render (subtitle corrections re-encode only the affected GOPs)
+    SMART_RENDER_KEEP_SOURCES = False       # Keep each clean source (hard link when possible)
+    SMART_RENDER_DIR = os.path.join(os.path.expanduser("~"), ".video_app", "sources")
+    SMART_RENDER_MAX_RATIO = 0.5            # Re-encode everything above this changed fraction
+
+    # Original Retention (backups of replaced originals and their SRTs)
+    RETENTION_ENABLED = False
+    RETENTION_DIR = os.path.join(os.path.expanduser("~"), ".video_app", "originals")  # Same volume = free links
+    RETENTION_MAX_AGE_DAYS = 30             # None keeps backups regardless of age
+    RETENTION_MAX_BYTES = None              # Cap on the whole tree; None = unbounded
+    RETENTION_RESCAN_INTERVAL = 3600        # Seconds between walks of the tree; commits update an index
+
+    # HTTP Job Service (python main.py --serve)
+    SERVICE_HOST = '127.0.0.1'
+    SERVICE_PORT = 8765
+    SERVICE_WORKERS = None                  # Concurrent encodes; None = MAX_CONCURRENT_JOBS
+    SERVICE_PROGRESS_INTERVAL = 1.0         # Seconds between coalesced progress events
+    SERVICE_CLIENT_QUEUE = 256              # Events buffered per SSE client; the oldest are dropped
+    SERVICE_MAX_CLIENTS = 1000              # Concurrent connections; more get 503
+    SERVICE_MAX_BODY = 64 * 1024
+    SERVICE_LOG_LEVEL = 'WARNING'           # Minimum level forwarded to clients as 'log' events
+    SERVICE_PROFILES = {                    # Named pipeline settings clients can request
+        'default': {},
+        'lecture': {'content_mode': 'lecture'},
+        '720p': {'max_height': 720},
+        'soft-subtitles': {'subtitle_mode': 'mux'},
+    }
+
+    # Stall Watchdog (a hung FFmpeg is killed and its job re-queued)
+    FFMPEG_STALL_TIMEOUT = 120  # Seconds without progress of an encode; None disables
+    FFMPEG_STALL_TIMEOUT_REMOTE = 600   # Same for remote (s3://, http://) inputs: slow opens and network hiccups
+
+    # Resource Telemetry (/proc sampling of FFmpeg children, Linux)
+    TELEMETRY_INTERVAL = 2.0    # Seconds between samples; None disables
+
+    # Thread Budgeting
+    THREADS_PER_JOB = None      # None = available cores / concurrent jobs
+    CPU_AFFINITY = False        # Pin each concurrent job to its own cores (Linux)
+
     @staticmethod
     def detect_nvenc_encoder() -> bool:
         """
@@ -88,7 +247,7 @@ class Config:
         try:
             # -encoders lists all available encoders
             result = subprocess.run(
-                [Config.FFMPEG_BIN, '-encoders'],
+                tool_command(Config.FFMPEG_BIN) + ['-encoders'],
                 capture_output=True,
                 text=True,
                 timeout=5
@@ -108,8 +267,7 @@ class Config:
         try:
             # Probe command: Generate 1 second of black video using hevc_nvenc
             # Resolution bumped to 640x360 to satisfy NVENC minimums (was 128x128)
-            cmd = [
-                Config.FFMPEG_BIN,
+            cmd = tool_command(Config.FFMPEG_BIN) + [
                 '-y',
                 '-f', 'lavfi', '-i', 'color=c=black:s=640x360:d=1',
                 '-c:v', 'hevc_nvenc',
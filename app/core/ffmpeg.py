@@ -1,101 +1,369 @@
+import asyncio
 import subprocess
 import logging
 import os
+import re
+import signal
 from typing import List
-from .config import Config
+from .config import Config, tool_command
+from .telemetry import ProcessTelemetry, telemetry_supported
 
 # Setup basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class FFmpegCancelledError(RuntimeError):
+    """Raised by the blocking API when a run is cancelled via FFmpegExecutor.cancel()."""
+    pass
+
+
+class FFmpegTimeoutError(RuntimeError):
+    """Raised when FFmpeg exceeds the allowed wall-clock time."""
+    pass
+
+
+class FFmpegStallError(RuntimeError):
+    """Raised when FFmpeg made no progress for the executor's stall_timeout and was killed."""
+    pass
+
+
+class ProgressParser:
+    """Turns FFmpeg stderr lines into a completion percentage."""
+
+    # Regex for Duration and Time
+    DURATION_PATTERN = re.compile(r"Duration: (\d{2}):(\d{2}):(\d{2})\.(\d{2})")
+    TIME_PATTERN = re.compile(r"time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})")
+    FRAME_PATTERN = re.compile(r"frame=\s*(\d+)")
+
+    def __init__(self):
+        self.total_seconds = None
+        self.current_seconds = None
+        self.frame = None
+
+    @property
+    def position(self) -> tuple:
+        """Latest (time, frame) reported; changes whenever the encode advances."""
+        return self.current_seconds, self.frame
+
+    def feed(self, line: str):
+        """Consume one line; return the new percentage (capped at 99) or None."""
+        # 1. Capture Duration
+        if not self.total_seconds:
+            match = self.DURATION_PATTERN.search(line)
+            if match:
+                h, m, s, cs = map(int, match.groups())
+                self.total_seconds = h * 3600 + m * 60 + s + cs / 100.0
+                logger.info(f"Video duration detected: {self.total_seconds}s")
+                return None
+
+        # 2. Capture Progress
+        match = self.FRAME_PATTERN.search(line)
+        if match:
+            self.frame = int(match.group(1))
+        match = self.TIME_PATTERN.search(line)
+        if match:
+            h, m, s, cs = map(int, match.groups())
+            self.current_seconds = h * 3600 + m * 60 + s + cs / 100.0
+            if self.total_seconds:
+                percent = (self.current_seconds / self.total_seconds) * 100
+                return min(percent, 99.0)  # Cap at 99 until done
+        return None
+
+
 class FFmpegExecutor:
-    """Wrapper for executing FFmpeg commands."""
-    
+    """
+    Wrapper for executing FFmpeg commands.
+    The core is asyncio-based so one event loop can supervise many children;
+    `run` is a blocking wrapper for existing callers.
+    """
+
+    # Seconds to wait after asking FFmpeg to quit before killing it
+    GRACE_PERIOD = 5.0
+    # Number of stderr lines kept for error reports
+    BUFFER_SIZE = 20
+
     def __init__(self, executable_path: str = None):
         self.executable = executable_path or Config.FFMPEG_BIN
+        # Most recently started child process (asyncio.subprocess.Process)
+        self.process = None
+        self.paused = False
+        # Optional ThreadBudget; its CPU set (if any) is applied to every child
+        self.thread_budget = None
+        # Tasks currently running on behalf of this executor, with their loops
+        self._active = set()
+        # Set by cancel(): later runs are refused, so a job between runs stays cancelled,
+        # until reset() when the owner starts its next job
+        self.cancelled = False
+        # Resource sampling of the child: live ProcessTelemetry, and the report of the last run
+        self.telemetry_interval = Config.TELEMETRY_INTERVAL
+        self.telemetry = None
+        self.last_report = None
+        # Optional BatchTelemetry that aggregates every run of this executor
+        self.batch_telemetry = None
+        # Seconds without time=/frame= advancing before the child is killed; None disables.
+        # Off by default: callers arm it per run for encodes (see VideoPipeline._encode), not remuxes
+        self.stall_timeout = None
+
+    def run(self, args: List[str], callback=None, timeout: float = None, stall_timeout: float = None,
+            output_callback=None) -> bool:
+        """
+        Run FFmpeg with the given arguments, blocking until it exits.
+        If callback is a function(percentage: float), it will be called with progress.
+        Must not be called from inside a running event loop; use run_async there.
+        """
+        try:
+            return asyncio.run(self.run_async(args, callback=callback, timeout=timeout,
+                                              output_callback=output_callback,
+                                              stall_timeout=stall_timeout))
+        except asyncio.CancelledError:
+            raise FFmpegCancelledError("FFmpeg run was cancelled.")
 
-    def run(self, args: List[str], callback=None) -> bool:
+    async def run_async(self, args: List[str], callback=None, timeout: float = None,
+                        output_callback=None, stall_timeout: float = None) -> bool:
+        """
+        Run FFmpeg without blocking the event loop.
+        - callback(percentage) receives progress.
+        - output_callback(line) receives every stderr line (for multiplexing logs).
+        - timeout bounds the wall-clock time; the child is then terminated.
+        - stall_timeout arms the stall watchdog for this run (default: self.stall_timeout).
+        Cancelling the awaiting task terminates the child gracefully, then forcefully.
         """
-        Run FFmpeg with the given arguments.
-        If callback is string function(percentage: float), it will be called with progress.
+        task = asyncio.current_task()
+        entry = (asyncio.get_running_loop(), task)
+        self._active.add(entry)
+        try:
+            # Checked after registering, so a concurrent cancel() is never missed
+            if self.cancelled:
+                raise FFmpegCancelledError("FFmpeg run was cancelled.")
+            stall_timeout = self.stall_timeout if stall_timeout is None else stall_timeout
+            if timeout is None:
+                return await self._execute(args, callback, output_callback, stall_timeout)
+            try:
+                return await asyncio.wait_for(self._execute(args, callback, output_callback, stall_timeout),
+                                              timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"FFmpeg exceeded timeout of {timeout}s")
+                raise FFmpegTimeoutError(f"FFmpeg timed out after {timeout}s")
+        finally:
+            self._active.discard(entry)
+
+    def cancel(self) -> None:
         """
-        command = [self.executable] + args
+        Thread-safe: cancel every run of this executor; children are terminated
+        and any later run raises FFmpegCancelledError.
+        """
+        self.cancelled = True
+        for loop, task in list(self._active):
+            loop.call_soon_threadsafe(task.cancel)
+
+    def reset(self) -> None:
+        """Accept runs again after cancel(), for the next job of a reused executor."""
+        self.cancelled = False
+
+    def pause(self) -> bool:
+        """
+        Suspend the running child (SIGSTOP). Encoder state stays in memory,
+        so resume() continues exactly where it stopped.
+        Returns False when suspending is unsupported (non-POSIX) or nothing is running.
+        """
+        if os.name != 'posix' or self.paused:
+            return False
+        process = self.process
+        if process is None or process.returncode is not None:
+            return False
+        try:
+            os.kill(process.pid, signal.SIGSTOP)
+        except ProcessLookupError:
+            return False
+        self.paused = True
+        logger.info(f"Paused FFmpeg (pid {process.pid})")
+        return True
+
+    def resume(self) -> bool:
+        """Continue a child suspended by pause() (SIGCONT)."""
+        if not self.paused:
+            return False
+        self.paused = False
+        process = self.process
+        if process is None or process.returncode is not None:
+            return False
+        try:
+            os.kill(process.pid, signal.SIGCONT)
+        except ProcessLookupError:
+            return False
+        logger.info(f"Resumed FFmpeg (pid {process.pid})")
+        return True
+
+    async def _execute(self, args: List[str], callback, output_callback, stall_timeout: float = None) -> bool:
+        command = tool_command(self.executable) + args
         logger.info(f"Running FFmpeg: {' '.join(command)}")
-        
-        # Regex for Duration and Time
-        import re
-        duration_pattern = re.compile(r"Duration: (\d{2}):(\d{2}):(\d{2})\.(\d{2})")
-        time_pattern = re.compile(r"time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})")
-        
-        total_seconds = None
-        
+
         try:
-            # We use Popen to read stderr (where ffmpeg logs) in real-time
-            process = subprocess.Popen(
-                command,
+            # stdin is a pipe so FFmpeg can be asked to quit cleanly with 'q'
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0,
-                encoding='utf-8',
-                errors='replace'
+                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
             )
-            
-            # Buffer for error logging
-            stderr_buffer = []
-            BUFFER_SIZE = 20
-
-            while True:
-                # Read line by line
-                output = process.stderr.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                
-                if output:
-                    output_clean = output.strip()
-                    # Log everything for debugging
-                    logger.info(f"FFmpeg Output: {output_clean}") 
-                    
-                    # Accumulate for error reporting
-                    stderr_buffer.append(output_clean)
-                    if len(stderr_buffer) > BUFFER_SIZE:
-                        stderr_buffer.pop(0)
-
-                    # 1. Capture Duration
-                    if not total_seconds:
-                        match = duration_pattern.search(output)
-                        if match:
-                            h, m, s, cs = map(int, match.groups())
-                            total_seconds = h * 3600 + m * 60 + s + cs / 100.0
-                            logger.info(f"Video duration detected: {total_seconds}s")
-                            
-                    # 2. Capture Progress
-                    if total_seconds and callback:
-                        match = time_pattern.search(output)
-                        if match:
-                            h, m, s, cs = map(int, match.groups())
-                            current_seconds = h * 3600 + m * 60 + s + cs / 100.0
-                            percent = (current_seconds / total_seconds) * 100
-                            callback(min(percent, 99.0)) # Cap at 99 until done
-
-            # Ensure the process is fully finished and all buffers are flushed
-            process.stdout.close()
-            process.stderr.close()
-            process.wait()
-            
-            return_code = process.returncode
-            if return_code != 0:
-                # Check for error in buffer
-                error_log = "\n".join(stderr_buffer)
-                logger.error(f"FFmpeg failed with exit code {return_code}")
-                logger.error(f"Last stderr lines:\n{error_log}")
-                raise RuntimeError(f"FFmpeg failed (Code {return_code}):\n{error_log}")
-                
-            if callback:
-                callback(100.0)
-            return True
-
         except FileNotFoundError:
             logger.error(f"FFmpeg executable not found at {self.executable}")
             raise RuntimeError(f"FFmpeg executable not found at {self.executable}")
 
+        self.process = process
+        self.paused = False
+        if self.thread_budget:
+            # Threads FFmpeg creates later inherit the main thread's affinity
+            self.thread_budget.apply_affinity(process.pid)
+        parser = ProgressParser()
+        # Buffer for error logging
+        stderr_buffer = []
+
+        telemetry = sampler = None
+        if self.telemetry_interval and telemetry_supported():
+            telemetry = self.telemetry = ProcessTelemetry(process.pid)
+            if self.batch_telemetry:
+                self.batch_telemetry.start(id(telemetry), telemetry)
+            sampler = asyncio.ensure_future(self._sample(telemetry))
+        watchdog, stalled = None, asyncio.Event()
+        if stall_timeout:
+            watchdog = asyncio.ensure_future(self._watchdog(process, parser, stalled, stall_timeout))
+
+        try:
+            # stdout is unused, but it must be drained or the child can block on a full pipe
+            drain_task = asyncio.ensure_future(self._drain(process.stdout))
+
+            async for output_clean in self._read_lines(process.stderr):
+                # Log everything for debugging
+                logger.info(f"FFmpeg Output: {output_clean}")
+                if output_callback:
+                    output_callback(output_clean)
+
+                # Accumulate for error reporting
+                stderr_buffer.append(output_clean)
+                if len(stderr_buffer) > self.BUFFER_SIZE:
+                    stderr_buffer.pop(0)
+
+                percent = parser.feed(output_clean)
+                if percent is not None and callback:
+                    callback(percent)
+
+            # Ensure the process is fully finished and all buffers are flushed
+            await drain_task
+            if telemetry:
+                # stderr closed: the child is exiting; catch its final counters if still there
+                telemetry.sample()
+            return_code = await process.wait()
+        except BaseException:
+            # Cancellation, timeout or a failing callback: never leave an orphaned child
+            await self._terminate(process)
+            raise
+        finally:
+            if watchdog:
+                watchdog.cancel()
+            if sampler:
+                sampler.cancel()
+                self.last_report = telemetry.report()
+                if self.batch_telemetry:
+                    self.batch_telemetry.finish(id(telemetry), self.last_report)
+                logger.info(f"FFmpeg resources: {self.last_report}")
+
+        if stalled.is_set():
+            error_log = "\n".join(stderr_buffer)
+            raise FFmpegStallError(f"FFmpeg made no progress for {stall_timeout}s and was killed:\n{error_log}")
+
+        if return_code != 0:
+            # Check for error in buffer
+            error_log = "\n".join(stderr_buffer)
+            logger.error(f"FFmpeg failed with exit code {return_code}")
+            logger.error(f"Last stderr lines:\n{error_log}")
+            raise RuntimeError(f"FFmpeg failed (Code {return_code}):\n{error_log}")
+
+        if callback:
+            callback(100.0)
+        return True
+
+    async def _terminate(self, process) -> None:
+        """Ask FFmpeg to finish ('q' on stdin), then kill it after GRACE_PERIOD."""
+        if process.returncode is not None:
+            return
+        logger.warning(f"Terminating FFmpeg (pid {process.pid})")
+        # A suspended child can neither read 'q' nor exit cleanly
+        self.resume()
+        try:
+            process.stdin.write(b"q")
+            await process.stdin.drain()
+            process.stdin.close()
+        except (OSError, RuntimeError, ConnectionError):
+            pass
+        try:
+            await asyncio.wait_for(asyncio.shield(process.wait()), self.GRACE_PERIOD)
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            process.kill()
+        except ProcessLookupError:
+            return
+        logger.warning(f"FFmpeg (pid {process.pid}) did not exit in {self.GRACE_PERIOD}s; killed")
+        await process.wait()
+
+    async def _watchdog(self, process, parser: ProgressParser, stalled: asyncio.Event,
+                        stall_timeout: float) -> None:
+        """
+        Kill the child once neither time= nor frame= has advanced for
+        stall_timeout seconds (a dead mount, a hung driver). The clock stops
+        while the child is paused. `stalled` is set before the kill.
+        """
+        loop = asyncio.get_running_loop()
+        interval = min(stall_timeout / 4, 1.0)
+        position, idle, last = parser.position, 0.0, loop.time()
+        while process.returncode is None:
+            await asyncio.sleep(interval)
+            now = loop.time()
+            if parser.position != position:
+                position, idle = parser.position, 0.0
+            elif not self.paused:
+                idle += now - last
+            last = now
+            if idle >= stall_timeout:
+                logger.error(f"FFmpeg (pid {process.pid}) stalled: no progress for {idle:.0f}s")
+                stalled.set()
+                await self._terminate(process)
+                return
+
+    async def _sample(self, telemetry: ProcessTelemetry) -> None:
+        """Sample the child's /proc counters every `telemetry_interval` seconds."""
+        while True:
+            if telemetry.sample() is None:
+                return
+            if self.batch_telemetry:
+                self.batch_telemetry.update()
+            await asyncio.sleep(self.telemetry_interval)
+
+    @staticmethod
+    async def _read_lines(stream):
+        """
+        Yield decoded lines from a stream.
+        FFmpeg ends progress lines with '\\r', so both '\\r' and '\\n' terminate a line.
+        """
+        pending = b""
+        while True:
+            chunk = await stream.read(4096)
+            if not chunk:
+                break
+            pending += chunk
+            parts = re.split(rb"[\r\n]", pending)
+            pending = parts.pop()
+            for part in parts:
+                if part:
+                    yield part.decode('utf-8', errors='replace').strip()
+        if pending:
+            yield pending.decode('utf-8', errors='replace').strip()
+
+    @staticmethod
+    async def _drain(stream) -> None:
+        while await stream.read(65536):
+            pass
@@ -0,0 +1,218 @@
+"""
+Minimal reader for fragmented MP4 (ISO BMFF with an empty moov followed by
+moof/mdat pairs). Only box headers and the small moov/moof boxes are read, so
+a file can be checked in milliseconds, even while FFmpeg is still writing it.
+"""
+import os
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+# FFmpeg muxer flags for fragmented output: a fragment per keyframe, the moov
+# (track headers) up front, and offsets relative to each fragment
+FRAGMENT_MOVFLAGS = '+frag_keyframe+empty_moov+default_base_moof'
+
+FRAGMENTABLE_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+
+
+class FragmentScan:
+    """Tracks, fragment count and complete length of a fragmented MP4."""
+
+    def __init__(self):
+        # track_id -> {'handler', 'timescale', 'default_duration', 'samples', 'start', 'end'}
+        self.tracks = {}
+        self.fragmented = False
+        self.fragments = 0
+        # Bytes up to the end of the last complete moof+mdat pair (or the moov)
+        self.complete_size = 0
+        self.size = 0
+
+    def track_duration(self, track_id: int) -> float:
+        track = self.tracks[track_id]
+        if track['start'] is None or not track['timescale']:
+            return 0.0
+        return (track['end'] - track['start']) / track['timescale']
+
+    @property
+    def duration(self) -> float:
+        """Longest track, in seconds, counting complete fragments only."""
+        return max((self.track_duration(track_id) for track_id in self.tracks), default=0.0)
+
+    @property
+    def video_duration(self) -> float:
+        """
+        Video track length over complete fragments. Audio of the last fragment can
+        run past it, so this (not `duration`) is where a resumed encode continues.
+        Falls back to the longest track without video.
+        """
+        videos = [track_id for track_id, track in self.tracks.items() if track['handler'] == 'vide']
+        return self.track_duration(videos[0]) if videos else self.duration
+
+    @property
+    def streams(self) -> list:
+        """ffprobe-like stream list: codec_type and nb_read_packets per track."""
+        kinds = {'vide': 'video', 'soun': 'audio', 'subt': 'subtitle', 'text': 'subtitle'}
+        return [
+            {'index': n, 'codec_type': kinds.get(track['handler'], track['handler']),
+             'nb_read_packets': str(track['samples'])}
+            for n, track in enumerate(self.tracks.values())
+        ]
+
+    def __repr__(self):
+        return (f"FragmentScan({self.fragments} fragments, {self.duration:.2f}s, "
+                f"{self.complete_size}/{self.size} bytes complete)")
+
+
+def _boxes(f, start: int, end: int):
+    """Yield (type, box start, payload start, box end) for the boxes in [start, end)."""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        size, kind = struct.unpack('>I4s', f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - position  # Box runs to the end of the file
+        if size < header:
+            return
+        yield kind.decode('latin-1'), position, position + header, position + size
+        position += size
+
+
+def _read(f, offset: int, fmt: str) -> tuple:
+    f.seek(offset)
+    return struct.unpack(fmt, f.read(struct.calcsize(fmt)))
+
+
+def _parse_moov(f, scan: FragmentScan, start: int, end: int) -> None:
+    defaults = {}
+    for kind, _, payload, box_end in _boxes(f, start, end):
+        if kind == 'mvex':
+            scan.fragmented = True
+            for child, _, trex, _ in _boxes(f, payload, box_end):
+                if child == 'trex':
+                    _, track_id, _, default_duration = _read(f, trex, '>IIII')
+                    defaults[track_id] = default_duration
+        elif kind == 'trak':
+            track_id, handler, timescale = None, None, None
+            for child, _, child_payload, child_end in _boxes(f, payload, box_end):
+                if child == 'tkhd':
+                    version = _read(f, child_payload, '>B')[0]
+                    track_id = _read(f, child_payload + (20 if version == 1 else 12), '>I')[0]
+                elif child == 'mdia':
+                    for leaf, _, leaf_payload, _ in _boxes(f, child_payload, child_end):
+                        if leaf == 'mdhd':
+                            version = _read(f, leaf_payload, '>B')[0]
+                            timescale = _read(f, leaf_payload + (20 if version == 1 else 12), '>I')[0]
+                        elif leaf == 'hdlr':
+                            handler = _read(f, leaf_payload + 8, '>4s')[0].decode('latin-1')
+            if track_id is not None:
+                scan.tracks[track_id] = {'handler': handler, 'timescale': timescale, 'default_duration': 0,
+                                         'samples': 0, 'start': None, 'end': 0}
+    for track_id, default_duration in defaults.items():
+        if track_id in scan.tracks:
+            scan.tracks[track_id]['default_duration'] = default_duration
+
+
+def _parse_moof(f, scan: FragmentScan, start: int, end: int) -> list:
+    """Per-track (track_id, base decode time, total duration, sample count) of one fragment."""
+    runs = []
+    for kind, _, payload, box_end in _boxes(f, start, end):
+        if kind != 'traf':
+            continue
+        track_id, base_time, default_duration, duration, samples = None, None, 0, 0, 0
+        for child, _, child_payload, _ in _boxes(f, payload, box_end):
+            if child == 'tfhd':
+                flags, track_id = _read(f, child_payload, '>II')
+                flags &= 0xFFFFFF
+                track = scan.tracks.get(track_id)
+                default_duration = track['default_duration'] if track else 0
+                offset = child_payload + 8
+                offset += 8 if flags & 0x01 else 0
+                offset += 4 if flags & 0x02 else 0
+                if flags & 0x08:
+                    default_duration = _read(f, offset, '>I')[0]
+            elif child == 'tfdt':
+                version = _read(f, child_payload, '>B')[0]
+                base_time = _read(f, child_payload + 4, '>Q' if version == 1 else '>I')[0]
+            elif child == 'trun':
+                flags, count = _read(f, child_payload, '>II')
+                flags &= 0xFFFFFF
+                offset = child_payload + 8
+                offset += 4 if flags & 0x001 else 0
+                offset += 4 if flags & 0x004 else 0
+                samples += count
+                if flags & 0x100:
+                    fields = sum(4 for bit in (0x100, 0x200, 0x400, 0x800) if flags & bit)
+                    f.seek(offset)
+                    table = f.read(fields * count)
+                    duration += sum(struct.unpack_from('>I', table, n * fields)[0] for n in range(count))
+                else:
+                    duration += default_duration * count
+        if track_id is not None:
+            runs.append((track_id, base_time, duration, samples))
+    return runs
+
+
+def scan(path: str) -> FragmentScan:
+    """
+    Walk the top-level boxes of `path`. A trailing box that is cut short (the
+    fragment being written, or the one a crash interrupted) is not counted.
+    """
+    result = FragmentScan()
+    result.size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        pending = None
+        for kind, start, payload, end in _boxes(f, 0, result.size):
+            if end > result.size:
+                break
+            if kind == 'moov':
+                _parse_moov(f, result, payload, end)
+                result.complete_size = end
+            elif kind == 'moof':
+                pending = _parse_moof(f, result, payload, end)
+            elif kind == 'mdat' and pending is not None:
+                for track_id, base_time, duration, samples in pending:
+                    track = result.tracks.get(track_id)
+                    if track is None:
+                        continue
+                    if base_time is None:
+                        base_time = track['end']
+                    if track['start'] is None:
+                        track['start'] = base_time
+                    track['end'] = max(track['end'], base_time + duration)
+                    track['samples'] += samples
+                result.fragments += 1
+                result.complete_size = end
+                pending = None
+    return result
+
+
+def is_fragmented(path: str) -> bool:
+    """Whether `path` is an MP4 with fragments (moov/mvex); False for anything else."""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(8)
+            if len(header) < 8 or header[4:8] != b'ftyp':
+                return False
+        return scan(path).fragmented
+    except (OSError, struct.error):
+        return False
+
+
+def truncate_incomplete(path: str) -> FragmentScan:
+    """
+    Cut an interrupted fragmented MP4 back to its last complete fragment, so it
+    is playable again. Returns the scan of the kept part.
+    """
+    result = scan(path)
+    if result.fragmented and result.complete_size < result.size:
+        logger.info(f"Truncating {os.path.basename(path)} to its last complete fragment "
+                    f"({result.complete_size} of {result.size} bytes, {result.duration:.2f}s)")
+        with open(path, 'r+b') as f:
+            f.truncate(result.complete_size)
+        result.size = result.complete_size
+    return result
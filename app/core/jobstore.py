@@ -0,0 +1,257 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from .config import Config
+from . import fmp4
+from .probe import get_duration, kept_duration
+from .retention import RetentionPolicy
+from .utils import find_srt_file, get_processing_path, safe_replace
+from .validation import check_output_structure
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input_path TEXT NOT NULL,
+    output_path TEXT,
+    logo_path TEXT,
+    priority INTEGER NOT NULL,
+    range_start REAL,
+    range_end REAL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    duration REAL,
+    estimate_bytes INTEGER,
+    estimate_seconds REAL,
+    estimate_source TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, priority, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_input ON jobs (input_path);
+"""
+
+
+class JobStore:
+    """
+    Durable job queue in SQLite, so a crash or reboot mid-batch loses nothing.
+    States: queued -> running -> validating -> committing -> done | failed.
+    Every state change is committed immediately; queries go through the
+    (state, priority, id) index, so large backlogs stay cheap to scan.
+    """
+
+    STATES = ("queued", "running", "validating", "committing", "done", "failed")
+    ACTIVE_STATES = ("running", "validating", "committing")
+
+    def __init__(self, path: str = None):
+        self.path = path or Config.JOB_DB_PATH
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # One connection shared by the UI, scheduler and validation threads
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._migrate()
+        # Recovery commits back up the original like VideoPipeline._finalize does
+        self.retention = RetentionPolicy() if Config.RETENTION_ENABLED else None
+
+    # --- Queue ---
+
+    def add(self, input_path: str, output_path: str = None, logo_path: str = None,
+            priority: int = None, start: float = None, end: float = None) -> int:
+        """Queue one job; returns its id."""
+        return self.add_many([input_path], output_path=output_path, logo_path=logo_path,
+                             priority=priority, start=start, end=end)[0]
+
+    def add_many(self, input_paths: list, output_path: str = None, logo_path: str = None,
+                 priority: int = None, start: float = None, end: float = None) -> list:
+        """Queue many jobs in a single transaction; returns their ids."""
+        now = time.time()
+        priority = Config.PRIORITY_NORMAL if priority is None else priority
+        ids = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for input_path in input_paths:
+                    cursor = self._conn.execute(
+                        "INSERT INTO jobs (input_path, output_path, logo_path, priority, range_start, range_end,"
+                        " state, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+                        (os.path.abspath(input_path), output_path, logo_path, priority, start, end, now, now)
+                    )
+                    ids.append(cursor.lastrowid)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return ids
+
+    def mark(self, job_id: int, state: str, error: str = None) -> None:
+        """
+        Record a state change. Entering 'running' counts an attempt and restarts
+        the timer; 'done'/'failed' stamp the finish time.
+        """
+        if state not in self.STATES:
+            raise ValueError(f"Unknown job state: {state}")
+        now = time.time()
+        sql = "UPDATE jobs SET state = ?, error = ?, updated_at = ?"
+        params = [state, error, now]
+        if state == "running":
+            sql += ", attempts = attempts + 1, started_at = ?, finished_at = NULL"
+            params.append(now)
+        elif state in ("done", "failed"):
+            sql += ", finished_at = ?"
+            params.append(now)
+        with self._lock:
+            self._conn.execute(sql + " WHERE id = ?", params + [job_id])
+
+    def remove(self, job_id: int) -> bool:
+        """Drop a job that has not started yet."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM jobs WHERE id = ? AND state = 'queued'", (job_id,))
+        return cursor.rowcount > 0
+
+    def annotate(self, job_id: int, duration: float = None, estimate_bytes: int = None,
+                 estimate_seconds: float = None, estimate_source: str = None) -> None:
+        """Record a job's probed duration and its estimate, so restoring it needs neither again."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET duration = ?, estimate_bytes = ?, estimate_seconds = ?, estimate_source = ?"
+                " WHERE id = ?", (duration, estimate_bytes, estimate_seconds, estimate_source, job_id)
+            )
+
+    # --- Queries ---
+
+    def get(self, job_id: int) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def jobs(self, state: str = None, limit: int = None) -> list:
+        """Jobs in execution order (priority, then insertion), optionally of one state."""
+        sql, params = "SELECT * FROM jobs", []
+        if state:
+            sql += " WHERE state = ?"
+            params.append(state)
+        sql += " ORDER BY priority, id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def counts(self) -> dict:
+        """Number of jobs per state."""
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _migrate(self) -> None:
+        # Databases created before a column existed get it added (NULL = unknown)
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for name, kind in (("duration", "REAL"), ("estimate_bytes", "INTEGER"),
+                           ("estimate_seconds", "REAL"), ("estimate_source", "TEXT")):
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+
+    # --- Crash Recovery ---
+
+    def recover(self) -> dict:
+        """
+        Resolve jobs left running/validating/committing by a previous run.
+        - A complete temp output that still validates is committed (reused).
+        - A job caught mid-commit whose temp file is gone was already replaced: done.
+        - Anything else: the partial temp file is deleted (kept when it is a
+          fragmented MP4 the next run can resume) and the job re-queued,
+          or failed once it has used up Config.JOB_MAX_ATTEMPTS.
+        Returns the number of jobs per outcome.
+        """
+        summary = {"committed": 0, "done": 0, "requeued": 0, "failed": 0}
+        placeholders = ", ".join("?" * len(self.ACTIVE_STATES))
+        with self._lock:
+            rows = [dict(row) for row in self._conn.execute(
+                f"SELECT * FROM jobs WHERE state IN ({placeholders}) ORDER BY id", self.ACTIVE_STATES
+            )]
+
+        for row in rows:
+            outcome = self._recover_job(row)
+            summary[outcome] += 1
+        if rows:
+            logger.info(f"Recovery: {len(rows)} interrupted jobs -> {summary}")
+        return summary
+
+    def _recover_job(self, row: dict) -> str:
+        input_path = row['input_path']
+        temp_output = get_processing_path(input_path)
+        name = os.path.basename(input_path)
+
+        if row['state'] in ("validating", "committing") and os.path.exists(temp_output):
+            try:
+                expected = kept_duration(get_duration(input_path), row['range_start'], row['range_end'])
+                if check_output_structure(temp_output, expected_duration=expected):
+                    logger.info(f"Recovery: reusing finished encode of {name}")
+                    self.mark(row['id'], "committing")
+                    self._commit(input_path, temp_output)
+                    self.mark(row['id'], "done")
+                    return "committed"
+            except Exception as e:
+                logger.warning(f"Recovery: could not reuse {temp_output}: {e}")
+
+        elif row['state'] == "committing" and os.path.exists(input_path):
+            # os.replace is atomic: no temp file left means the swap happened
+            logger.info(f"Recovery: {name} was committed before the interruption")
+            self._remove_srt(input_path)
+            self.mark(row['id'], "done")
+            return "done"
+
+        exhausted = row['attempts'] >= Config.JOB_MAX_ATTEMPTS
+        if os.path.exists(temp_output) and not exhausted and self._resumable(row, temp_output):
+            logger.info(f"Recovery: keeping the complete fragments of {temp_output} to resume from")
+        elif os.path.exists(temp_output):
+            logger.info(f"Recovery: removing partial output {temp_output}")
+            try:
+                os.remove(temp_output)
+            except OSError as e:
+                logger.warning(f"Recovery: could not remove {temp_output}: {e}")
+
+        if exhausted:
+            self.mark(row['id'], "failed", f"Interrupted {row['attempts']} times")
+            return "failed"
+        self.mark(row['id'], "queued", row['error'])
+        return "requeued"
+
+    @staticmethod
+    def _resumable(row: dict, temp_output: str) -> bool:
+        # VideoPipeline resumes full-length fragmented encodes (see _resume_fragmented)
+        return (Config.FRAGMENTED_OUTPUT and row['range_start'] is None and row['range_end'] is None
+                and fmp4.is_fragmented(temp_output))
+
+    def _commit(self, input_path: str, temp_output: str) -> None:
+        backup = self.retention.preserve(input_path, find_srt_file(input_path)) if self.retention else None
+        try:
+            safe_replace(temp_output, input_path)
+        except Exception:
+            if backup:
+                self.retention.discard(backup)
+            raise
+        self._remove_srt(input_path)
+
+    @staticmethod
+    def _remove_srt(input_path: str) -> None:
+        # Same rule as VideoPipeline._finalize: the SRT goes once the output is in place
+        srt_path = find_srt_file(input_path)
+        if srt_path and os.path.exists(srt_path):
+            os.remove(srt_path)
@@ -0,0 +1,313 @@
+"""
+Keyframe and scene-cut index of a media file, kept as a binary sidecar in the
+probe cache (see probe.cache_path). A file is scanned once: keyframes come
+from the demuxer's packet flags (nothing is decoded); scene-change scores,
+when asked for, from one decode of a downscaled copy. Seeking, trimming and
+segment planning then look keyframes up instead of rereading the file.
+"""
+import os
+import re
+import sys
+import bisect
+import struct
+import asyncio
+import logging
+import subprocess
+import threading
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor
+from .config import Config, tool_command
+from .probe import file_signature, cache_path
+
+logger = logging.getLogger(__name__)
+
+# Sidecar layout (little-endian): header, then keyframe times (float64),
+# keyframe byte offsets (int64, -1 = unknown), scene times (float64), scene scores (float32)
+MAGIC = b"VIDX"
+VERSION = 2
+HEADER = struct.Struct("<4sHHIId")    # magic, version, flags, keyframe count, scene count, start time
+FLAG_SCENES = 1
+
+# In-memory layer on top of the sidecars, keyed by file signature
+_memory_cache = {}
+_cache_lock = threading.Lock()
+# Background builds in flight (see build_in_background), keyed by file signature, and their pool
+_pending = {}
+_pool = None
+
+
+class MediaIndex:
+    """
+    Sorted keyframe times/offsets and (optionally) scored scene cuts of one file.
+    Times are relative to the container's start time, like -ss and trim points.
+    """
+
+    def __init__(self, keyframes: array, offsets: array, scenes: array = None, scores: array = None,
+                 start_time: float = 0.0):
+        self.keyframes = keyframes
+        self.offsets = offsets
+        # Container start time (seconds) already subtracted from the keyframe times (TS often starts at 1.4)
+        self.start_time = start_time
+        # None until a scene scan ran; empty arrays mean no cut above the threshold
+        self.scenes = scenes
+        self.scores = scores
+
+    @property
+    def has_scenes(self) -> bool:
+        return self.scenes is not None
+
+    def keyframe_before(self, t: float) -> float | None:
+        """Last keyframe at or before `t` (where an input seek to `t` lands)."""
+        index = bisect.bisect_right(self.keyframes, t + 1e-6) - 1
+        return self.keyframes[index] if index >= 0 else None
+
+    def keyframe_after(self, t: float) -> float | None:
+        """First keyframe at or after `t`."""
+        index = bisect.bisect_left(self.keyframes, t - 1e-6)
+        return self.keyframes[index] if index < len(self.keyframes) else None
+
+    def is_keyframe(self, t: float, tolerance: float = 0.001) -> bool:
+        keyframe = self.keyframe_before(t + tolerance)
+        return keyframe is not None and abs(keyframe - t) <= tolerance
+
+    def snap(self, t: float, tolerance: float) -> float:
+        """The keyframe at or before `t` if it is at most `tolerance` earlier, else `t`."""
+        keyframe = self.keyframe_before(t)
+        return keyframe if keyframe is not None and t - keyframe <= tolerance else t
+
+    def offset_of(self, keyframe: float) -> int | None:
+        """Byte position of the keyframe packet at time `keyframe`, if the demuxer reported it."""
+        index = bisect.bisect_left(self.keyframes, keyframe - 1e-6)
+        if index < len(self.keyframes) and self.offsets[index] >= 0:
+            return self.offsets[index]
+        return None
+
+    def scene_cuts(self, min_score: float = 0.0) -> list:
+        """(time, score) of the scene cuts scoring at least `min_score`."""
+        if not self.has_scenes:
+            return []
+        return [(t, s) for t, s in zip(self.scenes, self.scores) if s >= min_score]
+
+    def to_bytes(self) -> bytes:
+        scenes = self.scenes if self.has_scenes else array('d')
+        scores = self.scores if self.has_scenes else array('f')
+        header = HEADER.pack(MAGIC, VERSION, FLAG_SCENES if self.has_scenes else 0,
+                             len(self.keyframes), len(scenes), self.start_time)
+        return header + b"".join(_little_endian(a) for a in (self.keyframes, self.offsets, scenes, scores))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MediaIndex":
+        magic, version, flags, keyframe_count, scene_count, start_time = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a media index (or an unsupported version)")
+        arrays, position = [], HEADER.size
+        for typecode, count in (('d', keyframe_count), ('q', keyframe_count), ('d', scene_count), ('f', scene_count)):
+            values = array(typecode)
+            end = position + count * values.itemsize
+            if end > len(data):
+                raise ValueError("truncated media index")
+            values.frombytes(data[position:end])
+            if sys.byteorder == 'big':
+                values.byteswap()
+            arrays.append(values)
+            position = end
+        keyframes, offsets, scenes, scores = arrays
+        if not flags & FLAG_SCENES:
+            scenes = scores = None
+        return cls(keyframes, offsets, scenes, scores, start_time)
+
+    def __repr__(self):
+        scenes = f", {len(self.scenes)} scene cuts" if self.has_scenes else ""
+        return f"MediaIndex({len(self.keyframes)} keyframes{scenes})"
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def get_index(path: str, scenes: bool = False) -> MediaIndex:
+    """
+    Index of `path`, from memory, its sidecar, or a scan (which is then stored).
+    `scenes=True` adds scene scores to an index that lacks them.
+    """
+    signature = file_signature(path)
+    with _cache_lock:
+        index = _memory_cache.get(signature)
+    if index is None:
+        index = _load(signature)
+    if index is not None and (index.has_scenes or not scenes):
+        return index
+
+    if index is None:
+        logger.info(f"Indexing keyframes of {path}")
+        keyframes, offsets, start_time = scan_keyframes(path)
+        index = MediaIndex(keyframes, offsets, start_time=start_time)
+    if scenes:
+        logger.info(f"Scoring scene changes of {path}")
+        index.scenes, index.scores = scan_scenes(path)
+    _store(signature, index)
+    return index
+
+
+def cached_index(path: str) -> MediaIndex | None:
+    """Index of `path` from memory or its sidecar only; None instead of a scan."""
+    signature = file_signature(path)
+    with _cache_lock:
+        index = _memory_cache.get(signature)
+    return index if index is not None else _load(signature)
+
+
+def build_in_background(path: str, scenes: bool = False) -> Future:
+    """
+    Run get_index(path, scenes) on the index pool, so callers that must not
+    wait for a scan find the index cached next time. The pool is separate
+    from the validation pool: a long scene decode never delays a commit.
+    At most one build per file is in flight; failures are logged, not raised.
+    """
+    global _pool
+    signature = file_signature(path)
+    with _cache_lock:
+        future = _pending.get(signature)
+        if future is not None:
+            return future
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=Config.INDEX_WORKERS, thread_name_prefix="index")
+        future = _pending[signature] = _pool.submit(_build, path, scenes)
+    # Outside the lock: an already finished future runs the callback right here
+    future.add_done_callback(lambda _: _forget(signature))
+    return future
+
+
+def _build(path: str, scenes: bool) -> MediaIndex | None:
+    try:
+        return get_index(path, scenes=scenes)
+    except (OSError, RuntimeError) as e:
+        logger.warning(f"Background indexing of {path} failed: {e}")
+        return None
+
+
+def _forget(signature: str) -> None:
+    with _cache_lock:
+        _pending.pop(signature, None)
+
+
+def _load(signature: str) -> MediaIndex | None:
+    entry = cache_path(signature, ".idx")
+    if not os.path.exists(entry):
+        return None
+    try:
+        with open(entry, 'rb') as f:
+            index = MediaIndex.from_bytes(f.read())
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Ignoring unreadable index {entry}: {e}")
+        return None
+    with _cache_lock:
+        _memory_cache[signature] = index
+    return index
+
+
+def _store(signature: str, index: MediaIndex) -> None:
+    with _cache_lock:
+        _memory_cache[signature] = index
+    entry = cache_path(signature, ".idx")
+    try:
+        # Written aside, then renamed: readers never see a partial sidecar
+        with open(entry + ".tmp", 'wb') as f:
+            f.write(index.to_bytes())
+        os.replace(entry + ".tmp", entry)
+    except OSError as e:
+        logger.warning(f"Could not write index {entry}: {e}")
+
+
+def scan_keyframes(path: str) -> tuple:
+    """
+    (times, byte offsets, start time) of the video keyframes of `path`, sorted
+    by time. Times are shifted by the container's start time so they match
+    seek positions. Reads packet flags from the demuxer only; nothing is decoded.
+    """
+    cmd = tool_command(Config.FFPROBE_BIN) + [
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,pos,flags:format=start_time',
+        '-of', 'csv=p=0',
+        path
+    ]
+    try:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=300,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+    except FileNotFoundError:
+        raise RuntimeError(f"FFprobe executable not found at {Config.FFPROBE_BIN}")
+    if result.returncode != 0:
+        raise RuntimeError(f"FFprobe failed for {path}:\n{result.stderr.strip()}")
+
+    keyframes, start_time = [], 0.0
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) == 1:
+            # The format section follows the packets: its start_time, or 'N/A'
+            try:
+                start_time = float(fields[0])
+            except ValueError:
+                pass
+            continue
+        if len(fields) < 3 or 'K' not in fields[2]:
+            continue
+        try:
+            pts_time = float(fields[0])
+        except ValueError:
+            continue  # 'N/A' timestamps
+        try:
+            pos = int(fields[1])
+        except ValueError:
+            pos = -1
+        keyframes.append((pts_time, pos))
+    keyframes.sort()
+    return (array('d', (t - start_time for t, _ in keyframes)), array('q', (pos for _, pos in keyframes)),
+            start_time)
+
+
+SCENE_TIME_PATTERN = re.compile(r"pts_time:(-?[\d.]+)")
+SCENE_SCORE_PATTERN = re.compile(r"lavfi\.scene_score=([\d.]+)")
+
+
+def scan_scenes(path: str, threshold: float = None, width: int = None) -> tuple:
+    """
+    (times, scores) of the scene changes of `path` scoring above `threshold`.
+    Decodes the video once, downscaled to `width` so scoring stays cheap.
+    """
+    from .ffmpeg import FFmpegExecutor
+
+    threshold = Config.INDEX_SCENE_THRESHOLD if threshold is None else threshold
+    width = width or Config.INDEX_SCENE_WIDTH
+    times, scores = array('d'), array('f')
+    pending = []
+
+    def collect(line):
+        # metadata=print logs the frame's pts_time, then each of its tags. Without
+        # -copyts FFmpeg has already rebased it to the input's start time, like the keyframes
+        match = SCENE_TIME_PATTERN.search(line)
+        if match:
+            pending[:] = [float(match.group(1))]
+            return
+        match = SCENE_SCORE_PATTERN.search(line)
+        if match and pending:
+            times.append(pending.pop())
+            scores.append(float(match.group(1)))
+
+    args = [
+        '-hide_banner', '-i', path, '-map', '0:v:0', '-an', '-sn',
+        '-vf', f"scale={width}:-2,select='gt(scene,{threshold})',metadata=print",
+        '-f', 'null', '-'
+    ]
+    asyncio.run(FFmpegExecutor().run_async(args, output_callback=collect))
+    return times, scores
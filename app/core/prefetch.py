@@ -0,0 +1,181 @@
+import os
+import logging
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from .config import Config
+from .utils import find_srt_file, ensure_directory
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    """One cached file: where it lives locally and what it was copied from."""
+
+    def __init__(self, source: str, local: str, size: int, mtime_ns: int):
+        self.source = source
+        self.local = local
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.ready = threading.Event()
+        self.failed = False
+        self.pins = 0           # Active readers; pinned entries are never evicted
+
+
+class PrefetchCache:
+    """
+    Read-ahead of upcoming inputs (and their SRTs) from slow storage into a
+    bounded local cache while the current job encodes.
+
+    A single background thread copies files one after another with large
+    sequential reads, so the slow device streams at full bandwidth instead of
+    interleaving random reads with the encoder. The cache is capped in bytes
+    and evicts least-recently-used, unpinned entries.
+    """
+
+    CHUNK_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None, lookahead: int = None):
+        self.cache_dir = cache_dir or Config.PREFETCH_DIR
+        self.max_bytes = max_bytes or Config.PREFETCH_MAX_BYTES
+        self.lookahead = lookahead or Config.PREFETCH_LOOKAHEAD
+        ensure_directory(self.cache_dir)
+
+        self._entries = OrderedDict()   # source path -> _Entry, in LRU order
+        self._pending = deque()         # sources waiting for the copy thread
+        self._used_bytes = 0
+        self._lock = threading.Condition()
+        self._worker = None
+
+    # --- Public API ---
+
+    def schedule(self, video_paths: list) -> None:
+        """Queue the next inputs (at most `lookahead`) and their subtitles for prefetch."""
+        sources = []
+        for video_path in video_paths[:self.lookahead]:
+            sources.append(os.path.abspath(video_path))
+            srt_path = find_srt_file(video_path)
+            if srt_path:
+                sources.append(os.path.abspath(srt_path))
+
+        with self._lock:
+            for source in sources:
+                if source not in self._entries and source not in self._pending:
+                    self._pending.append(source)
+            if self._pending and (self._worker is None or not self._worker.is_alive()):
+                self._worker = threading.Thread(target=self._copy_loop, name="prefetch", daemon=True)
+                self._worker.start()
+
+    def fetch(self, path: str) -> str:
+        """
+        Return the local copy of `path` (waiting for an in-flight copy), pinning it
+        until release(). Falls back to the original path if it was not prefetched.
+        """
+        source = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(source)
+            if entry is None:
+                return path
+            entry.pins += 1
+            self._entries.move_to_end(source)
+
+        entry.ready.wait()
+        if entry.failed or not self._is_fresh(entry):
+            self.release(path, discard=True)
+            return path
+        logger.info(f"Prefetch: reading {os.path.basename(source)} from local cache")
+        return entry.local
+
+    def release(self, path: str, discard: bool = False) -> None:
+        """Unpin a fetched file; `discard` drops it (e.g. the original was replaced)."""
+        source = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(source)
+            if entry is None:
+                return
+            entry.pins = max(entry.pins - 1, 0)
+            if discard and entry.pins == 0 and entry.ready.is_set():
+                self._remove(entry)
+            self._lock.notify_all()
+
+    @property
+    def used_bytes(self) -> int:
+        with self._lock:
+            return self._used_bytes
+
+    # --- Internals ---
+
+    def _copy_loop(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                source = self._pending.popleft()
+                try:
+                    st = os.stat(source)
+                except OSError as e:
+                    logger.warning(f"Prefetch: cannot stat {source}: {e}")
+                    continue
+                if st.st_size > self.max_bytes:
+                    logger.info(f"Prefetch: {os.path.basename(source)} exceeds the cache size; read in place")
+                    continue
+                # Make room, waiting for readers to unpin if the cache is full of in-use files
+                while self._used_bytes + st.st_size > self.max_bytes:
+                    if not self._evict_one():
+                        self._lock.wait(timeout=1.0)
+                entry = _Entry(source, self._local_path(source), st.st_size, st.st_mtime_ns)
+                self._entries[source] = entry
+                self._used_bytes += entry.size
+
+            self._copy(entry)
+
+    def _copy(self, entry: _Entry) -> None:
+        temp_path = entry.local + ".part"
+        try:
+            with open(entry.source, 'rb') as src, open(temp_path, 'wb') as dst:
+                while True:
+                    chunk = src.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+            os.replace(temp_path, entry.local)
+            logger.info(f"Prefetch: cached {os.path.basename(entry.source)} ({entry.size / 1048576:.1f} MB)")
+        except OSError as e:
+            logger.warning(f"Prefetch: copy of {entry.source} failed: {e}")
+            entry.failed = True
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        finally:
+            entry.ready.set()
+
+    def _evict_one(self) -> bool:
+        """Drop the least-recently-used entry that is complete and unpinned."""
+        for entry in list(self._entries.values()):
+            if entry.pins == 0 and entry.ready.is_set():
+                self._remove(entry)
+                return True
+        return False
+
+    def _remove(self, entry: _Entry) -> None:
+        self._entries.pop(entry.source, None)
+        self._used_bytes -= entry.size
+        try:
+            os.remove(entry.local)
+        except OSError:
+            pass
+
+    def _local_path(self, source: str) -> str:
+        # Keep the extension: FFmpeg and the subtitles filter pick demuxers by name
+        digest = hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+        name, ext = os.path.splitext(os.path.basename(source))
+        return os.path.join(self.cache_dir, f"{digest}_{name}{ext}")
+
+    @staticmethod
+    def _is_fresh(entry: _Entry) -> bool:
+        try:
+            st = os.stat(entry.source)
+        except OSError:
+            return False
+        return st.st_size == entry.size and st.st_mtime_ns == entry.mtime_ns
@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+import logging
+import subprocess
+import threading
+from .config import Config, tool_command
+
+logger = logging.getLogger(__name__)
+
+# In-memory layer on top of the on-disk probe cache
+_memory_cache = {}
+_cache_lock = threading.Lock()
+
+
+def file_signature(path: str) -> str:
+    """
+    Identify a file's content cheaply: absolute path + size + mtime.
+    Any rewrite of the file (e.g. our own atomic replace) changes the signature.
+    """
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def cache_path(signature: str, suffix: str) -> str:
+    """Path of a per-file cache entry (e.g. '.json' probe data, '.idx' sidecars)."""
+    os.makedirs(Config.PROBE_CACHE_DIR, exist_ok=True)
+    return os.path.join(Config.PROBE_CACHE_DIR, f"{signature}{suffix}")
+
+
+def probe_media(path: str, use_cache: bool = True) -> dict:
+    """
+    Return ffprobe's format and stream information for `path`.
+    Results are cached on disk by file signature, so a file is probed once.
+    URLs (e.g. presigned object storage reads) are probed every time.
+    """
+    use_cache = use_cache and "://" not in path
+    signature = file_signature(path) if use_cache else None
+
+    if use_cache:
+        with _cache_lock:
+            if signature in _memory_cache:
+                return _memory_cache[signature]
+        entry = cache_path(signature, ".json")
+        if os.path.exists(entry):
+            try:
+                with open(entry, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+                with _cache_lock:
+                    _memory_cache[signature] = info
+                return info
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable probe cache entry {entry}: {e}")
+
+    cmd = tool_command(Config.FFPROBE_BIN) + [
+        '-v', 'error',
+        '-print_format', 'json',
+        '-show_format',
+        '-show_streams',
+        path
+    ]
+    try:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=60,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+    except FileNotFoundError:
+        raise RuntimeError(f"FFprobe executable not found at {Config.FFPROBE_BIN}")
+    if result.returncode != 0:
+        raise RuntimeError(f"FFprobe failed for {path}:\n{result.stderr.strip()}")
+
+    info = json.loads(result.stdout or "{}")
+
+    if use_cache:
+        with _cache_lock:
+            _memory_cache[signature] = info
+        try:
+            with open(cache_path(signature, ".json"), 'w', encoding='utf-8') as f:
+                json.dump(info, f)
+        except OSError as e:
+            logger.warning(f"Could not write probe cache for {path}: {e}")
+    return info
+
+
+def get_duration(path: str) -> float | None:
+    """Container duration in seconds, or None if unknown."""
+    return duration_of(probe_media(path))
+
+
+def duration_of(info: dict) -> float | None:
+    """Container duration of a probe result, or None if unknown."""
+    duration = info.get('format', {}).get('duration')
+    try:
+        return float(duration)
+    except (TypeError, ValueError):
+        return None
+
+
+def kept_duration(duration: float = None, start: float = None, end: float = None) -> float | None:
+    """Length of the range [start, end) clipped to `duration`; None if it cannot be known."""
+    if duration is not None:
+        end = duration if end is None else min(end, duration)
+    if end is None:
+        return None
+    return max(end - (start or 0.0), 0.0)
+
+
+def get_video_stream(info: dict) -> dict | None:
+    """First video stream of a probe result (cover art excluded)."""
+    for stream in info.get('streams', []):
+        if stream.get('codec_type') == 'video' and not stream.get('disposition', {}).get('attached_pic'):
+            return stream
+    return None
+
+
+def get_audio_streams(info: dict) -> list:
+    """All audio streams of a probe result."""
+    return [s for s in info.get('streams', []) if s.get('codec_type') == 'audio']
+
+
+def probe_keyframes(path: str) -> list:
+    """
+    Presentation times (seconds, sorted) of the video keyframes of `path`.
+    Served from the file's keyframe index (see media_index), so the demuxer
+    scan runs once per file version.
+    """
+    from .media_index import get_index
+    return list(get_index(path).keyframes)
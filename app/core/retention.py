@@ -0,0 +1,187 @@
+import os
+import re
+import time
+import shutil
+import logging
+import threading
+from .config import Config
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ioctl(dest_fd, FICLONE, src_fd) from linux/fs.h: share the source's extents (btrfs, XFS)
+FICLONE = 0x40049409
+
+
+def reflink(src: str, dst: str) -> bool:
+    """Copy-on-write clone of `src` at `dst`; False where the filesystem cannot clone."""
+    if fcntl is None:
+        return False
+    with open(src, 'rb') as source:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            fcntl.ioctl(fd, FICLONE, source.fileno())
+        except OSError:
+            os.close(fd)
+            os.remove(dst)
+            return False
+        os.close(fd)
+    shutil.copystat(src, dst)
+    return True
+
+
+def clone_file(src: str, dst: str) -> str:
+    """
+    Keep the content of `src` at `dst` as cheaply as the filesystem allows:
+    a reflink (no data written), else a hard link (safe as long as `src` is
+    only ever replaced by rename, as safe_replace does), else a full copy.
+    Returns the method used: 'reflink', 'hardlink' or 'copy'.
+    """
+    if reflink(src, dst):
+        return "reflink"
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        shutil.copy2(src, dst)
+        return "copy"
+
+
+class Backup:
+    """One preserved original (and its SRT) in the retention tree."""
+
+    def __init__(self, path: str, created: float, size: int):
+        self.path = path
+        self.created = created
+        self.size = size
+
+    def __repr__(self):
+        return f"Backup({self.path!r}, {self.size / 1048576:.1f} MB)"
+
+
+class RetentionPolicy:
+    """
+    Keeps the original of every committed video (and the SRT that is deleted
+    with it) before it is replaced, in a tree mirroring the source paths:
+        <root>/<source dir>/<file name>/<YYYYmmdd-HHMMSS>/<file name>
+    With the tree on the same btrfs/XFS or ext4 volume as the videos, a backup
+    costs a reflink or hard link instead of a copy. prune() drops backups older
+    than max_age_days, then the oldest ones until the tree fits in max_bytes;
+    the newest backup is always kept. It works on an index of the backups that
+    preserve() and discard() keep current; the tree itself is walked only when
+    the index is older than Config.RETENTION_RESCAN_INTERVAL (backups made by
+    another process, or removed by hand).
+    """
+
+    STAMP_FORMAT = "%Y%m%d-%H%M%S"
+    STAMP_PATTERN = re.compile(r"^(\d{8}-\d{6})(?:-\d+)?$")
+
+    def __init__(self, root: str = None, max_age_days: float = None, max_bytes: int = None):
+        self.root = root or Config.RETENTION_DIR
+        self.max_age_days = Config.RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        self.max_bytes = Config.RETENTION_MAX_BYTES if max_bytes is None else max_bytes
+        # Backup directory -> Backup; None until the first walk. Commits preserve and
+        # prune from several validation threads
+        self._index = None
+        self._scanned = 0.0
+        self._lock = threading.Lock()
+
+    def preserve(self, input_path: str, srt_path: str = None) -> str:
+        """Back up `input_path` (and `srt_path`) before it is replaced. Returns the backup directory."""
+        directory = self._new_backup_dir(input_path)
+        method = clone_file(input_path, os.path.join(directory, os.path.basename(input_path)))
+        if srt_path and os.path.exists(srt_path):
+            # Keep the file name: the subtitle language is read from it
+            clone_file(srt_path, os.path.join(directory, os.path.basename(srt_path)))
+        logger.info(f"Retention: kept original of {input_path} ({method}) in {directory}")
+        with self._lock:
+            if self._index is not None:
+                self._index[directory] = self._read_backup(directory, os.listdir(directory))
+        return directory
+
+    def discard(self, backup_dir: str) -> None:
+        """Drop a backup whose original was not replaced after all."""
+        shutil.rmtree(backup_dir, ignore_errors=True)
+        self._remove_empty_parents(backup_dir)
+        with self._lock:
+            if self._index is not None:
+                self._index.pop(backup_dir, None)
+
+    def backups(self) -> list:
+        """Every backup in the tree, oldest first (from the index, see the class docstring)."""
+        with self._lock:
+            if self._index is None or time.monotonic() - self._scanned >= Config.RETENTION_RESCAN_INTERVAL:
+                self._index = {backup.path: backup for backup in self._scan()}
+                self._scanned = time.monotonic()
+            found = list(self._index.values())
+        return sorted(found, key=lambda backup: (backup.created, backup.path))
+
+    def _scan(self) -> list:
+        """Walk the whole tree for backup directories."""
+        found = []
+        for directory, subdirs, files in os.walk(self.root):
+            backup = self._read_backup(directory, files)
+            if backup:
+                subdirs.clear()
+                found.append(backup)
+        return found
+
+    def _read_backup(self, directory: str, files: list) -> Backup | None:
+        match = self.STAMP_PATTERN.match(os.path.basename(directory))
+        if not match or not files:
+            return None
+        created = time.mktime(time.strptime(match.group(1), self.STAMP_FORMAT))
+        size = 0
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(directory, name))
+            except OSError:
+                pass
+        return Backup(directory, created, size)
+
+    def prune(self, now: float = None) -> list:
+        """Apply the age and size caps. Returns the removed backups."""
+        now = time.time() if now is None else now
+        backups = self.backups()
+        newest = backups[-1] if backups else None
+        removed = []
+        if self.max_age_days is not None:
+            cutoff = now - self.max_age_days * 86400
+            removed = [b for b in backups if b.created < cutoff and b is not newest]
+        kept = [b for b in backups if b not in removed]
+        if self.max_bytes is not None:
+            total = sum(b.size for b in kept)
+            while total > self.max_bytes and len(kept) > 1:
+                oldest = kept.pop(0)
+                total -= oldest.size
+                removed.append(oldest)
+
+        for backup in removed:
+            logger.info(f"Retention: pruning {backup}")
+            self.discard(backup.path)
+        return removed
+
+    def _new_backup_dir(self, input_path: str) -> str:
+        drive, path = os.path.splitdrive(os.path.abspath(input_path))
+        parent = os.path.join(self.root, drive.replace(":", ""), path.lstrip("\\/"))
+        stamp = time.strftime(self.STAMP_FORMAT)
+        directory, n = os.path.join(parent, stamp), 0
+        while os.path.exists(directory):
+            n += 1
+            directory = os.path.join(parent, f"{stamp}-{n}")
+        os.makedirs(directory)
+        return directory
+
+    def _remove_empty_parents(self, path: str) -> None:
+        root = os.path.abspath(self.root)
+        parent = os.path.dirname(os.path.abspath(path))
+        while parent != root and parent.startswith(root + os.sep):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                return
+            parent = os.path.dirname(parent)
@@ -0,0 +1,105 @@
+import re
+from collections import Counter
+from pathlib import Path
+
+TIMESTAMP_PATTERN = re.compile(
+    r"(\d{1,2}):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d{1,2}):(\d{2}):(\d{2})[,.](\d{3})"
+)
+
+
+class SubtitleCue:
+    """One SRT cue: start/end in seconds and its text lines."""
+
+    def __init__(self, start: float, end: float, text: str):
+        self.start = start
+        self.end = end
+        self.text = text
+
+    def __eq__(self, other):
+        return (isinstance(other, SubtitleCue)
+                and (self.start, self.end, self.text) == (other.start, other.end, other.text))
+
+    def __repr__(self):
+        return f"SubtitleCue({format_timestamp(self.start)} --> {format_timestamp(self.end)}, {self.text!r})"
+
+
+def parse_timestamp(h, m, s, ms) -> float:
+    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000.0
+
+
+def format_timestamp(seconds: float) -> str:
+    """Seconds -> 'HH:MM:SS,mmm'."""
+    total_ms = max(0, int(round(seconds * 1000)))
+    h, rem = divmod(total_ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
+
+
+def parse_srt(path: str) -> list:
+    """
+    Read an SRT file into a list of SubtitleCue.
+    Blocks without a valid timestamp line are skipped.
+    """
+    with open(Path(path), 'r', encoding='utf-8-sig') as f:
+        content = f.read().replace('\r\n', '\n')
+
+    cues = []
+    for block in re.split(r'\n\s*\n', content.strip()):
+        lines = block.strip().split('\n')
+        for i, line in enumerate(lines):
+            match = TIMESTAMP_PATTERN.search(line)
+            if match:
+                groups = match.groups()
+                cues.append(SubtitleCue(
+                    parse_timestamp(*groups[:4]),
+                    parse_timestamp(*groups[4:]),
+                    "\n".join(lines[i + 1:])
+                ))
+                break
+    return cues
+
+
+def write_srt(cues: list, path: str) -> str:
+    """Write cues as a renumbered SRT file."""
+    blocks = [
+        f"{n}\n{format_timestamp(cue.start)} --> {format_timestamp(cue.end)}\n{cue.text}"
+        for n, cue in enumerate(cues, start=1)
+    ]
+    with open(Path(path), 'w', encoding='utf-8') as f:
+        f.write("\n\n".join(blocks) + "\n")
+    return str(path)
+
+
+def slice_cues(cues: list, start: float, end: float = None) -> list:
+    """
+    Keep only the cues inside [start, end) and rebase them to start at 0:
+    cues outside the range are dropped, cues crossing an edge are clipped.
+    """
+    sliced = []
+    for cue in cues:
+        if cue.end <= start or (end is not None and cue.start >= end):
+            continue
+        cue_start = max(cue.start, start)
+        cue_end = min(cue.end, end) if end is not None else cue.end
+        sliced.append(SubtitleCue(cue_start - start, cue_end - start, cue.text))
+    return sliced
+
+
+def changed_ranges(old_cues: list, new_cues: list, merge_gap: float = 0.0) -> list:
+    """
+    Time ranges (start, end) where the two cue lists render differently, merged
+    and sorted. Wherever the visible text differs, some cue is present in only
+    one of the lists, so the spans of those cues cover every change.
+    """
+    old = Counter((cue.start, cue.end, cue.text) for cue in old_cues)
+    new = Counter((cue.start, cue.end, cue.text) for cue in new_cues)
+    spans = sorted((start, end) for start, end, _ in (old - new) + (new - old))
+
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1] + merge_gap:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
@@ -0,0 +1,445 @@
+"""
+S3-compatible object storage (AWS S3, MinIO, Ceph RGW) over plain http.client:
+Signature V4 signing, presigned URLs for FFmpeg's HTTP reader, ranged reads,
+and multipart uploads with bounded concurrency on a pooled set of connections.
+"""
+import os
+import hmac
+import queue
+import hashlib
+import logging
+import threading
+import http.client
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+
+
+class StorageError(RuntimeError):
+    """An object storage request failed; `status` is the HTTP status (None for connection errors)."""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+def is_remote(path: str) -> bool:
+    return isinstance(path, str) and path.startswith("s3://")
+
+
+def parse_s3_url(url: str) -> tuple:
+    """'s3://bucket/some/key.mp4' -> ('bucket', 'some/key.mp4')."""
+    parts = urlsplit(url)
+    if parts.scheme != "s3" or not parts.netloc or not parts.path.strip("/"):
+        raise ValueError(f"Not an s3://bucket/key URL: {url}")
+    return parts.netloc, parts.path.lstrip("/")
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).digest()
+
+
+class S3Client:
+    """
+    Minimal S3 client with path-style addressing (http(s)://endpoint/bucket/key).
+    At most `max_connections` keep-alive connections are open; requests beyond
+    that wait for a free one.
+    """
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, region: str = None,
+                 max_connections: int = None, timeout: float = 60.0):
+        parts = urlsplit(endpoint)
+        if parts.scheme not in ("http", "https") or not parts.netloc:
+            raise ValueError(f"Invalid storage endpoint: {endpoint}")
+        self.endpoint = f"{parts.scheme}://{parts.netloc}"
+        self.secure = parts.scheme == "https"
+        self.host = parts.netloc
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region or Config.S3_REGION
+        self.timeout = timeout
+        self.max_connections = max_connections or Config.S3_MAX_CONNECTIONS
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+
+    @classmethod
+    def from_config(cls) -> "S3Client":
+        if not Config.S3_ENDPOINT or not Config.S3_ACCESS_KEY:
+            raise RuntimeError("Object storage is not configured (VIDEO_APP_S3_ENDPOINT / _ACCESS_KEY / _SECRET_KEY).")
+        return cls(Config.S3_ENDPOINT, Config.S3_ACCESS_KEY, Config.S3_SECRET_KEY)
+
+    # --- Signing ---
+
+    def _scope(self, now: datetime) -> tuple:
+        date = now.strftime("%Y%m%d")
+        return now.strftime("%Y%m%dT%H%M%SZ"), f"{date}/{self.region}/s3/aws4_request"
+
+    def _signature(self, scope: str, string_to_sign: str) -> str:
+        date, region, service, terminator = scope.split("/")
+        key = _hmac(("AWS4" + self.secret_key).encode('utf-8'), date)
+        for part in (region, service, terminator):
+            key = _hmac(key, part)
+        return hmac.new(key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
+
+    def _canonical_request(self, method: str, path: str, query: dict, headers: dict, payload_hash: str) -> tuple:
+        canonical_query = "&".join(
+            f"{_uri_encode(str(k))}={_uri_encode(str(v))}" for k, v in sorted(query.items())
+        )
+        lowered = sorted((k.lower(), " ".join(str(v).split())) for k, v in headers.items())
+        canonical_headers = "".join(f"{k}:{v}\n" for k, v in lowered)
+        signed_headers = ";".join(k for k, _ in lowered)
+        request = "\n".join([method, _uri_encode(path, safe="/-_.~"), canonical_query,
+                             canonical_headers, signed_headers, payload_hash])
+        return request, signed_headers
+
+    def sign(self, method: str, path: str, query: dict = None, headers: dict = None,
+             payload_hash: str = EMPTY_SHA256, now: datetime = None) -> dict:
+        """Return `headers` plus the x-amz-* and Authorization headers of a Signature V4 request."""
+        amz_date, scope = self._scope(now or datetime.now(timezone.utc))
+        headers = dict(headers or {})
+        headers.setdefault('Host', self.host)
+        headers['x-amz-date'] = amz_date
+        headers['x-amz-content-sha256'] = payload_hash
+        request, signed_headers = self._canonical_request(method, path, query or {}, headers, payload_hash)
+        string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                                    hashlib.sha256(request.encode('utf-8')).hexdigest()])
+        headers['Authorization'] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                    f"SignedHeaders={signed_headers}, Signature={self._signature(scope, string_to_sign)}")
+        return headers
+
+    def presign(self, method: str, bucket: str, key: str, expires: int = None, now: datetime = None,
+                path: str = None) -> str:
+        """
+        URL that grants `method` on the object without credentials, e.g. for
+        FFmpeg's HTTP reader, which seeks with Range requests on its own.
+        """
+        amz_date, scope = self._scope(now or datetime.now(timezone.utc))
+        path = path or self._path(bucket, key)
+        query = {
+            'X-Amz-Algorithm': "AWS4-HMAC-SHA256",
+            'X-Amz-Credential': f"{self.access_key}/{scope}",
+            'X-Amz-Date': amz_date,
+            'X-Amz-Expires': str(expires or Config.S3_PRESIGN_EXPIRES),
+            'X-Amz-SignedHeaders': "host",
+        }
+        request, _ = self._canonical_request(method, path, query, {'host': self.host}, UNSIGNED_PAYLOAD)
+        string_to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope,
+                                    hashlib.sha256(request.encode('utf-8')).hexdigest()])
+        query['X-Amz-Signature'] = self._signature(scope, string_to_sign)
+        encoded = "&".join(f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted(query.items()))
+        return f"{self.endpoint}{_uri_encode(path, safe='/-_.~')}?{encoded}"
+
+    # --- Connections ---
+
+    @staticmethod
+    def _path(bucket: str, key: str = "") -> str:
+        return f"/{bucket}/{key}" if key else f"/{bucket}"
+
+    def _connect(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+        return cls(self.host, timeout=self.timeout)
+
+    def request(self, method: str, bucket: str, key: str = "", query: dict = None, body: bytes = b"",
+                headers: dict = None, expect: tuple = (200,)) -> tuple:
+        """
+        Signed request on a pooled connection. Returns (status, headers, body).
+        A stale keep-alive connection is retried once on a fresh one.
+        """
+        query = query or {}
+        path = self._path(bucket, key)
+        payload_hash = hashlib.sha256(body).hexdigest() if body else EMPTY_SHA256
+        signed = self.sign(method, path, query, headers, payload_hash)
+        target = _uri_encode(path, safe="/-_.~")
+        if query:
+            target += "?" + "&".join(
+                f"{_uri_encode(str(k))}={_uri_encode(str(v))}" if v != "" else _uri_encode(str(k))
+                for k, v in sorted(query.items())
+            )
+
+        self._slots.acquire()
+        try:
+            for attempt in (1, 2):
+                try:
+                    conn = self._idle.get_nowait()
+                    reused = True
+                except queue.Empty:
+                    conn, reused = self._connect(), False
+                try:
+                    conn.request(method, target, body=body or None, headers=signed)
+                    response = conn.getresponse()
+                    data = response.read()
+                except (http.client.HTTPException, OSError) as e:
+                    conn.close()
+                    if reused and attempt == 1:
+                        continue
+                    raise StorageError(f"{method} {path} failed: {e}")
+                if response.will_close:
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+                break
+        finally:
+            self._slots.release()
+
+        if response.status not in expect:
+            raise StorageError(f"{method} {path} returned {response.status}: "
+                               f"{_error_message(data) or response.reason}", response.status)
+        return response.status, dict(response.getheaders()), data
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # --- Objects ---
+
+    def head(self, bucket: str, key: str) -> dict | None:
+        """Object headers (lower-cased names), or None if it does not exist."""
+        try:
+            _, headers, _ = self.request("HEAD", bucket, key)
+        except StorageError as e:
+            if e.status == 404:
+                return None
+            raise
+        return {k.lower(): v for k, v in headers.items()}
+
+    def get_range(self, bucket: str, key: str, start: int = 0, length: int = None) -> bytes:
+        """Bytes [start, start + length) of an object (to the end without `length`)."""
+        end = "" if length is None else str(start + length - 1)
+        _, _, data = self.request("GET", bucket, key, headers={'Range': f"bytes={start}-{end}"}, expect=(200, 206))
+        return data
+
+    def download(self, bucket: str, key: str, path: str, chunk_size: int = None) -> str:
+        """
+        Copy an object to a local file in ranged chunks. The object size comes from
+        the Content-Range of the first response, so a size that is an exact multiple
+        of `chunk_size` never asks for a range past the end (416).
+        """
+        chunk_size = chunk_size or Config.S3_PART_SIZE
+        with open(path, 'wb') as f:
+            offset, size = 0, None
+            while size is None or offset < size:
+                try:
+                    status, headers, data = self.request(
+                        "GET", bucket, key, headers={'Range': f"bytes={offset}-{offset + chunk_size - 1}"},
+                        expect=(200, 206))
+                except StorageError as e:
+                    # Size still unknown: an empty object (or one the server never sized) ends here
+                    if e.status == 416 and size is None:
+                        return path
+                    raise
+                f.write(data)
+                offset += len(data)
+                if status == 200:
+                    # Range ignored: that was the whole object
+                    return path
+                size = _range_total(headers)
+                if size is None and len(data) < chunk_size:
+                    return path
+                if not data:
+                    raise StorageError(f"GET {bucket}/{key} returned no data at offset {offset} of {size}")
+        return path
+
+    def put(self, bucket: str, key: str, data: bytes) -> None:
+        self.request("PUT", bucket, key, body=data)
+
+    def delete(self, bucket: str, key: str) -> None:
+        self.request("DELETE", bucket, key, expect=(200, 204))
+
+    # --- Multipart Upload ---
+
+    def create_multipart_upload(self, bucket: str, key: str) -> str:
+        _, _, data = self.request("POST", bucket, key, query={'uploads': ""})
+        upload_id = _xml_text(data, "UploadId")
+        if not upload_id:
+            raise StorageError(f"No UploadId in response for {bucket}/{key}")
+        return upload_id
+
+    def upload_part(self, bucket: str, key: str, upload_id: str, number: int, data: bytes) -> str:
+        _, headers, _ = self.request("PUT", bucket, key, query={'partNumber': number, 'uploadId': upload_id},
+                                     body=data)
+        etag = {k.lower(): v for k, v in headers.items()}.get('etag')
+        if not etag:
+            raise StorageError(f"No ETag for part {number} of {bucket}/{key}")
+        return etag
+
+    def complete_multipart_upload(self, bucket: str, key: str, upload_id: str, parts: list) -> None:
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>" for number, etag in parts
+        ) + "</CompleteMultipartUpload>"
+        _, _, data = self.request("POST", bucket, key, query={'uploadId': upload_id}, body=body.encode('utf-8'))
+        # S3 can report a failed completion inside a 200 response
+        if _error_message(data):
+            raise StorageError(f"Completing upload of {bucket}/{key} failed: {_error_message(data)}")
+
+    def abort_multipart_upload(self, bucket: str, key: str, upload_id: str) -> None:
+        self.request("DELETE", bucket, key, query={'uploadId': upload_id}, expect=(200, 204, 404))
+
+
+class MultipartUpload:
+    """
+    Streams bytes into a multipart upload: write() buffers up to `part_size` and
+    hands full parts to at most `max_concurrency` upload threads. When they are
+    all busy, write() blocks, which bounds memory to about
+    (max_concurrency + 1) * part_size. The object appears only on complete().
+    """
+
+    def __init__(self, client: S3Client, bucket: str, key: str, part_size: int = None,
+                 max_concurrency: int = None):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size or Config.S3_PART_SIZE
+        concurrency = max_concurrency or Config.S3_UPLOAD_CONCURRENCY
+        self.upload_id = client.create_multipart_upload(bucket, key)
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._parts = {}
+        self._futures = []
+        self._in_flight = threading.BoundedSemaphore(concurrency)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="upload")
+
+    def write(self, data: bytes) -> None:
+        self._buffer.extend(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+
+    def write_file(self, path: str) -> None:
+        """Append a finished local file, a part at a time."""
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(self.part_size)
+                if not data:
+                    return
+                self.write(data)
+
+    def _submit(self, data: bytes) -> None:
+        self._raise_failed()
+        self._in_flight.acquire()
+        number = len(self._futures) + 1
+        self._futures.append(self._pool.submit(self._upload, number, data))
+
+    def _upload(self, number: int, data: bytes) -> None:
+        try:
+            etag = self.client.upload_part(self.bucket, self.key, self.upload_id, number, data)
+            with self._lock:
+                self._parts[number] = etag
+                self.bytes_sent += len(data)
+        finally:
+            self._in_flight.release()
+
+    def _raise_failed(self) -> None:
+        for future in self._futures:
+            if future.done() and future.exception():
+                raise future.exception()
+
+    def complete(self) -> None:
+        """Upload the rest of the buffer as the last part and publish the object."""
+        if self._buffer or not self._futures:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._pool.shutdown(wait=True)
+        self.client.complete_multipart_upload(self.bucket, self.key, self.upload_id, sorted(self._parts.items()))
+        logger.info(f"Uploaded {self.bytes_sent / 1048576:.1f} MB in {len(self._parts)} parts to {self.bucket}/{self.key}")
+
+    def abort(self) -> None:
+        """Drop the upload and its parts; the previous object (if any) is untouched."""
+        for future in self._futures:
+            future.cancel()
+        self._pool.shutdown(wait=True)
+        try:
+            self.client.abort_multipart_upload(self.bucket, self.key, self.upload_id)
+        except StorageError as e:
+            logger.warning(f"Could not abort upload of {self.bucket}/{self.key}: {e}")
+
+
+class FileTailUploader:
+    """
+    Follows a file while FFmpeg appends to it (fragmented MP4 never rewrites
+    earlier bytes) and feeds the new bytes into a MultipartUpload on a
+    background thread. finish() drains the rest once the writer has exited.
+    """
+
+    def __init__(self, path: str, upload: MultipartUpload, poll_interval: float = 0.2):
+        self.path = path
+        self.upload = upload
+        self.poll_interval = poll_interval
+        self.offset = 0
+        self.error = None
+        self._finished = threading.Event()
+        self._thread = threading.Thread(target=self._follow, name="tail-upload", daemon=True)
+
+    def start(self) -> "FileTailUploader":
+        self._thread.start()
+        return self
+
+    def _follow(self) -> None:
+        try:
+            while True:
+                finished = self._finished.is_set()
+                size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+                if size > self.offset:
+                    with open(self.path, 'rb') as f:
+                        f.seek(self.offset)
+                        while self.offset < size:
+                            data = f.read(min(self.upload.part_size, size - self.offset))
+                            if not data:
+                                break
+                            self.upload.write(data)
+                            self.offset += len(data)
+                elif finished:
+                    return
+                else:
+                    self._finished.wait(self.poll_interval)
+        except Exception as e:
+            self.error = e
+
+    def finish(self) -> None:
+        """Wait until every byte of the (now complete) file has been handed to the upload."""
+        self._finished.set()
+        self._thread.join()
+        if self.error:
+            raise self.error
+
+
+def _xml_text(data: bytes, tag: str) -> str | None:
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError:
+        return None
+    for element in root.iter():
+        if element.tag.rsplit('}', 1)[-1] == tag:
+            return element.text
+    return None
+
+
+def _range_total(headers: dict) -> int | None:
+    """Object size from a 'Content-Range: bytes 0-99/1234' header, None if absent or '*'."""
+    value = {k.lower(): v for k, v in headers.items()}.get('content-range', "")
+    total = value.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def _error_message(data: bytes) -> str | None:
+    if not data or b"<Error>" not in data:
+        return None
+    return f"{_xml_text(data, 'Code')}: {_xml_text(data, 'Message')}"
@@ -0,0 +1,217 @@
+import os
+import time
+import logging
+import threading
+from .threads import available_cpus
+
+logger = logging.getLogger(__name__)
+
+PROC_ROOT = "/proc"
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def telemetry_supported() -> bool:
+    """Per-process counters come from /proc (Linux)."""
+    return os.path.isdir(os.path.join(PROC_ROOT, "self"))
+
+
+class ResourceSample:
+    """Cumulative counters of one process at one point in time."""
+
+    def __init__(self, timestamp: float, cpu_seconds: float = 0.0, rss_bytes: int = 0,
+                 read_bytes: int = 0, write_bytes: int = 0,
+                 voluntary_switches: int = 0, involuntary_switches: int = 0):
+        self.timestamp = timestamp
+        self.cpu_seconds = cpu_seconds
+        self.rss_bytes = rss_bytes
+        self.read_bytes = read_bytes
+        self.write_bytes = write_bytes
+        self.voluntary_switches = voluntary_switches
+        self.involuntary_switches = involuntary_switches
+
+
+def read_process_stats(pid: int) -> ResourceSample | None:
+    """
+    Read CPU time, RSS, storage I/O and context switches of `pid`.
+    Returns None once the process is gone; counters that cannot be read
+    (e.g. /proc/<pid>/io of a reaped child) are left at 0.
+    """
+    base = os.path.join(PROC_ROOT, str(pid))
+    sample = ResourceSample(time.monotonic())
+    try:
+        with open(os.path.join(base, "stat"), 'r') as f:
+            # The command name may contain spaces: fields start after the last ')'
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime and stime (fields 14 and 15 of the full line)
+        sample.cpu_seconds = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+    except (OSError, IndexError, ValueError):
+        return None
+
+    try:
+        with open(os.path.join(base, "status"), 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key == 'VmRSS':
+                    sample.rss_bytes = int(value.split()[0]) * 1024
+                elif key == 'voluntary_ctxt_switches':
+                    sample.voluntary_switches = int(value)
+                elif key == 'nonvoluntary_ctxt_switches':
+                    sample.involuntary_switches = int(value)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open(os.path.join(base, "io"), 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                # Bytes that actually hit storage (rchar/wchar also count cached reads)
+                if key == 'read_bytes':
+                    sample.read_bytes = int(value)
+                elif key == 'write_bytes':
+                    sample.write_bytes = int(value)
+    except (OSError, ValueError):
+        pass
+    return sample
+
+
+class ResourceReport:
+    """What one FFmpeg run consumed, derived from its samples."""
+
+    def __init__(self, wall_seconds: float, cpu_seconds: float, peak_rss_bytes: int,
+                 read_bytes: int, write_bytes: int, context_switches: int, involuntary_switches: int):
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.peak_rss_bytes = peak_rss_bytes
+        self.read_bytes = read_bytes
+        self.write_bytes = write_bytes
+        self.context_switches = context_switches
+        self.involuntary_switches = involuntary_switches
+
+    @property
+    def cores_used(self) -> float:
+        """Average number of busy cores (CPU seconds per wall second)."""
+        return self.cpu_seconds / self.wall_seconds if self.wall_seconds else 0.0
+
+    @property
+    def disk_mb_per_sec(self) -> float:
+        """Storage read + write throughput."""
+        if not self.wall_seconds:
+            return 0.0
+        return (self.read_bytes + self.write_bytes) / 1048576 / self.wall_seconds
+
+    def as_dict(self) -> dict:
+        return {
+            'wall_seconds': round(self.wall_seconds, 2),
+            'cpu_seconds': round(self.cpu_seconds, 2),
+            'cores_used': round(self.cores_used, 2),
+            'peak_rss_mb': round(self.peak_rss_bytes / 1048576, 1),
+            'read_mb': round(self.read_bytes / 1048576, 1),
+            'write_mb': round(self.write_bytes / 1048576, 1),
+            'disk_mb_per_sec': round(self.disk_mb_per_sec, 2),
+            'context_switches': self.context_switches,
+            'involuntary_switches': self.involuntary_switches,
+        }
+
+    def __repr__(self):
+        return (f"ResourceReport({self.wall_seconds:.1f}s wall, {self.cores_used:.2f} cores, "
+                f"peak RSS {self.peak_rss_bytes / 1048576:.0f} MB, disk {self.disk_mb_per_sec:.1f} MB/s, "
+                f"{self.involuntary_switches}/{self.context_switches} involuntary switches)")
+
+
+class ProcessTelemetry:
+    """
+    Samples one child process at a low frequency (see FFmpegExecutor).
+    Counters are cumulative, so the report only needs the first and last
+    samples plus the RSS peak; sampling rarely costs almost nothing.
+    """
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.started = time.monotonic()
+        self.first = None
+        self.last = None
+        self.peak_rss_bytes = 0
+
+    def sample(self) -> ResourceSample | None:
+        current = read_process_stats(self.pid)
+        if current is None:
+            return None
+        if self.last is not None:
+            # A zombie has no RSS/io entries: keep the counters already seen
+            current.read_bytes = max(current.read_bytes, self.last.read_bytes)
+            current.write_bytes = max(current.write_bytes, self.last.write_bytes)
+            current.voluntary_switches = max(current.voluntary_switches, self.last.voluntary_switches)
+            current.involuntary_switches = max(current.involuntary_switches, self.last.involuntary_switches)
+        if self.first is None:
+            self.first = current
+        self.last = current
+        self.peak_rss_bytes = max(self.peak_rss_bytes, current.rss_bytes)
+        return current
+
+    def report(self) -> ResourceReport:
+        """Consumption so far (or in total, once the child has exited)."""
+        last = self.last
+        wall = (last.timestamp if last else time.monotonic()) - self.started
+        if last is None:
+            return ResourceReport(wall, 0.0, 0, 0, 0, 0, 0)
+        return ResourceReport(
+            wall_seconds=wall,
+            cpu_seconds=last.cpu_seconds,
+            peak_rss_bytes=self.peak_rss_bytes,
+            read_bytes=last.read_bytes,
+            write_bytes=last.write_bytes,
+            context_switches=last.voluntary_switches + last.involuntary_switches,
+            involuntary_switches=last.involuntary_switches,
+        )
+
+
+class BatchTelemetry:
+    """
+    Aggregates the reports of a batch. Compare `cores_used` with the cores
+    available, `peak_rss_mb` with RAM and `disk_mb_per_sec` with what the
+    storage sustains to see whether the box is CPU-, memory- or I/O-bound.
+    """
+
+    def __init__(self):
+        self.reports = []
+        self._started = None
+        self._finished = None
+        self._running = {}      # run id -> live ProcessTelemetry
+        self._peak_rss_bytes = 0
+        self._lock = threading.Lock()
+
+    def start(self, run_id, telemetry: ProcessTelemetry) -> None:
+        with self._lock:
+            if self._started is None:
+                self._started = telemetry.started
+            self._running[run_id] = telemetry
+
+    def update(self) -> None:
+        """Track the peak combined RSS of the children running right now."""
+        with self._lock:
+            current = sum(t.last.rss_bytes for t in self._running.values() if t.last)
+            self._peak_rss_bytes = max(self._peak_rss_bytes, current)
+
+    def finish(self, run_id, report: ResourceReport) -> None:
+        with self._lock:
+            self._running.pop(run_id, None)
+            self.reports.append(report)
+            self._finished = time.monotonic()
+
+    def summary(self) -> dict:
+        with self._lock:
+            reports = list(self.reports)
+            wall = (self._finished - self._started) if self._started and self._finished else 0.0
+            peak_rss = max([self._peak_rss_bytes] + [r.peak_rss_bytes for r in reports])
+        cpu = sum(r.cpu_seconds for r in reports)
+        disk = sum(r.read_bytes + r.write_bytes for r in reports)
+        return {
+            'runs': len(reports),
+            'wall_seconds': round(wall, 2),
+            'cpu_seconds': round(cpu, 2),
+            'cores_used': round(cpu / wall, 2) if wall else 0.0,
+            'cores_available': len(available_cpus()),
+            'peak_rss_mb': round(peak_rss / 1048576, 1),
+            'disk_mb_per_sec': round(disk / 1048576 / wall, 2) if wall else 0.0,
+            'involuntary_switches': sum(r.involuntary_switches for r in reports),
+        }
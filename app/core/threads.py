@@ -0,0 +1,88 @@
+import os
+import logging
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def available_cpus() -> list:
+    """CPUs this process may run on (respects container/affinity limits on Linux)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class ThreadBudget:
+    """
+    Explicit thread allowance for one FFmpeg job.
+    Without it the decoder, the filter graph and x265's pools each size
+    themselves to every core, and concurrent jobs oversubscribe the CPU.
+    """
+
+    def __init__(self, threads: int, cpus: list = None):
+        self.threads = max(1, int(threads))
+        # Optional CPU set to pin the job to (Linux only)
+        self.cpus = cpus
+
+    @classmethod
+    def for_jobs(cls, concurrent_jobs: int, slot: int = 0, pin: bool = None) -> "ThreadBudget":
+        """
+        Split the available cores evenly between `concurrent_jobs`.
+        With `pin`, job `slot` gets its own contiguous block of CPUs.
+        """
+        cpus = available_cpus()
+        concurrent_jobs = max(1, concurrent_jobs)
+        threads = Config.THREADS_PER_JOB or max(1, len(cpus) // concurrent_jobs)
+        pin = Config.CPU_AFFINITY if pin is None else pin
+
+        pinned = None
+        if pin and hasattr(os, 'sched_setaffinity'):
+            start = (slot % concurrent_jobs) * threads % len(cpus)
+            pinned = [cpus[(start + i) % len(cpus)] for i in range(min(threads, len(cpus)))]
+        return cls(threads, pinned)
+
+    @property
+    def frame_threads(self) -> int:
+        """x265 frame-parallelism scaled to the budget (mirrors x265's own core-count table)."""
+        if self.threads < 4:
+            return 1
+        if self.threads < 8:
+            return 2
+        if self.threads < 16:
+            return 3
+        return 4
+
+    def global_args(self) -> list:
+        """Filter graph threads (global options, placed before the inputs)."""
+        return ['-filter_threads', str(self.threads), '-filter_complex_threads', str(self.threads)]
+
+    def input_args(self) -> list:
+        """Decoder threads (input option, placed before '-i')."""
+        return ['-threads', str(self.threads)]
+
+    def output_args(self) -> list:
+        """Encoder threads (output option)."""
+        return ['-threads', str(self.threads)]
+
+    def x265_params(self) -> dict:
+        """x265 thread pool and frame-thread limits."""
+        return {'pools': str(self.threads), 'frame-threads': str(self.frame_threads)}
+
+    def apply_affinity(self, pid: int) -> None:
+        """Pin every thread of `pid` to the budget's CPUs (no-op without a CPU set)."""
+        if not self.cpus or not hasattr(os, 'sched_setaffinity'):
+            return
+        task_dir = f"/proc/{pid}/task"
+        try:
+            tids = [int(t) for t in os.listdir(task_dir)] if os.path.isdir(task_dir) else [pid]
+        except OSError:
+            tids = [pid]
+        for tid in tids:
+            try:
+                os.sched_setaffinity(tid, self.cpus)
+            except OSError as e:
+                logger.debug(f"Could not set affinity for thread {tid}: {e}")
+        logger.info(f"Pinned FFmpeg (pid {pid}) to CPUs {self.cpus}")
+
+    def __repr__(self):
+        return f"ThreadBudget(threads={self.threads}, cpus={self.cpus})"
@@ -21,6 +21,14 @@ def get_output_path(input_path: str, output_dir: str = None, suffix: str = "_pro
     
     return str(input_path.parent / filename)
 
+def get_processing_path(path: str) -> str:
+    """
+    Temp path a render writes to before the atomic replace: '<stem>.processing<ext>'
+    in the same directory (same filesystem, so os.replace stays atomic).
+    """
+    path = Path(path)
+    return str(path.with_suffix(f".processing{path.suffix}"))
+
 def find_srt_file(video_path: str) -> str | None:
     """
     Look for a matching .srt file using priority levels:
@@ -121,11 +129,18 @@ def wait_for_file_release(path: str, codec: str = "software", max_wait_base: flo
     logger.error(f"File release timeout after {elapsed:.2f}s for {abs_path}")
     return False
 
-def validate_output_video(path: str, codec: str = "software", min_size_mb: float = 0.5) -> bool:
+def validate_output_video(path: str, codec: str = "software", expected_duration: float = None,
+                          tolerance: float = None) -> bool:
     """
-    Validates the generated video file using a Windows-safe rename probe.
+    Validates the generated video file:
+    1. Windows-safe rename probe (the encoder has released the file).
+    2. Structural check of container metadata and packet indexes (no decoding),
+       compared against the expected duration when it is known.
     """
-    return wait_for_file_release(path, codec=codec, min_size_mb=min_size_mb)
+    from .validation import check_output_structure
+    if not wait_for_file_release(path, codec=codec, min_size_mb=0):
+        return False
+    return check_output_structure(path, expected_duration=expected_duration, tolerance=tolerance)
 
 def safe_replace(src: str, dst: str, max_retries: int = 5, base_wait: float = 1.0) -> None:
     """
@@ -0,0 +1,116 @@
+import os
+import json
+import struct
+import logging
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .config import Config, tool_command
+from . import fmp4
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_validation_pool() -> ThreadPoolExecutor:
+    """Shared worker pool for validate/commit work, separate from the encoders."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=Config.VALIDATION_WORKERS,
+                                       thread_name_prefix="validate")
+        return _pool
+
+
+def probe_structure(path: str) -> dict:
+    """
+    Read container metadata and packet indexes only.
+    `-count_packets` walks the demuxer index; nothing is decoded.
+    """
+    cmd = tool_command(Config.FFPROBE_BIN) + [
+        '-v', 'error',
+        '-count_packets',
+        '-show_entries', 'format=duration,nb_streams:stream=index,codec_type,nb_read_packets',
+        '-print_format', 'json',
+        path
+    ]
+    try:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=120,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+    except FileNotFoundError:
+        raise RuntimeError(f"FFprobe executable not found at {Config.FFPROBE_BIN}")
+    if result.returncode != 0:
+        # Typical for truncated MP4s: the moov atom was never written
+        raise ValueError(result.stderr.strip() or "unreadable container")
+    return json.loads(result.stdout or "{}")
+
+
+def fragmented_structure(path: str) -> dict | None:
+    """
+    probe_structure's result for a fragmented MP4, read from the moov and moof
+    headers instead of FFprobe. None if `path` is not a fragmented MP4.
+    """
+    try:
+        scan = fmp4.scan(path)
+    except struct.error:
+        return None
+    if not scan.fragmented:
+        return None
+    if scan.complete_size < scan.size:
+        raise ValueError(f"incomplete trailing fragment ({scan.size - scan.complete_size} bytes)")
+    return {
+        'streams': scan.streams,
+        'format': {'duration': f"{scan.duration:.6f}", 'nb_streams': len(scan.tracks)},
+    }
+
+
+def check_output_structure(path: str, expected_duration: float = None, tolerance: float = None) -> bool:
+    """
+    Structural validation of an encoded file (fragmented MP4s by a header read).
+    Fails on: unreadable container (e.g. missing moov), no video stream,
+    a stream without packets, or a duration outside the tolerance.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        logger.error(f"Validation: {path} is missing or empty")
+        return False
+
+    try:
+        info = fragmented_structure(path) or probe_structure(path)
+    except ValueError as e:
+        logger.error(f"Validation: container unreadable for {path}: {e}")
+        return False
+
+    streams = info.get('streams', [])
+    if not any(s.get('codec_type') == 'video' for s in streams):
+        logger.error(f"Validation: no video stream in {path}")
+        return False
+    for stream in streams:
+        if int(stream.get('nb_read_packets') or 0) == 0:
+            logger.error(f"Validation: stream #{stream.get('index')} ({stream.get('codec_type')}) has no packets")
+            return False
+
+    try:
+        duration = float(info.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        logger.error(f"Validation: no duration in {path}")
+        return False
+
+    if expected_duration:
+        if tolerance is None:
+            tolerance = max(Config.DURATION_TOLERANCE_SEC, expected_duration * Config.DURATION_TOLERANCE_RATIO)
+        if abs(duration - expected_duration) > tolerance:
+            logger.error(f"Validation: duration {duration:.2f}s differs from expected "
+                         f"{expected_duration:.2f}s (tolerance {tolerance:.2f}s)")
+            return False
+
+    logger.info(f"Validation passed: {os.path.basename(path)} ({duration:.2f}s, {len(streams)} streams)")
+    return True
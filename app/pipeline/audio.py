@@ -0,0 +1,147 @@
+import os
+import re
+import json
+import logging
+from ..core.config import Config
+from ..core.ffmpeg import FFmpegExecutor
+from ..core.probe import probe_media, get_audio_streams, file_signature, cache_path
+
+logger = logging.getLogger(__name__)
+
+
+class AudioProcessor:
+    """
+    Handles logic for the audio stage.
+    Policies:
+    - 'auto': copy tracks that are already efficient (AAC/Opus/MP3, at most stereo,
+      no processing requested), otherwise transcode.
+    - 'copy': always copy.
+    - 'transcode': always transcode to `codec` at `bitrate`.
+    Optional mono downmix (speech) and EBU R128 loudness normalization, which
+    reuses a cached measurement so the encode itself stays single-pass.
+    """
+
+    def __init__(self, policy: str = None, codec: str = None, bitrate: str = None,
+                 mono: bool = None, loudnorm: bool = None):
+        self.policy = policy or Config.AUDIO_POLICY
+        self.codec = codec or Config.AUDIO_CODEC
+        self.bitrate = bitrate
+        self.mono = Config.AUDIO_MONO if mono is None else mono
+        self.loudnorm = Config.AUDIO_LOUDNORM if loudnorm is None else loudnorm
+        if self.policy not in ("auto", "copy", "transcode"):
+            raise ValueError(f"Unsupported audio policy: {self.policy}")
+
+    def get_output_args(self, input_path: str, measure: bool = True, info: dict = None,
+                        executor: FFmpegExecutor = None) -> list:
+        """
+        Return audio output arguments for `input_path` (`info`: its probe result, if known).
+        The caller maps audio with '-map 0:a?', so inputs without audio simply
+        produce no audio stream. `measure=False` skips an uncached loudness
+        measurement (previews) and falls back to dynamic single-pass loudnorm.
+        A measurement runs on `executor` (the caller's, so cancelling the job stops it).
+        """
+        if self.policy == "copy":
+            return ['-c:a', 'copy']
+
+        try:
+            streams = get_audio_streams(info or probe_media(input_path))
+        except Exception as e:
+            logger.warning(f"Could not probe audio of {input_path}, copying as is: {e}")
+            return ['-c:a', 'copy']
+
+        if not streams:
+            logger.info("No audio stream: output will be silent")
+            return ['-an']
+
+        if self.policy == "auto" and self._is_efficient(streams):
+            return ['-c:a', 'copy']
+
+        channels = max(int(s.get('channels') or 2) for s in streams)
+        target_channels = 1 if self.mono else min(channels, 2)
+        bitrate = self.bitrate or (Config.AUDIO_MONO_BITRATE if target_channels == 1 else Config.AUDIO_BITRATE)
+        args = ['-c:a', self.codec, '-b:a', bitrate, '-ac', str(target_channels)]
+
+        if self.loudnorm:
+            args.extend(['-af', self._loudnorm_filter(input_path, measure, executor)])
+            # loudnorm resamples to 192 kHz internally: keep the source rate
+            args.extend(['-ar', str(self._sample_rate(streams))])
+
+        logger.info(f"Audio: transcoding {streams[0].get('codec_name')} ({channels}ch) "
+                    f"-> {self.codec} {bitrate} ({target_channels}ch)")
+        return args
+
+    def _is_efficient(self, streams: list) -> bool:
+        if self.mono or self.loudnorm:
+            return False
+        return all(
+            s.get('codec_name') in Config.AUDIO_EFFICIENT_CODECS and int(s.get('channels') or 2) <= 2
+            for s in streams
+        )
+
+    def _sample_rate(self, streams: list) -> int:
+        """Source rate of the first track; Opus only encodes 48 kHz (of the usual rates)."""
+        if self.codec == 'libopus':
+            return 48000
+        try:
+            return int(streams[0].get('sample_rate') or Config.AUDIO_SAMPLE_RATE)
+        except (TypeError, ValueError):
+            return Config.AUDIO_SAMPLE_RATE
+
+    def _loudnorm_filter(self, input_path: str, measure: bool, executor: FFmpegExecutor = None) -> str:
+        target = Config.LOUDNORM_TARGET
+        stats = self.get_loudness(input_path, executor) if measure else self._cached_loudness(input_path)
+        if not stats:
+            # No measurement available: dynamic (one-pass) normalization
+            return f"loudnorm={target}"
+        return (
+            f"loudnorm={target}"
+            f":measured_I={stats['input_i']}"
+            f":measured_TP={stats['input_tp']}"
+            f":measured_LRA={stats['input_lra']}"
+            f":measured_thresh={stats['input_thresh']}"
+            f":offset={stats['target_offset']}"
+            f":linear=true"
+        )
+
+    def get_loudness(self, input_path: str, executor: FFmpegExecutor = None) -> dict:
+        """
+        Measure integrated loudness (audio-only decode), cached by file signature.
+        Runs on `executor` like any other stage: cancel(), the stall watchdog and
+        telemetry cover it.
+        """
+        cached = self._cached_loudness(input_path)
+        if cached:
+            return cached
+
+        args = [
+            '-hide_banner',
+            '-i', input_path,
+            '-map', '0:a:0', '-vn', '-sn',
+            '-af', f"loudnorm={Config.LOUDNORM_TARGET}:print_format=json",
+            '-f', 'null', '-'
+        ]
+        logger.info(f"Measuring loudness of {os.path.basename(input_path)}")
+        # loudnorm prints its JSON summary on stderr after the last progress line
+        lines = []
+        (executor or FFmpegExecutor()).run(args, output_callback=lines.append,
+                                           stall_timeout=Config.FFMPEG_STALL_TIMEOUT)
+        match = re.search(r"\{[^{}]*\"input_i\"[^{}]*\}", "\n".join(lines))
+        if not match:
+            raise RuntimeError(f"Loudness measurement failed for {input_path}: no loudnorm summary")
+
+        stats = json.loads(match.group(0))
+        try:
+            with open(cache_path(file_signature(input_path), ".loudness.json"), 'w', encoding='utf-8') as f:
+                json.dump(stats, f)
+        except OSError as e:
+            logger.warning(f"Could not cache loudness for {input_path}: {e}")
+        return stats
+
+    @staticmethod
+    def _cached_loudness(input_path: str) -> dict | None:
+        try:
+            entry = cache_path(file_signature(input_path), ".loudness.json")
+            with open(entry, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
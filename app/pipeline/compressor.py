@@ -23,19 +23,42 @@ class Compressor:
             self.quality = effective_quality or Config.DEFAULT_CRF
             self.preset = preset or Config.X265_PRESET
 
-    def get_encoding_args(self) -> list:
+    def get_encoding_args(self, x265_params: dict = None, static_content: bool = False) -> list:
         """
-        Return the FFmpeg arguments for encoding.
+        Return the FFmpeg arguments for video encoding (audio is handled by AudioProcessor).
+        x265_params: extra libx265 settings (e.g. thread pools); ignored by NVENC.
+        static_content: tune for slide-like content (long GOP, temporal AQ,
+        a bounded keyframe interval in seconds so seeking stays fast).
         """
-        args = ['-c:v', self.codec, '-preset', self.preset, '-c:a', 'copy']
+        args = ['-c:v', self.codec, '-preset', self.preset]
+        x265_params = dict(x265_params or {})
         
         # Handle NVENC specific vs Software (x265)
         if 'nvenc' in self.codec:
             # NVENC uses -cq (Constant Quality) and -rc vbr
             # -b:v 0 is CRITICAL for VBR mode
             args.extend(['-rc', 'vbr', '-cq', str(self.quality), '-b:v', '0'])
+            if static_content:
+                # Temporal AQ spends bits on the static regions that persist across frames
+                args.extend(['-g', str(Config.LECTURE_GOP), '-temporal-aq', '1', '-spatial-aq', '1'])
         else:
             # Standard x265
             args.extend(['-crf', str(self.quality)])
+            if static_content:
+                args.extend(['-g', str(Config.LECTURE_GOP)])
+                x265_params.update({'min-keyint': '1', 'bframes': '8', 'aq-mode': '3'})
+            if x265_params and 'x265' in self.codec:
+                args.extend(['-x265-params', ":".join(f"{k}={v}" for k, v in x265_params.items())])
+
+        if static_content:
+            # Frame-count GOPs can span minutes after decimation; bound them in time too
+            args.extend(['-force_key_frames', f"expr:gte(t,n_forced*{Config.LECTURE_KEYFRAME_INTERVAL})"])
             
         return args
+
+    def get_copy_args(self) -> list:
+        """
+        Return the FFmpeg arguments for copying the video stream untouched.
+        Audio settings come from AudioProcessor.
+        """
+        return ['-c:v', 'copy']
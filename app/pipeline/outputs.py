@@ -0,0 +1,37 @@
+import copy
+from typing import Optional
+from .compressor import Compressor
+from .packaging import Packager
+from .thumbnails import ThumbnailSpec
+
+
+class OutputSpec:
+    """
+    Describes one output branch of a decode pass.
+    Every spec gets its own scale, subtitle track, watermark and encoder,
+    while all of them share a single decode of the input.
+    """
+
+    def __init__(self, output_path: str, height: Optional[int] = None, srt_path: str = None,
+                 logo_path: str = None, compressor: Compressor = None, packager: Packager = None,
+                 thumbnails: ThumbnailSpec = None, subtitle_mode: str = None):
+        self.output_path = output_path
+        self.height = height
+        self.srt_path = srt_path
+        self.logo_path = logo_path
+        self.compressor = compressor
+        # Optional HLS/DASH packaging; `output_path` is then the manifest path
+        self.packager = packager
+        # Optional poster/sprite outputs split off this branch's final stream
+        self.thumbnails = thumbnails
+        # 'burn' or 'mux'; None follows the pipeline's default
+        self.subtitle_mode = subtitle_mode
+
+    def with_output(self, output_path: str) -> "OutputSpec":
+        """Return a copy of this spec that writes to `output_path`."""
+        clone = copy.copy(self)
+        clone.output_path = output_path
+        return clone
+
+    def __repr__(self):
+        return f"OutputSpec({self.output_path!r}, height={self.height}, srt={self.srt_path!r})"
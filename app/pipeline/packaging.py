@@ -0,0 +1,119 @@
+import os
+import shutil
+import logging
+from pathlib import Path
+from ..core.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class Packager:
+    """
+    Handles segmented (streaming-ready) output written directly by the encoder.
+    - 'hls': HLS playlist with fMP4 or MPEG-TS segments.
+    - 'dash': DASH manifest with fMP4 segments (optionally with HLS playlists
+      referencing the same segments).
+    """
+
+    def __init__(self, mode: str = "hls", segment_duration: float = None,
+                 segment_type: str = "fmp4", hls_playlist: bool = False):
+        if mode not in ("hls", "dash"):
+            raise ValueError(f"Unsupported packaging mode: {mode}")
+        if segment_type not in ("fmp4", "mpegts"):
+            raise ValueError(f"Unsupported segment type: {segment_type}")
+        self.mode = mode
+        self.segment_duration = segment_duration or Config.SEGMENT_DURATION
+        self.segment_type = segment_type
+        self.hls_playlist = hls_playlist
+
+    def get_keyframe_args(self, codec: str) -> list:
+        """
+        Force a keyframe at every segment boundary so each segment starts
+        with an IDR frame and segment durations are exact.
+        """
+        args = ['-force_key_frames', f"expr:gte(t,n_forced*{self.segment_duration})"]
+        if 'nvenc' in codec:
+            # NVENC emits plain I-frames for forced keys unless asked for IDR
+            args.extend(['-forced-idr', '1'])
+        if 'hevc' in codec or '265' in codec:
+            # Apple players only accept HEVC in fMP4 with the hvc1 tag
+            args.extend(['-tag:v', 'hvc1'])
+        return args
+
+    def get_output_args(self, manifest_path: str) -> list:
+        """Return the muxer arguments that write segments and the manifest."""
+        manifest = Path(manifest_path)
+        stem = manifest.stem
+
+        if self.mode == "hls":
+            ext = "m4s" if self.segment_type == "fmp4" else "ts"
+            args = [
+                '-f', 'hls',
+                '-hls_time', str(self.segment_duration),
+                '-hls_playlist_type', 'vod',
+                '-hls_segment_type', self.segment_type,
+                '-hls_segment_filename', (manifest.parent / f"{stem}_%05d.{ext}").as_posix(),
+            ]
+            if self.segment_type == "fmp4":
+                args.extend(['-hls_fmp4_init_filename', f"{stem}_init.mp4"])
+        else:
+            # DASH segment names are resolved relative to the manifest directory
+            args = [
+                '-f', 'dash',
+                '-seg_duration', str(self.segment_duration),
+                '-use_template', '1',
+                '-use_timeline', '1',
+                '-init_seg_name', f"{stem}_init_$RepresentationID$.mp4",
+                '-media_seg_name', f"{stem}_$RepresentationID$_$Number%05d$.m4s",
+            ]
+            if self.hls_playlist:
+                args.extend(['-hls_playlist', '1'])
+
+        args.append(str(manifest))
+        return args
+
+    def staging_path(self, manifest_path: str) -> str:
+        """
+        Return the manifest path inside a '.processing' staging directory.
+        Segments are written there and only moved next to the final manifest on commit.
+        """
+        manifest = Path(os.path.abspath(manifest_path))
+        staging_dir = manifest.parent / f"{manifest.stem}.processing"
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        return str(staging_dir / manifest.name)
+
+    def validate(self, manifest_path: str) -> bool:
+        """A package is valid if the manifest exists and at least one media segment was written."""
+        manifest = Path(manifest_path)
+        if not manifest.exists() or manifest.stat().st_size == 0:
+            return False
+        segments = [p for p in manifest.parent.iterdir()
+                    if p.suffix in (".m4s", ".ts") and p.stat().st_size > 0]
+        return bool(segments)
+
+    def commit(self, staged_manifest: str, manifest_path: str) -> None:
+        """
+        Move the staged package into place.
+        Segments go first and manifests last, so a reader never sees a playlist
+        that points at segments which are not there yet.
+        """
+        from ..core.utils import safe_replace
+        staging_dir = Path(staged_manifest).parent
+        target_dir = Path(os.path.abspath(manifest_path)).parent
+        target_dir.mkdir(parents=True, exist_ok=True)
+
+        manifests = []
+        for item in sorted(staging_dir.iterdir()):
+            if item.suffix in (".m3u8", ".mpd"):
+                manifests.append(item)
+            else:
+                safe_replace(str(item), str(target_dir / item.name))
+        for item in manifests:
+            safe_replace(str(item), str(target_dir / item.name))
+
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        logger.info(f"Commit: Packaged output ready at {manifest_path}")
+
+    def cleanup(self, staged_manifest: str) -> None:
+        """Remove a staging directory after a failed pass."""
+        shutil.rmtree(Path(staged_manifest).parent, ignore_errors=True)
@@ -1,14 +1,35 @@
-from typing import Optional
+from typing import List, Optional
+from concurrent.futures import Future
+from fractions import Fraction
 import os
+import re
+import json
+import time
+import struct
+import hashlib
+import shutil
+import posixpath
 import logging
 from pathlib import Path
 from ..core.ffmpeg import FFmpegExecutor
-from ..core.utils import find_srt_file
+from ..core.utils import find_srt_file, get_processing_path
 from ..core.config import Config
+from ..core.probe import (get_duration, duration_of, probe_media, get_video_stream, kept_duration,
+                          file_signature, cache_path)
+from ..core.validation import get_validation_pool
+from ..core import fmp4
+from ..core.storage import is_remote
+from ..core.retention import RetentionPolicy
+from ..core import media_index
 # from ..core.subtitle_fixer import fix_srt
 from .subtitle import SubtitleProcessor
 from .watermark import WatermarkProcessor
 from .compressor import Compressor
+from .audio import AudioProcessor
+from .scaler import ScaleProcessor
+from .outputs import OutputSpec
+from .thumbnails import ThumbnailSpec
+from . import smart_render
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +37,7 @@ class VideoPipeline:
     """
     Orchestrates the video processing pipeline.
     Connects Subtitle -> Watermark -> Compressor in a single FFmpeg pass.
+    Several outputs can share that pass (see OutputSpec).
     """
 
     def __init__(self):
@@ -23,16 +45,89 @@ class VideoPipeline:
         self.subtitle_processor = SubtitleProcessor()
         self.watermark_processor = WatermarkProcessor(position="top-right")
         self.compressor = Compressor()
+        self.audio_processor = AudioProcessor()
+        self.scale_processor = ScaleProcessor()
+        # Optional ThumbnailSpec template; process_video resolves it per video
+        self.thumbnails = None
+        # Optional PrefetchCache; encodes read local copies of prefetched inputs
+        self.prefetcher = None
+        # Optional ThreadBudget for decoder, filter graph and encoder threads
+        self.thread_budget = None
+        # 'burn' renders subtitles into the pixels, 'mux' adds them as a selectable track
+        self.subtitle_mode = Config.SUBTITLE_MODE
+        # Normalization caps (None = keep source); applied first, before subtitles/watermark
+        self.max_height = Config.MAX_OUTPUT_HEIGHT
+        self.max_fps = Config.MAX_OUTPUT_FPS
+        # 'lecture' drops near-duplicate frames and writes VFR output tuned for static content
+        self.content_mode = Config.CONTENT_MODE
+        # Optional callable(input_path), invoked by submit_video once the encode is done,
+        # before validation is queued (so it always runs before commit_callback)
+        self.encoded_callback = None
+        # Optional callable(input_path), invoked right before the original is replaced
+        self.commit_callback = None
+        # Optional Predictor; learns encoder throughput and output bitrate from every pass
+        self.predictor = None
+        # Keep the clean source and SRT of committed videos for rerender_subtitles
+        self.keep_sources = Config.SMART_RENDER_KEEP_SOURCES
+        # Write fragmented MP4: readable mid-encode, and a crash keeps the complete fragments
+        self.fragmented = Config.FRAGMENTED_OUTPUT
+        # Optional S3Client for s3:// inputs; built from Config when needed
+        self.storage = None
+        # Optional RetentionPolicy: originals and SRTs are backed up before the replace
+        self.retention = RetentionPolicy() if Config.RETENTION_ENABLED else None
 
-    def process_video(self, input_path: str, output_path: str, logo_path: str = None, progress_callback=None) -> None:
+    @property
+    def thread_budget(self):
+        return self._thread_budget
+
+    @thread_budget.setter
+    def thread_budget(self, budget):
+        self._thread_budget = budget
+        # The executor applies the budget's CPU affinity to the child process
+        self.executor.thread_budget = budget
+
+    def process_video(self, input_path: str, output_path: str, logo_path: str = None, progress_callback=None,
+                      start: float = None, end: float = None) -> None:
         """
         Run the processing pipeline for a single video.
         In this production-safe version:
         1. Always render to a temporary '.processing.mp4' file.
-        2. Validate the result (size/existence).
+        2. Validate the result structurally (container, streams, duration).
         3. Replace original file atomically.
         4. Delete SRT only on absolute success.
+        `start`/`end` (seconds) keep only that range of the source.
+        s3:// inputs are streamed from and to object storage (see _render_remote).
+        """
+        # A new job: a cancel() aimed at the previous one no longer applies
+        self.executor.reset()
+        if is_remote(input_path):
+            self._finalize_remote(*self._render_remote(input_path, output_path, logo_path, progress_callback,
+                                                       start, end))
+            return
+        rendered = self._render(input_path, output_path, logo_path, progress_callback, start, end)
+        self._finalize(*rendered)
+
+    def submit_video(self, input_path: str, output_path: str, logo_path: str = None, progress_callback=None,
+                     start: float = None, end: float = None) -> Future:
         """
+        Like process_video, but only the encode runs on the calling thread.
+        Validation and commit run on the shared validation pool, so the caller
+        can start the next encode immediately. Returns a Future for that stage.
+        """
+        self.executor.reset()
+        if is_remote(input_path):
+            rendered = self._render_remote(input_path, output_path, logo_path, progress_callback, start, end)
+            finalize = self._finalize_remote
+        else:
+            rendered = self._render(input_path, output_path, logo_path, progress_callback, start, end)
+            finalize = self._finalize
+        if self.encoded_callback:
+            self.encoded_callback(input_path)
+        return get_validation_pool().submit(finalize, *rendered)
+
+    def _render(self, input_path: str, output_path: str, logo_path: str = None, progress_callback=None,
+                start: float = None, end: float = None) -> tuple:
+        """Encode into the temp file. Returns the arguments for _finalize."""
         input_path = os.path.abspath(input_path)
         output_path = os.path.abspath(output_path)
         # Normalize logo_path for consistent cross-platform subprocess behavior
@@ -40,135 +135,1095 @@ class VideoPipeline:
             logo_path = os.path.abspath(logo_path)
         logger.info(f"Processing video: {input_path}")
         
-        from ..core.utils import validate_output_video
-        
-        # 1. Identify SRT before starting
+        # 1. Identify SRT and the reference duration before starting
         srt_path = find_srt_file(input_path)
+        thumbnails = self.thumbnails.for_video(input_path) if self.thumbnails else None
+        expected_duration = self._probe_duration(input_path)
+        trimmed = start is not None or end is not None
+        if trimmed:
+            source_duration = expected_duration
+            expected_duration = kept_duration(source_duration, start, end)
+            if expected_duration is not None and expected_duration <= 0:
+                raise ValueError(f"Empty range {start}-{end} for {input_path} ({source_duration}s)")
+            logger.info(f"Keeping range {start or 0}s-{end if end is not None else 'end'}")
+            progress_callback = _range_progress(progress_callback, source_duration, expected_duration)
         
         # 2. Define Temporary Path
         # We always render to a .processing.mp4 in the same directory to allow atomic os.replace
-        input_p = Path(input_path)
-        temp_output = str(input_p.with_suffix(f".processing{input_p.suffix}"))
-        
-        success = False # Initialize success flag for the final commit phase
+        temp_output = get_processing_path(input_path)
+
+        # Read from the local prefetched copies when available
+        source_path, source_srt = input_path, srt_path
+        if self.prefetcher:
+            source_path = self.prefetcher.fetch(input_path)
+            if srt_path:
+                source_srt = self.prefetcher.fetch(srt_path)
         
+        sliced_srt = None
         try:
+            input_args = None
+            if trimmed:
+                input_args = _range_args(start, end)
+                if source_srt:
+                    # Only the cues of the kept range, rebased to its start
+                    source_srt = sliced_srt = self._slice_subtitles(source_srt, start, end)
+
+            # Fragments left by an interrupted run: only encode what is missing
+            resume_key = (self._resume_key(input_path, srt_path, logo_path)
+                          if self.fragmented and not trimmed and not thumbnails else None)
+            resumed = (resume_key is not None and os.path.exists(temp_output)
+                       and self._resume_fragmented(source_path, temp_output, source_srt, logo_path,
+                                                   progress_callback, expected_duration, resume_key))
+
             # Single GPU Pass - Strict Contract
             # No retries, no fallback. If this fails, it fails.
-            self._run_pass(input_path, temp_output, srt_path, logo_path, progress_callback)
-            
-            # 3. Post-Processing Validation
-            if validate_output_video(temp_output, codec=self.compressor.codec):
-                success = True
-            else:
-                raise RuntimeError("Output validation failed (file missing or too small).")
-                
+            started = time.monotonic()
+            if not resumed:
+                if resume_key is not None:
+                    _write_resume_key(temp_output, resume_key)
+                self._run_pass(source_path, temp_output, source_srt, logo_path, progress_callback,
+                               thumbnails=thumbnails, input_args=input_args, duration=expected_duration)
+            if self.predictor and not resumed:
+                self.predictor.record_encode(self, input_path, temp_output, expected_duration,
+                                             time.monotonic() - started)
         except Exception as e:
             logger.error(f"GPU Processing failed: {e}")
-            # Strict Cleanup on Failure
-            if os.path.exists(temp_output):
-                try:
-                    os.remove(temp_output)
-                except OSError:
-                    pass
+            self._discard(temp_output, thumbnails)
+            self._release_prefetched(input_path, srt_path)
+            raise e
+        finally:
+            if sliced_srt:
+                shutil.rmtree(os.path.dirname(sliced_srt), ignore_errors=True)
+
+        # A trimmed output no longer shares the source's timeline
+        kept_settings = self._render_settings(logo_path) if self.keep_sources and not trimmed else None
+        return input_path, temp_output, srt_path, thumbnails, expected_duration, kept_settings
+
+    def _finalize(self, input_path: str, temp_output: str, srt_path: str = None,
+                  thumbnails: ThumbnailSpec = None, expected_duration: float = None,
+                  kept_settings: dict = None) -> None:
+        """
+        Validate the temp output and commit it over the original.
+        With `kept_settings` (see _render_settings) the clean source is kept for rerender_subtitles.
+        """
+        from ..core.utils import validate_output_video
+
+        # 3. Post-Processing Validation
+        try:
+            if not validate_output_video(temp_output, codec=self.compressor.codec,
+                                         expected_duration=expected_duration,
+                                         tolerance=self._duration_tolerance(input_path, expected_duration)):
+                raise RuntimeError("Output validation failed (truncated, corrupt or missing output).")
+        except Exception as e:
+            logger.error(f"Validation failed: {e}")
+            self._discard(temp_output, thumbnails)
+            self._release_prefetched(input_path, srt_path)
             raise e
 
+        if self.fragmented and Config.FRAGMENT_FASTSTART:
+            self._faststart(temp_output)
+
         # 4. Final Commit Phase
-        if success:
+        try:
+            # 4.1 Ensure temp_output is released one last time (just in case)
+            # and ensure original input_path is released (e.g. if Explorer locked it)
+            from ..core.utils import wait_for_file_release, safe_replace
+            if self.commit_callback:
+                self.commit_callback(input_path)
+            logger.info(f"Commit: Ensuring both files are released before atomic swap.")
+            wait_for_file_release(temp_output, codec=self.compressor.codec, min_size_mb=0)
+            wait_for_file_release(input_path, min_size_mb=0)
+            
+            if kept_settings is not None:
+                # Before the replace: the clean source is linked, not copied, where possible
+                smart_render.keep_source(input_path, srt_path, kept_settings)
+            backup = self.retention.preserve(input_path, srt_path) if self.retention else None
+
+            # Atomic Replacement with Retry Logic
+            logger.info(f"Commit: Replacing original {input_path} with processed version.")
             try:
-                # 4.1 Ensure temp_output is released one last time (just in case)
-                # and ensure original input_path is released (e.g. if Explorer locked it)
-                from ..core.utils import wait_for_file_release, safe_replace
-                logger.info(f"Commit: Ensuring both files are released before atomic swap.")
-                wait_for_file_release(temp_output, codec=self.compressor.codec)
-                wait_for_file_release(input_path)
-                
-                # Atomic Replacement
-                # Atomic Replacement with Retry Logic
-                logger.info(f"Commit: Replacing original {input_path} with processed version.")
                 safe_replace(temp_output, input_path)
+            except Exception:
+                if kept_settings is not None:
+                    smart_render.drop_source(input_path)
+                if backup:
+                    self.retention.discard(backup)
+                raise
+            _remove_resume_key(temp_output)
+            
+            # Conditional SRT Deletion
+            if srt_path and os.path.exists(srt_path):
+                logger.info(f"Cleanup: Ensuring subtitle file is released before deletion.")
+                wait_for_file_release(srt_path, min_size_mb=0)
+                os.remove(srt_path)
                 
-                # Conditional SRT Deletion
-                if srt_path and os.path.exists(srt_path):
-                    logger.info(f"Cleanup: Ensuring subtitle file is released before deletion.")
-                    wait_for_file_release(srt_path)
-                    os.remove(srt_path)
-                    
-            except Exception as e:
-                logger.error(f"Failed to commit final changes: {e}")
-                if os.path.exists(temp_output):
-                    os.remove(temp_output)
-                raise e
-        else:
-            # Should not reach here if success is False and no exception was raised, 
-            # but for safety:
+        except Exception as e:
+            logger.error(f"Failed to commit final changes: {e}")
             if os.path.exists(temp_output):
                 os.remove(temp_output)
+            raise e
+        finally:
+            # The original was replaced (or the job failed): local copies are stale or unneeded
+            self._release_prefetched(input_path, srt_path, discard=True)
+
+        if self.retention:
+            try:
+                self.retention.prune()
+            except OSError as e:
+                logger.warning(f"Retention: pruning failed: {e}")
+
+    def _resume_key(self, input_path: str, srt_path: str = None, logo_path: str = None) -> dict:
+        """What a fragmented encode of `input_path` is made from; resuming one needs the same."""
+        return json.loads(json.dumps({
+            'source': file_signature(input_path),
+            'subtitles': file_signature(srt_path) if srt_path else None,
+            'settings': self._render_settings(logo_path),
+        }))
+
+    def _resume_fragmented(self, source_path: str, temp_output: str, srt_path: str = None, logo_path: str = None,
+                           progress_callback=None, duration: float = None, resume_key: dict = None) -> bool:
+        """
+        Continue an interrupted fragmented encode: the complete fragments already in
+        `temp_output` are kept, only the rest of the source is encoded, and both parts
+        are joined by stream copy. Returns False when nothing worth keeping was left,
+        or when the fragments were not made from `resume_key` (see _resume_key).
+        """
+        import tempfile
+        if _read_resume_key(temp_output) != resume_key:
+            logger.info(f"Resume: {temp_output} was made from another source, subtitles or settings")
+            return False
+        try:
+            kept = fmp4.truncate_incomplete(temp_output)
+        except (OSError, struct.error) as e:
+            logger.warning(f"Cannot reuse partial output {temp_output}: {e}")
+            return False
+        # The last fragment's audio can run ahead of its video: continue after the video
+        done = kept.video_duration
+        if not kept.fragmented or not duration or done < Config.FRAGMENT_RESUME_MIN_SECONDS:
+            return False
+        if done >= duration - Config.DURATION_TOLERANCE_SEC:
+            logger.info(f"Resume: {temp_output} is already complete ({done:.1f}s)")
+            return True
+
+        logger.info(f"Resume: keeping {done:.1f}s of {duration:.1f}s from the interrupted encode")
+        base, extension = os.path.splitext(temp_output)
+        head, tail = f"{base}.head{extension}", f"{base}.tail{extension}"
+        os.replace(temp_output, head)
+        window_srt = self._slice_subtitles(srt_path, done) if srt_path else None
+        list_path = None
+        try:
+            callback = _segment_progress(progress_callback, duration, done, duration - done, duration)
+            self._run_pass(source_path, tail, window_srt, logo_path, callback,
+                           input_args=['-y'] + _range_args(done), duration=duration - done)
+            fd, list_path = tempfile.mkstemp(suffix=".ffconcat")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                # The outpoint drops the head's audio past `done`; the tail encodes it again
+                f.write(smart_render.concat_list([(0.0, done, False), (done, duration, True)], head,
+                                                 {done: tail}))
+            self.executor.run(['-y', '-f', 'concat', '-safe', '0', '-i', list_path, '-map', '0', '-c', 'copy',
+                               '-movflags', fmp4.FRAGMENT_MOVFLAGS, temp_output])
+        finally:
+            for path in (head, tail, list_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            if window_srt:
+                shutil.rmtree(os.path.dirname(window_srt), ignore_errors=True)
+        return True
+
+    def _faststart(self, temp_output: str) -> None:
+        """
+        Remux a validated fragmented output into a regular MP4 with the moov up front.
+        On failure the fragmented file is committed as it is.
+        """
+        base, extension = os.path.splitext(temp_output)
+        remuxed = f"{base}.faststart{extension}"
+        try:
+            # Runs on the validation pool while the next encode may use self.executor
+            FFmpegExecutor(self.executor.executable).run(
+                ['-y', '-i', temp_output, '-map', '0', '-c', 'copy', '-movflags', '+faststart', remuxed])
+            os.replace(remuxed, temp_output)
+        except Exception as e:
+            logger.warning(f"Faststart remux failed, keeping the fragmented output: {e}")
+            if os.path.exists(remuxed):
+                os.remove(remuxed)
+
+    def _render_remote(self, source_url: str, output_url: str = None, logo_path: str = None,
+                       progress_callback=None, start: float = None, end: float = None) -> tuple:
+        """
+        Encode an object from S3-compatible storage while uploading the result.
+        FFmpeg reads the source through a presigned URL (its HTTP reader seeks with
+        Range requests; nothing is downloaded up front), which is probed once.
+        MP4/MOV outputs are written as fragmented MP4 to a local scratch file, and
+        their bytes stream into a multipart upload as they appear. Other containers
+        (e.g. Matroska) rewrite their header when they finish, so they are uploaded
+        only after validation. `output_url` defaults to the source object.
+        Returns the arguments for _finalize_remote.
+        """
+        import tempfile
+        from ..core import storage
+
+        client = self.storage or storage.S3Client.from_config()
+        bucket, key = storage.parse_s3_url(source_url)
+        output_url = output_url if is_remote(output_url) else source_url
+        output_object = storage.parse_s3_url(output_url)
+        if logo_path:
+            logo_path = os.path.abspath(logo_path)
+        logger.info(f"Processing remote video: {source_url} -> {output_url}")
+
+        input_url = client.presign("GET", bucket, key)
+        try:
+            # Every stage (duration, normalization, audio policy) reuses this one network probe
+            info = probe_media(input_url)
+        except Exception as e:
+            logger.warning(f"Could not probe {source_url}: {e}")
+            info = None
+        expected_duration = duration_of(info) if info else None
+        trimmed = start is not None or end is not None
+        if trimmed:
+            source_duration = expected_duration
+            expected_duration = kept_duration(source_duration, start, end)
+            if expected_duration is not None and expected_duration <= 0:
+                raise ValueError(f"Empty range {start}-{end} for {source_url} ({source_duration}s)")
+            progress_callback = _range_progress(progress_callback, source_duration, expected_duration)
+
+        scratch_dir = tempfile.mkdtemp(prefix="remote_")
+        temp_output = os.path.join(scratch_dir, get_processing_path(posixpath.basename(output_object[1])))
+        # Only fragmented MP4 is append-only, which is what tail uploading requires
+        streamed = os.path.splitext(temp_output)[1].lower() in fmp4.FRAGMENTABLE_EXTENSIONS
+        srt_key, srt_path = self._fetch_remote_subtitles(client, bucket, key, scratch_dir)
+        sliced_srt = None
+        upload = None
+        try:
+            if trimmed and srt_path:
+                srt_path = sliced_srt = self._slice_subtitles(srt_path, start, end)
+            input_args = _range_args(start, end) if trimmed else None
+            if not streamed:
+                self._run_pass(input_url, temp_output, srt_path, logo_path, progress_callback,
+                               input_args=input_args, duration=expected_duration, probe_info=info,
+                               fragmented=False)
+            else:
+                upload = storage.MultipartUpload(client, *output_object)
+                tail = storage.FileTailUploader(temp_output, upload).start()
+                try:
+                    self._run_pass(input_url, temp_output, srt_path, logo_path, progress_callback,
+                                   input_args=input_args, duration=expected_duration, probe_info=info,
+                                   fragmented=True)
+                finally:
+                    # Drains what FFmpeg wrote, also after a failure (the upload is aborted below)
+                    tail.finish()
+        except Exception as e:
+            logger.error(f"Remote processing failed: {e}")
+            if upload:
+                upload.abort()
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            raise e
+        finally:
+            if sliced_srt:
+                shutil.rmtree(os.path.dirname(sliced_srt), ignore_errors=True)
+
+        srt_object = (bucket, srt_key) if srt_key else None
+        tolerance = self._duration_tolerance(input_url, expected_duration, info) if info else None
+        return client, output_object, upload, temp_output, scratch_dir, srt_object, expected_duration, tolerance
+
+    def _finalize_remote(self, client, output_object: tuple, upload, temp_output: str, scratch_dir: str,
+                         srt_object: tuple = None, expected_duration: float = None,
+                         tolerance: float = None) -> None:
+        """
+        Validate the local copy of the output, then publish the object: complete the
+        streamed upload, or upload the file now (`upload` is None). Aborts on failure.
+        """
+        from ..core import storage
+        from ..core.utils import validate_output_video
+        try:
+            if not validate_output_video(temp_output, codec=self.compressor.codec,
+                                         expected_duration=expected_duration, tolerance=tolerance):
+                raise RuntimeError("Output validation failed (truncated, corrupt or missing output).")
+            if self.commit_callback:
+                self.commit_callback(f"s3://{output_object[0]}/{output_object[1]}")
+            if upload is None:
+                upload = storage.MultipartUpload(client, *output_object)
+                upload.write_file(temp_output)
+            # Completing the upload replaces the object atomically
+            upload.complete()
+            if srt_object:
+                logger.info(f"Cleanup: Deleting subtitle object {srt_object[0]}/{srt_object[1]}")
+                client.delete(*srt_object)
+        except Exception as e:
+            logger.error(f"Failed to publish remote output: {e}")
+            if upload:
+                upload.abort()
+            raise e
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    @staticmethod
+    def _fetch_remote_subtitles(client, bucket: str, key: str, directory: str) -> tuple:
+        """Download '<stem>[_lang].srt' next to the object, like find_srt_file. Returns (key, local path)."""
+        stem = posixpath.splitext(key)[0]
+        for suffix in ('', '_eng', '_ar', '_en', '_ar_auto'):
+            srt_key = f"{stem}{suffix}.srt"
+            if client.head(bucket, srt_key) is not None:
+                logger.info(f"Found remote subtitles: {bucket}/{srt_key}")
+                return srt_key, client.download(bucket, srt_key, os.path.join(directory, posixpath.basename(srt_key)))
+        return None, None
+
+    def _release_prefetched(self, input_path: str, srt_path: str = None, discard: bool = False) -> None:
+        if not self.prefetcher:
+            return
+        self.prefetcher.release(input_path, discard=discard)
+        if srt_path:
+            self.prefetcher.release(srt_path, discard=discard)
+
+    @staticmethod
+    def _discard(temp_output: str, thumbnails: ThumbnailSpec = None) -> None:
+        """Strict Cleanup on Failure."""
+        if thumbnails:
+            thumbnails.cleanup()
+        _remove_resume_key(temp_output)
+        if os.path.exists(temp_output):
+            try:
+                os.remove(temp_output)
+            except OSError:
+                pass
+
+    def process_variants(self, input_path: str, specs: List[OutputSpec], progress_callback=None) -> None:
+        """
+        Render several outputs (resolution ladder, language variants) from one decode.
+        Each output is rendered to its own '.processing' temp file (or staging
+        directory for HLS/DASH packages), validated, and only then moved to its
+        final path. The input is never modified.
+        """
+        input_path = os.path.abspath(input_path)
+        from ..core.utils import validate_output_video, safe_replace
+
+        # Render into temp paths so a failed pass never leaves half-written outputs
+        temp_specs = []
+        for spec in specs:
+            final_path = os.path.abspath(spec.output_path)
+            if spec.packager:
+                temp_output = spec.packager.staging_path(final_path)
+            else:
+                temp_output = get_processing_path(final_path)
+            temp_specs.append((spec, final_path, temp_output))
+
+        def cleanup():
+            for spec, _, temp_output in temp_specs:
+                if spec.packager:
+                    spec.packager.cleanup(temp_output)
+                elif os.path.exists(temp_output):
+                    try:
+                        os.remove(temp_output)
+                    except OSError:
+                        pass
+
+        pass_specs = []
+        for spec, final_path, temp_output in temp_specs:
+            pass_spec = spec.with_output(temp_output)
+            if pass_spec.logo_path:
+                pass_spec.logo_path = os.path.abspath(pass_spec.logo_path)
+            if pass_spec.thumbnails:
+                pass_spec.thumbnails = pass_spec.thumbnails.for_video(final_path)
+            pass_specs.append(pass_spec)
+
+        expected_duration = self._probe_duration(input_path)
+        tolerance = self._duration_tolerance(input_path, expected_duration)
+        try:
+            self._run_pass(input_path, pass_specs, progress_callback=progress_callback)
+            for spec, _, temp_output in temp_specs:
+                if spec.packager:
+                    valid = spec.packager.validate(temp_output)
+                else:
+                    codec = (spec.compressor or self.compressor).codec
+                    valid = validate_output_video(temp_output, codec=codec,
+                                                  expected_duration=expected_duration, tolerance=tolerance)
+                if not valid:
+                    raise RuntimeError(f"Output validation failed for {temp_output}.")
+        except Exception as e:
+            logger.error(f"Multi-output pass failed: {e}")
+            cleanup()
+            raise e
+
+        for spec, final_path, temp_output in temp_specs:
+            logger.info(f"Commit: Moving variant into place: {final_path}")
+            if spec.packager:
+                spec.packager.commit(temp_output, final_path)
+            else:
+                safe_replace(temp_output, final_path)
+
+    def preview(self, input_path: str, logo_path: str = None, scratch_dir: str = None,
+                window: float = None) -> List[str]:
+        """
+        Render short sample windows (start, middle, end and the busiest subtitle cue)
+        with the exact filter graph and encoder, but a fast preset, into a scratch
+        directory. Lets bad fonts, logo placement or broken SRTs be spotted before
+        a full encode overwrites the original. The input is never modified.
+        Returns the preview file paths.
+        """
+        import asyncio
+        import tempfile
+        from ..core.srt import parse_srt
+
+        input_path = os.path.abspath(input_path)
+        if logo_path:
+            logo_path = os.path.abspath(logo_path)
+        window = window or Config.PREVIEW_WINDOW
+        scratch_dir = scratch_dir or tempfile.mkdtemp(prefix="preview_")
+        os.makedirs(scratch_dir, exist_ok=True)
+
+        duration = get_duration(input_path)
+        if not duration:
+            raise RuntimeError(f"Cannot preview {input_path}: duration is unknown.")
+        srt_path = find_srt_file(input_path)
+
+        # 1. Pick the windows
+        last_start = max(duration - window, 0.0)
+        windows = {
+            "start": 0.0,
+            "middle": duration / 2 - window / 2,
+            "end": last_start,
+        }
+        if srt_path:
+            try:
+                cues = parse_srt(srt_path)
+            except (OSError, UnicodeDecodeError) as e:
+                raise RuntimeError(f"Subtitle file is unreadable: {srt_path} ({e})")
+            if not cues:
+                raise RuntimeError(f"Subtitle file has no valid cues: {srt_path}")
+            busiest = max(cues, key=lambda cue: len(cue.text))
+            windows["subtitle"] = busiest.start
+        index = self._cached_index(input_path, scenes=Config.INDEX_SCENES)
+        if index and index.scene_cuts():
+            # The hardest cut: encoder and subtitle timing both show up there
+            windows["scene"] = max(index.scene_cuts(), key=lambda cut: cut[1])[0]
+
+        # 2. Same graph and codec, fast preset
+        fast_preset = Config.PREVIEW_NVENC_PRESET if 'nvenc' in self.compressor.codec else Config.PREVIEW_X265_PRESET
+        compressor = Compressor(quality=self.compressor.quality, preset=fast_preset, codec=self.compressor.codec)
+
+        stem = Path(input_path).stem
+        commands, outputs, seen, sliced = [], [], set(), []
+        for label, start in windows.items():
+            start = min(max(start, 0.0), last_start)
+            if index:
+                # Start on a keyframe: the seek lands there and nothing is decoded in vain
+                start = index.snap(start, window / 2)
+            start = round(start, 3)
+            if start in seen:
+                continue  # Short videos: windows collapse onto each other
+            seen.add(start)
+
+            output = os.path.join(scratch_dir, f"{stem}_preview_{label}.mp4")
+            window_srt = self._slice_subtitles(srt_path, start, start + window) if srt_path else None
+            if window_srt:
+                sliced.append(window_srt)
+            spec = OutputSpec(output, srt_path=window_srt, logo_path=logo_path, compressor=compressor)
+            input_args = ['-y'] + _range_args(start, start + window)
+            commands.append(self._build_command(input_path, [spec], input_args=input_args,
+                                                measure_loudness=False))
+            outputs.append(output)
+
+        # 3. Render the windows concurrently under one event loop
+        async def render_all():
+            limit = asyncio.Semaphore(Config.PREVIEW_MAX_PARALLEL)
+
+            async def render(args):
+                async with limit:
+                    return await FFmpegExecutor(self.executor.executable).run_async(
+                        args, stall_timeout=_stall_timeout(input_path))
+
+            await asyncio.gather(*[render(args) for args in commands])
+
+        logger.info(f"Rendering {len(commands)} preview windows into {scratch_dir}")
+        try:
+            asyncio.run(render_all())
+        finally:
+            for window_srt in sliced:
+                shutil.rmtree(os.path.dirname(window_srt), ignore_errors=True)
+        return outputs
+
+    def sample_encode(self, input_path: str, seconds: float) -> tuple:
+        """
+        Encode `seconds` from the middle of the input with this pipeline's graph and
+        encoder into a scratch file. Returns (media seconds, wall seconds, output bytes).
+        """
+        import tempfile
+
+        input_path = os.path.abspath(input_path)
+        duration = self._probe_duration(input_path)
+        if not duration:
+            raise RuntimeError(f"Cannot sample {input_path}: duration is unknown.")
+        seconds = min(seconds, duration)
+        start = max(duration / 2 - seconds / 2, 0.0)
+        index = self._cached_index(input_path)
+        if index:
+            start = index.snap(start, seconds / 2)
+        start = round(start, 3)
+
+        scratch_dir = tempfile.mkdtemp(prefix="sample_")
+        srt_path = find_srt_file(input_path)
+        window_srt = None
+        try:
+            window_srt = self._slice_subtitles(srt_path, start, start + seconds) if srt_path else None
+            output = os.path.join(scratch_dir, f"sample{Path(input_path).suffix}")
+            spec = OutputSpec(output, srt_path=window_srt)
+            cmd = self._build_command(input_path, [spec], input_args=['-y'] + _range_args(start, start + seconds),
+                                      measure_loudness=False)
+            started = time.monotonic()
+            FFmpegExecutor(self.executor.executable).run(cmd, stall_timeout=_stall_timeout(input_path))
+            wall_seconds = time.monotonic() - started
+            return seconds, wall_seconds, os.path.getsize(output)
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+            if window_srt:
+                shutil.rmtree(os.path.dirname(window_srt), ignore_errors=True)
+
+    def rerender_subtitles(self, rendered_path: str, srt_path: str = None, logo_path: str = None,
+                           progress_callback=None) -> smart_render.RenderPlan:
+        """
+        Apply a corrected SRT to an already rendered video. The old and new cues are
+        diffed; only the GOPs of the rendered video that overlap a changed cue are
+        re-encoded from the kept clean source (see keep_sources) and spliced between
+        stream-copied GOPs. Larger changes fall back to a full encode of the source.
+        `srt_path` defaults to the SRT next to the video, which is removed on success.
+        The logo and settings the video was rendered with are reused (`logo_path`, if
+        given, must be that logo); without them nothing is spliced.
+        Returns the applied RenderPlan.
+        """
+        import tempfile
+        from ..core.srt import parse_srt, changed_ranges
+        from ..core.probe import probe_keyframes
+        from ..core.utils import validate_output_video, wait_for_file_release, safe_replace
+
+        rendered_path = os.path.abspath(rendered_path)
+        if logo_path:
+            logo_path = os.path.abspath(logo_path)
+        source_path, old_srt = smart_render.find_kept_source(rendered_path)
+        if not source_path:
+            raise RuntimeError(f"No clean source kept for {rendered_path}; "
+                               f"it must be rendered with keep_sources enabled first.")
+        # Re-encoded GOPs sit between copied ones: they must get the same logo, filters and encoder
+        settings = smart_render.kept_settings(rendered_path)
+        if settings is None:
+            raise RuntimeError(f"The render settings of {rendered_path} were not kept; "
+                               f"re-encoded parts would not match the rest.")
+        kept_logo = settings['logo_path']
+        if logo_path and logo_path != kept_logo:
+            raise RuntimeError(f"{rendered_path} was rendered with logo {kept_logo}, not {logo_path}.")
+        if kept_logo and not os.path.exists(kept_logo):
+            raise RuntimeError(f"Logo {kept_logo} used to render {rendered_path} no longer exists.")
+        if self._render_settings(kept_logo) != settings:
+            return self._with_render_settings(settings).rerender_subtitles(
+                rendered_path, srt_path, kept_logo, progress_callback)
+        logo_path = kept_logo
+        discovered = srt_path is None
+        srt_path = srt_path or find_srt_file(rendered_path)
+        if not srt_path:
+            raise RuntimeError(f"No subtitle file found for {rendered_path}")
+        try:
+            new_cues = parse_srt(srt_path)
+            old_cues = parse_srt(old_srt) if old_srt else []
+        except (OSError, UnicodeDecodeError) as e:
+            raise RuntimeError(f"Subtitle file is unreadable: {e}")
+
+        duration = self._probe_duration(rendered_path)
+        if not duration:
+            raise RuntimeError(f"Cannot re-render {rendered_path}: duration is unknown.")
+        ranges = changed_ranges(old_cues, new_cues)
+        if self.subtitle_mode == "burn":
+            plan = smart_render.plan_segments(probe_keyframes(rendered_path), duration, ranges)
+        else:
+            # Soft subtitles never touch the pixels: a full pass is already a remux
+            plan = smart_render.RenderPlan(duration, [(0.0, duration, True)] if ranges else [])
+        logger.info(f"Smart render: {len(ranges)} changed range(s) in {rendered_path} -> {plan}")
+
+        temp_output = get_processing_path(rendered_path)
+        scratch_dir = tempfile.mkdtemp(prefix="smart_render_")
+        try:
+            if not plan.reencode_seconds:
+                logger.info("Smart render: subtitles are unchanged, nothing to encode")
+            elif plan.reencode_ratio > Config.SMART_RENDER_MAX_RATIO or self.subtitle_mode != "burn":
+                logger.info("Smart render: re-encoding the whole video")
+                self._run_pass(source_path, temp_output, srt_path, logo_path, progress_callback,
+                               duration=duration)
+            else:
+                self._splice_segments(source_path, rendered_path, temp_output, plan, srt_path, logo_path,
+                                      scratch_dir, progress_callback)
+
+            if os.path.exists(temp_output):
+                if not validate_output_video(temp_output, codec=self.compressor.codec, expected_duration=duration,
+                                             tolerance=self._duration_tolerance(source_path, duration)):
+                    raise RuntimeError("Output validation failed (truncated, corrupt or missing output).")
+                wait_for_file_release(temp_output, codec=self.compressor.codec, min_size_mb=0)
+                wait_for_file_release(rendered_path, min_size_mb=0)
+                logger.info(f"Commit: Replacing {rendered_path} with the re-rendered version.")
+                safe_replace(temp_output, rendered_path)
+        except Exception as e:
+            logger.error(f"Smart render failed: {e}")
+            self._discard(temp_output)
+            raise e
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+        smart_render.update_kept_subtitles(rendered_path, srt_path)
+        if discovered and os.path.exists(srt_path):
+            wait_for_file_release(srt_path, min_size_mb=0)
+            os.remove(srt_path)
+        return plan
+
+    def _splice_segments(self, source_path: str, rendered_path: str, temp_output: str,
+                         plan: smart_render.RenderPlan, srt_path: str, logo_path: str = None,
+                         scratch_dir: str = None, progress_callback=None) -> None:
+        """Re-encode the dirty segments of `plan` from the source and splice them into a copy of the rendered video."""
+        source_duration = self._probe_duration(source_path)
+        extension = Path(rendered_path).suffix
+        encoded, done = {}, 0.0
+        for start, end, reencode in plan.segments:
+            if not reencode:
+                continue
+            segment = os.path.join(scratch_dir, f"segment_{len(encoded):04d}{extension}")
+            window_srt = self._slice_subtitles(srt_path, start, end)
+            try:
+                spec = OutputSpec(segment, srt_path=window_srt, logo_path=logo_path)
+                cmd = self._build_command(source_path, [spec], input_args=['-y'] + _range_args(start, end),
+                                          measure_loudness=False)
+                # Video only: the audio is copied from the rendered video in one piece
+                cmd.insert(len(cmd) - 1, '-an')
+                callback = _segment_progress(progress_callback, source_duration, done, end - start,
+                                             plan.reencode_seconds)
+                self._encode(source_path, cmd, callback)
+            finally:
+                if window_srt:
+                    shutil.rmtree(os.path.dirname(window_srt), ignore_errors=True)
+            encoded[start] = segment
+            done += end - start
+
+        list_path = os.path.join(scratch_dir, "segments.ffconcat")
+        with open(list_path, 'w', encoding='utf-8') as f:
+            f.write(smart_render.concat_list(plan.segments, rendered_path, encoded))
+        logger.info(f"Smart render: splicing {len(encoded)} re-encoded of {len(plan.segments)} segments")
+        self.executor.run([
+            '-y', '-f', 'concat', '-safe', '0', '-i', list_path, '-i', rendered_path,
+            '-map', '0:v', '-map', '1:a?', '-c', 'copy', temp_output
+        ])
+
+    def _run_pass(self, input_path: str, output_path, srt_path: str = None, logo_path: str = None, progress_callback=None,
+                  thumbnails: ThumbnailSpec = None, input_args: list = None, duration: float = None,
+                  probe_info: dict = None, fragmented: bool = None):
+        """
+        Internal method to build and run the command.
+        `output_path` is either a single path (with `srt_path`/`logo_path`/`thumbnails`)
+        or a list of OutputSpec; in the latter case one decode feeds every output.
+        `input_args`/`duration` describe a trimmed range (see _range_args).
+        `probe_info` is the input's probe result, when the caller already has it.
+        `fragmented` overrides self.fragmented for this pass.
+        """
+        if isinstance(output_path, (list, tuple)):
+            specs = list(output_path)
+        else:
+            specs = [OutputSpec(output_path, srt_path=srt_path, logo_path=logo_path, thumbnails=thumbnails)]
+        if not specs:
+            raise ValueError("At least one output is required.")
+
+        cmd_args = self._build_command(input_path, specs, input_args=input_args, probe_info=probe_info,
+                                       fragmented=fragmented)
+
+        # Execute
+        self._encode(input_path, cmd_args, progress_callback)
+
+        for spec in specs:
+            if spec.thumbnails:
+                spec.thumbnails.write_vtt(duration or self._probe_duration(input_path))
+            logger.info(f"Finished Pass: {spec.output_path}")
+
+    def _render_settings(self, logo_path: str = None) -> dict:
+        """Everything besides the SRT that shapes the rendered video (JSON-serializable)."""
+        return {
+            'logo_path': logo_path,
+            'watermark': {'position': self.watermark_processor.position,
+                          'opacity': self.watermark_processor.opacity},
+            'subtitle_mode': self.subtitle_mode,
+            'max_height': self.max_height,
+            'max_fps': self.max_fps,
+            'content_mode': self.content_mode,
+            'compressor': {'codec': self.compressor.codec, 'quality': self.compressor.quality,
+                           'preset': self.compressor.preset},
+            'audio': {'policy': self.audio_processor.policy, 'codec': self.audio_processor.codec,
+                      'bitrate': self.audio_processor.bitrate, 'mono': self.audio_processor.mono,
+                      'loudnorm': self.audio_processor.loudnorm},
+        }
+
+    def _with_render_settings(self, settings: dict) -> "VideoPipeline":
+        """A copy of this pipeline configured by `settings` (see _render_settings); shares the executor."""
+        import copy
+        pipeline = copy.copy(self)
+        pipeline.watermark_processor = WatermarkProcessor(**settings['watermark'])
+        pipeline.compressor = Compressor(**settings['compressor'])
+        pipeline.audio_processor = AudioProcessor(**settings['audio'])
+        for name in ('subtitle_mode', 'max_height', 'max_fps', 'content_mode'):
+            setattr(pipeline, name, settings[name])
+        return pipeline
+
+    def _encode(self, input_path: str, cmd: list, callback=None) -> None:
+        """
+        Run an encode of `input_path` on self.executor under the stall watchdog.
+        Remuxes and concats run unwatched: they report little progress while copying.
+        """
+        self.executor.run(cmd, callback=callback, stall_timeout=_stall_timeout(input_path))
+
+    def _keyframe_index(self, input_path: str, scenes: bool = False) -> media_index.MediaIndex | None:
+        """The cached keyframe index of a local input, or None if it cannot be built."""
+        if "://" in input_path:
+            return None
+        try:
+            return media_index.get_index(input_path, scenes=scenes)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"No keyframe index for {input_path}: {e}")
+            return None
+
+    def _cached_index(self, input_path: str, scenes: bool = False) -> media_index.MediaIndex | None:
+        """
+        The keyframe index of a local input if it is already cached, else None
+        (callers then seek by timestamp). A missing index, or missing scene scores
+        when `scenes`, is built in the background for the next call.
+        """
+        if "://" in input_path:
+            return None
+        try:
+            index = media_index.cached_index(input_path)
+            if index is None or (scenes and not index.has_scenes):
+                media_index.build_in_background(input_path, scenes=scenes)
+        except OSError as e:
+            logger.warning(f"No keyframe index for {input_path}: {e}")
+            return None
+        return index
+
+    def _starts_on_keyframe(self, input_path: str, inputs: list) -> bool:
+        """Whether the input seek in `inputs` (if any) lands exactly on a keyframe."""
+        if '-ss' not in inputs:
+            return True
+        index = self._keyframe_index(input_path)
+        return index is not None and index.is_keyframe(float(inputs[inputs.index('-ss') + 1]))
+
+    def _probe_duration(self, input_path: str) -> float | None:
+        """Input duration for derived outputs; None if it cannot be probed."""
+        try:
+            return get_duration(input_path)
+        except Exception as e:
+            logger.warning(f"Could not probe duration of {input_path}: {e}")
+            return None
+
+    def _duration_tolerance(self, input_path: str, expected_duration: float = None,
+                            info: dict = None) -> float | None:
+        """
+        Allowed output duration drift; None for the default of check_output_structure.
+        In lecture mode mpdecimate also drops a still ending (up to its max= frames),
+        and a silent output, with no audio track to span the rest, ends that much early.
+        """
+        if self.content_mode != "lecture" or not expected_duration:
+            return None
+        try:
+            stream = get_video_stream(info or probe_media(input_path)) or {}
+        except Exception as e:
+            logger.warning(f"Could not probe {input_path} for the lecture duration tolerance: {e}")
+            stream = {}
+        fps = _parse_rate(stream.get('avg_frame_rate')) or _parse_rate(stream.get('r_frame_rate'))
+        if fps and self.max_fps:
+            fps = min(fps, self.max_fps)
+        match = re.search(r"(?:^|:)max=(\d+)", Config.LECTURE_MPDECIMATE)
+        if not fps or not match or not int(match.group(1)):
+            # Unbounded dropping (or an unknown rate): any shortfall up to the whole video
+            return expected_duration
+        base = max(Config.DURATION_TOLERANCE_SEC, expected_duration * Config.DURATION_TOLERANCE_RATIO)
+        return base + (int(match.group(1)) + 1) / fps
+
+    @staticmethod
+    def _slice_subtitles(srt_path: str, start: float = None, end: float = None) -> str:
+        """
+        Write the cues of [start, end) rebased to 0 into a private temp directory,
+        keeping the file name (the language is read from it). Returns the new path,
+        or None when no cue falls inside the range.
+        """
+        import tempfile
+        from ..core.srt import parse_srt, slice_cues, write_srt
+
+        try:
+            cues = parse_srt(srt_path)
+        except (OSError, UnicodeDecodeError) as e:
+            raise RuntimeError(f"Subtitle file is unreadable: {srt_path} ({e})")
+        sliced = slice_cues(cues, start or 0.0, end)
+        logger.info(f"Subtitles: kept {len(sliced)} of {len(cues)} cues for the selected range")
+        if not sliced:
+            return None
+        return write_srt(sliced, os.path.join(tempfile.mkdtemp(prefix="srt_range_"), os.path.basename(srt_path)))
+
+    def _get_normalization(self, input_path: str, info: dict = None) -> dict | None:
+        """
+        Decide the resolution/frame-rate caps for this input (`info`: its probe result, if known).
+        Returns ScaleProcessor.get_filter keyword arguments, or None when the
+        source is already within the caps (or no caps are configured).
+        """
+        if not self.max_height and not self.max_fps:
+            return None
+
+        stream = None
+        try:
+            stream = get_video_stream(info or probe_media(input_path))
+        except Exception as e:
+            logger.warning(f"Could not probe {input_path} for normalization: {e}")
+
+        height = None
+        if self.max_height:
+            source_height = (stream or {}).get('height')
+            # Unknown height: the scale expression itself never upscales
+            if not source_height or int(source_height) > self.max_height:
+                height = self.max_height
+
+        fps = None
+        if self.max_fps:
+            # Only cap a known higher rate; an fps filter on a slower source would duplicate frames
+            source_fps = _parse_rate((stream or {}).get('avg_frame_rate')) or _parse_rate((stream or {}).get('r_frame_rate'))
+            if source_fps and source_fps > self.max_fps + 0.01:
+                fps = self.max_fps
+
+        if not height and not fps:
+            return None
+        logger.info(f"Normalizing to height<={height or 'source'}, fps<={fps or 'source'}")
+        return {'height': height, 'fps': fps}
+
+    def _build_command(self, input_path: str, specs: List[OutputSpec], input_args: list = None,
+                       measure_loudness: bool = True, probe_info: dict = None, fragmented: bool = None) -> list:
+        """
+        Build the full FFmpeg argument list for one decode feeding all `specs`.
+        `input_args` are placed before the main '-i' (e.g. seeking options).
+        `measure_loudness=False` never runs a (slow) loudness measurement.
+        `probe_info` replaces probing the input again (remote inputs).
+        `fragmented` overrides self.fragmented (MP4 outputs as fragmented MP4).
+        """
+        fragmented = self.fragmented if fragmented is None else fragmented
 
-    def _run_pass(self, input_path: str, output_path: str, srt_path: str = None, logo_path: str = None, progress_callback=None):
-        """Internal method to build and run the command."""
-        
         # 1. Prepare Inputs
-        inputs = ['-i', input_path]
-        
-        # Use provided srt_path if exists
-        # 3. Check for Watermark
-        has_watermark = logo_path and os.path.exists(logo_path)
-        logo_index = None
-        if has_watermark:
-            inputs.extend(['-i', logo_path])
-            # Logo is the second input (index 1)
-            logo_index = 1
-        
-        # 4. Build Filter Chain
+        budget = self.thread_budget
+        inputs = list(budget.global_args() + budget.input_args()) if budget else []
+        inputs += list(input_args or []) + ['-i', input_path]
+        input_count = 1
+        trimmed = '-ss' in inputs or '-t' in inputs
+
         filter_chains = []
-        current_stream = "[0:v]"
         stream_counter = 1
-        
-        # Step: Subtitles
-        if srt_path:
-            logger.info(f"Found subtitles: {srt_path}")
-            next_stream = f"[v{stream_counter}]"
-            filter_chains.append(
-                self.subtitle_processor.get_filter(current_stream, next_stream, srt_path)
-            )
-            current_stream = next_stream
-            stream_counter += 1
-            
-        # Step: Watermark
-        if has_watermark:
-            logger.info(f"Adding watermark: {logo_path}")
-            next_stream = f"[v{stream_counter}]"
-            filter_chains.append(
-                self.watermark_processor.get_filter(current_stream, logo_index, next_stream)
-            )
-            current_stream = next_stream
-            stream_counter += 1
-            
+        source_stream = "[0:v]"
+
+        # 2. Normalize first: everything downstream (subtitles, watermark, encoder)
+        # works on fewer, smaller frames and text is rendered at output resolution
+        normalize = self._get_normalization(input_path, probe_info)
+        if normalize:
+            filter_chains.append(self.scale_processor.get_filter(source_stream, "[n0]", **normalize))
+            source_stream = "[n0]"
+
+        # 3. Split the decoded video once per output branch
+        if len(specs) > 1:
+            branch_streams = [f"[b{i}]" for i in range(len(specs))]
+            filter_chains.append(f"{source_stream}split={len(specs)}{''.join(branch_streams)}")
+        else:
+            branch_streams = [source_stream]
+
+        # 4. Build one filter chain per branch
+        branch_outputs = []
+        for spec, current_stream in zip(specs, branch_streams):
+            branch_filters = []
+
+            # Step: Scale (ladder rung)
+            if spec.height:
+                next_stream = f"[v{stream_counter}]"
+                branch_filters.append(
+                    self.scale_processor.get_filter(current_stream, next_stream, spec.height)
+                )
+                current_stream = next_stream
+                stream_counter += 1
+
+            # Step: Subtitles (soft subtitles become an extra input instead of a filter)
+            subtitle_mode = spec.subtitle_mode or self.subtitle_mode
+            subtitle_index = None
+            if spec.srt_path and subtitle_mode == "mux":
+                logger.info(f"Muxing subtitles as a track: {spec.srt_path}")
+                inputs.extend(['-i', spec.srt_path])
+                subtitle_index = input_count
+                input_count += 1
+            elif spec.srt_path:
+                logger.info(f"Found subtitles: {spec.srt_path}")
+                next_stream = f"[v{stream_counter}]"
+                branch_filters.append(
+                    self.subtitle_processor.get_filter(current_stream, next_stream, spec.srt_path)
+                )
+                current_stream = next_stream
+                stream_counter += 1
+
+            # Step: Watermark
+            # Each branch gets its own logo input: a filter pad can only be consumed once.
+            if spec.logo_path and os.path.exists(spec.logo_path):
+                logger.info(f"Adding watermark: {spec.logo_path}")
+                inputs.extend(['-i', spec.logo_path])
+                logo_index = input_count
+                input_count += 1
+                next_stream = f"[v{stream_counter}]"
+                branch_filters.append(
+                    self.watermark_processor.get_filter(current_stream, logo_index, next_stream)
+                )
+                current_stream = next_stream
+                stream_counter += 1
+
+            # Step: Duplicate-frame dropping (lecture mode)
+            # Runs on the composited frames: a new cue or any visible change is a new
+            # frame, so subtitle timing and the watermark stay exact. Timestamps are kept.
+            if self.content_mode == "lecture":
+                next_stream = f"[v{stream_counter}]"
+                branch_filters.append(f"{current_stream}mpdecimate={Config.LECTURE_MPDECIMATE}{next_stream}")
+                current_stream = next_stream
+                stream_counter += 1
+
+            # Step: Thumbnails (split off the final stream, so they see exactly what is encoded)
+            thumb_args = []
+            if spec.thumbnails and spec.thumbnails.branch_count():
+                extra = [f"[t{stream_counter}_{n}]" for n in range(spec.thumbnails.branch_count())]
+                next_stream = f"[v{stream_counter}]"
+                branch_filters.append(f"{current_stream}split={len(extra) + 1}{next_stream}{''.join(extra)}")
+                thumb_filters, thumb_args = spec.thumbnails.get_outputs(extra)
+                branch_filters.extend(thumb_filters)
+                current_stream = next_stream
+                stream_counter += 1
+
+            filter_chains.extend(branch_filters)
+            branch_outputs.append((current_stream, thumb_args, subtitle_index))
+
         # 5. Assemble Command
         cmd_args = inputs.copy()
-        
-        # If we have filters, apply them and map the result
         if filter_chains:
-            cmd_args.extend([
-                '-filter_complex', ";".join(filter_chains),
-                '-map', current_stream,
-                '-map', '0:a'  # Keep original audio
-            ])
-        else:
-            # No filters, just map original
-            cmd_args.extend(['-map', '0:v', '-map', '0:a'])
-            
-        # 6. Add Compression/Encoding settings
-        cmd_args.extend(self.compressor.get_encoding_args())
-        
-        # 7. Output
-        cmd_args.append(output_path)
-        
-        # 8. Execute
-        try:
-            self.executor.run(cmd_args, callback=progress_callback)
-        finally:
-            pass
-        
-        logger.info(f"Finished Pass: {output_path}")
+            cmd_args.extend(['-filter_complex', ";".join(filter_chains)])
+
+        # 6. Image outputs come first so the (last) video output stays last on the command line
+        for _, thumb_args, _ in branch_outputs:
+            cmd_args.extend(thumb_args)
+
+        # 7. Per-output mapping, encoding settings and destination
+        # A URL cannot be measured cheaply (a whole extra download) or cached by signature
+        measure_loudness = measure_loudness and "://" not in input_path
+        audio_args = self.audio_processor.get_output_args(input_path, measure=measure_loudness, info=probe_info,
+                                                          executor=self.executor)
+        for spec, (stream, thumb_args, subtitle_index) in zip(specs, branch_outputs):
+            # Unfiltered branches map the original stream directly
+            video_map = '0:v' if stream == "[0:v]" else stream
+            # Optional audio map: inputs without audio must not fail
+            cmd_args.extend(['-map', video_map, '-map', '0:a?'])
+            compressor = spec.compressor or self.compressor
+
+            if subtitle_index is not None:
+                cmd_args.extend(['-map', f"{subtitle_index}:s"])
+                cmd_args.extend(self.subtitle_processor.get_mux_args(spec.srt_path, spec.output_path))
+
+            # Nothing touches the pixels: a soft-subtitle job is a pure remux
+            # (a trimmed one only if it starts on a keyframe: stream copy cannot cut elsewhere)
+            if (stream == "[0:v]" and subtitle_index is not None and not spec.packager
+                    and Config.SOFT_SUBTITLE_COPY_VIDEO
+                    and (not trimmed or self._starts_on_keyframe(input_path, inputs))):
+                cmd_args.extend(compressor.get_copy_args())
+            else:
+                static_content = self.content_mode == "lecture"
+                x265_params = budget.x265_params() if budget else None
+                cmd_args.extend(compressor.get_encoding_args(x265_params=x265_params, static_content=static_content))
+                if budget:
+                    cmd_args.extend(budget.output_args())
+                if static_content:
+                    # Dropped frames leave gaps: write variable frame rate instead of duplicating
+                    cmd_args.extend(['-fps_mode', 'vfr'])
+            cmd_args.extend(audio_args)
+            if fragmented and not spec.packager and \
+                    os.path.splitext(spec.output_path)[1].lower() in fmp4.FRAGMENTABLE_EXTENSIONS:
+                cmd_args.extend(['-movflags', fmp4.FRAGMENT_MOVFLAGS])
+            if spec.packager:
+                # Segments and manifests come straight out of the encoder
+                cmd_args.extend(spec.packager.get_keyframe_args(compressor.codec))
+                cmd_args.extend(spec.packager.get_output_args(spec.output_path))
+            else:
+                cmd_args.append(spec.output_path)
+
+        return cmd_args
+
+
+def _stall_timeout(input_path: str) -> float | None:
+    """Stall watchdog limit for an encode of `input_path`: remote inputs open and read slower."""
+    return Config.FFMPEG_STALL_TIMEOUT_REMOTE if "://" in input_path else Config.FFMPEG_STALL_TIMEOUT
+
+
+def _resume_key_path(temp_output: str) -> str:
+    key = hashlib.sha1(os.path.abspath(temp_output).encode('utf-8')).hexdigest()
+    return cache_path(key, ".resume.json")
+
+
+def _write_resume_key(temp_output: str, resume_key: dict) -> None:
+    try:
+        with open(_resume_key_path(temp_output), 'w', encoding='utf-8') as f:
+            json.dump(resume_key, f)
+    except OSError as e:
+        # Without it the fragments are encoded again instead of resumed
+        logger.warning(f"Could not record what {temp_output} is made from: {e}")
+
+
+def _read_resume_key(temp_output: str) -> dict | None:
+    try:
+        with open(_resume_key_path(temp_output), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove_resume_key(temp_output: str) -> None:
+    try:
+        os.remove(_resume_key_path(temp_output))
+    except OSError:
+        pass
+
+
+def _range_args(start: float = None, end: float = None) -> list:
+    """
+    Input options selecting [start, end). Seeking before '-i' jumps straight to
+    the nearest keyframe instead of decoding from the beginning; FFmpeg then
+    discards the decoded frames before `start`, so the cut is still frame-exact.
+    """
+    args = []
+    if start is not None:
+        args.extend(['-ss', str(round(start, 3))])
+    if end is not None:
+        args.extend(['-t', str(round(end - (start or 0.0), 3))])
+    return args
+
+
+def _range_progress(callback, source_duration: float = None, kept_duration: float = None):
+    """
+    FFmpeg reports progress against the full input duration; rescale it to the kept range.
+    """
+    if not callback or not source_duration or not kept_duration:
+        return callback
+    factor = source_duration / kept_duration
+    return lambda percent: callback(min(percent * factor, 99.0))
+
+
+def _segment_progress(callback, source_duration: float, offset: float, length: float, total: float):
+    """
+    Progress of one re-encoded segment (`length` seconds, after `offset` seconds
+    already done) as a share of all `total` re-encoded seconds.
+    """
+    if not callback or not source_duration or not total:
+        return callback
+
+    def report(percent):
+        encoded = min(percent / 100 * source_duration, length)
+        callback(min((offset + encoded) / total * 100, 99.0))
+    return report
+
+
+def _parse_rate(rate: str) -> float | None:
+    """'30000/1001' -> 29.97; None for missing or '0/0'."""
+    try:
+        value = float(Fraction(rate))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return value or None
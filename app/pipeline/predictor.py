@@ -0,0 +1,199 @@
+import os
+import json
+import shutil
+import logging
+import threading
+from fractions import Fraction
+from ..core.config import Config
+from ..core.probe import probe_media, get_video_stream, kept_duration
+
+logger = logging.getLogger(__name__)
+
+# Output heights that share encoder throughput history
+HEIGHT_BUCKETS = (360, 480, 720, 1080, 1440, 2160, 4320)
+
+
+class Estimate:
+    """Predicted temp output size (bytes) and encode wall time (seconds, None if unknown)."""
+
+    def __init__(self, output_bytes: int, seconds: float = None, source: str = "fallback"):
+        self.output_bytes = int(output_bytes)
+        self.seconds = seconds
+        # 'history', 'sample' or 'fallback' (no throughput data; size = a second copy of the input)
+        self.source = source
+
+    def __repr__(self):
+        seconds = f"{self.seconds:.0f}s" if self.seconds is not None else "unknown time"
+        return f"Estimate({self.output_bytes / 1048576:.0f} MB, {seconds}, from {self.source})"
+
+
+class Predictor:
+    """
+    Predicts each job's output size and encode time from probed metadata and
+    the measured throughput (fps) and output bitrate of past encodes with the
+    same encoder, output resolution and preset. Profiles without history are
+    measured once with a short sample encode of the real filter graph.
+    History is kept in Config.PREDICT_HISTORY_PATH.
+    """
+
+    # Weight of a new measurement in the running averages
+    ALPHA = 0.3
+
+    def __init__(self, history_path: str = None):
+        self.history_path = history_path or Config.PREDICT_HISTORY_PATH
+        self._lock = threading.Lock()
+        self._history = self._load()
+
+    # --- Estimation ---
+
+    def estimate(self, input_path: str, pipeline=None, start: float = None, end: float = None) -> Estimate:
+        """
+        Estimate the encode of `input_path` by `pipeline` (codec, preset and caps;
+        Config defaults without one). Unknown profiles are sampled with the
+        pipeline when Config.PREDICT_SAMPLE_SECONDS allows it.
+        """
+        try:
+            info = probe_media(input_path)
+            input_size = os.path.getsize(input_path)
+        except Exception as e:
+            logger.warning(f"Predictor: cannot probe {input_path}: {e}")
+            return Estimate(self._file_size(input_path))
+
+        try:
+            source_duration = float(info.get('format', {}).get('duration'))
+        except (TypeError, ValueError):
+            source_duration = None
+        duration = kept_duration(source_duration, start, end)
+        stream = get_video_stream(info) or {}
+        fallback_bytes = input_size * (duration / source_duration) if duration and source_duration else input_size
+        if not duration:
+            return Estimate(fallback_bytes)
+
+        key = self.profile_key(pipeline, stream.get('height'))
+        with self._lock:
+            entry = self._history.get(key)
+        source = "history"
+
+        if entry is None and pipeline is not None and Config.PREDICT_SAMPLE_SECONDS:
+            try:
+                media_seconds, wall_seconds, output_bytes = pipeline.sample_encode(
+                    input_path, Config.PREDICT_SAMPLE_SECONDS)
+                fps = media_seconds * _output_fps(stream, pipeline) / max(wall_seconds, 0.001)
+                entry = self.record(key, fps, output_bytes / media_seconds)
+                source = "sample"
+            except Exception as e:
+                logger.warning(f"Predictor: sample encode of {input_path} failed: {e}")
+
+        if entry is None:
+            return Estimate(fallback_bytes)
+
+        frames = duration * _output_fps(stream, pipeline)
+        return Estimate(entry['bytes_per_second'] * duration, frames / entry['fps'], source)
+
+    def batch_eta(self, estimates: list, workers: int = 1) -> float | None:
+        """Wall time for `estimates` spread over `workers` slots; None if any is unknown."""
+        if any(e.seconds is None for e in estimates):
+            return None
+        return sum(e.seconds for e in estimates) / max(workers, 1)
+
+    # --- History ---
+
+    @staticmethod
+    def profile_key(pipeline=None, source_height: int = None) -> str:
+        """(encoder, output resolution bucket, preset), e.g. 'hevc_nvenc|1080|p5'."""
+        if pipeline is not None:
+            codec, preset = pipeline.compressor.codec, pipeline.compressor.preset
+            max_height = pipeline.max_height
+        else:
+            codec = Config.DEFAULT_CODEC
+            preset = Config.NVENC_PRESET if 'nvenc' in codec else Config.X265_PRESET
+            max_height = Config.MAX_OUTPUT_HEIGHT
+        height = int(source_height or 1080)
+        if max_height:
+            height = min(height, max_height)
+        bucket = next((b for b in HEIGHT_BUCKETS if height <= b), HEIGHT_BUCKETS[-1])
+        return f"{codec}|{bucket}|{preset}"
+
+    def record(self, key: str, fps: float, bytes_per_second: float) -> dict:
+        """Fold one measured encode into the profile's running averages and persist them."""
+        with self._lock:
+            entry = self._history.get(key)
+            if entry is None:
+                entry = {'fps': fps, 'bytes_per_second': bytes_per_second, 'samples': 1}
+            else:
+                entry = {
+                    'fps': entry['fps'] + self.ALPHA * (fps - entry['fps']),
+                    'bytes_per_second': entry['bytes_per_second'] + self.ALPHA * (bytes_per_second - entry['bytes_per_second']),
+                    'samples': entry['samples'] + 1,
+                }
+            self._history[key] = entry
+            self._save()
+        logger.info(f"Predictor: {key} -> {entry['fps']:.1f} fps, {entry['bytes_per_second'] * 8 / 1000:.0f} kb/s")
+        return entry
+
+    def record_encode(self, pipeline, input_path: str, output_path: str, duration: float, wall_seconds: float) -> None:
+        """Learn from a finished encode (called by VideoPipeline after each pass)."""
+        if not duration or not wall_seconds or not os.path.exists(output_path):
+            return
+        try:
+            stream = get_video_stream(probe_media(input_path)) or {}
+        except Exception:
+            stream = {}
+        fps = duration * _output_fps(stream, pipeline) / wall_seconds
+        self.record(self.profile_key(pipeline, stream.get('height')), fps, os.path.getsize(output_path) / duration)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.history_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self) -> None:
+        try:
+            os.makedirs(os.path.dirname(self.history_path), exist_ok=True)
+            temp_path = self.history_path + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._history, f, indent=1)
+            os.replace(temp_path, self.history_path)
+        except OSError as e:
+            logger.warning(f"Predictor: could not save history: {e}")
+
+    # --- Disk Space ---
+
+    @staticmethod
+    def free_bytes(input_path: str) -> int:
+        """Free space where the temp output is written (next to the input)."""
+        return shutil.disk_usage(os.path.dirname(os.path.abspath(input_path))).free
+
+    @staticmethod
+    def required_bytes(estimate: Estimate) -> int:
+        """Space to keep free for a job: the estimate with a safety margin."""
+        return int(estimate.output_bytes * Config.DISK_SAFETY_MARGIN)
+
+    def fits(self, input_path: str, estimate: Estimate, reserved: int = 0) -> bool:
+        """Whether the temp output fits, leaving `reserved` bytes (in-flight jobs) and DISK_RESERVE_BYTES."""
+        available = self.free_bytes(input_path) - reserved - Config.DISK_RESERVE_BYTES
+        return self.required_bytes(estimate) <= available
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+
+def _output_fps(stream: dict, pipeline=None) -> float:
+    """Frame rate of the encoded output (source rate, capped like the pipeline does)."""
+    fps = None
+    for field in ('avg_frame_rate', 'r_frame_rate'):
+        try:
+            fps = float(Fraction(stream.get(field)))
+        except (TypeError, ValueError, ZeroDivisionError):
+            continue
+        if fps:
+            break
+    fps = fps or 30.0
+    max_fps = pipeline.max_fps if pipeline is not None else Config.MAX_OUTPUT_FPS
+    return min(fps, max_fps) if max_fps else fps
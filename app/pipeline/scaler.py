@@ -0,0 +1,19 @@
+class ScaleProcessor:
+    """Handles logic for resolution scaling and frame-rate capping."""
+
+    def __init__(self, flags: str = "lanczos"):
+        self.flags = flags
+
+    def get_filter(self, stream_in: str, stream_out: str, height: int = None, fps: float = None) -> str:
+        """
+        Generate scale (and optional fps) filter.
+        - Width follows the aspect ratio (rounded to an even value for the encoder).
+        - Never upscales: sources shorter than `height` keep their size.
+        - `fps` drops frames before scaling, so fewer frames are scaled.
+        """
+        steps = []
+        if fps:
+            steps.append(f"fps=fps={fps:g}")
+        if height:
+            steps.append(f"scale=-2:'min({int(height)},ih)':flags={self.flags}")
+        return f"{stream_in}{','.join(steps)}{stream_out}"
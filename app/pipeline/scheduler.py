@@ -0,0 +1,467 @@
+import os
+import heapq
+import itertools
+import logging
+import math
+import threading
+from ..core.config import Config
+from ..core.ffmpeg import FFmpegStallError, FFmpegCancelledError
+from ..core.probe import get_duration, kept_duration
+from ..core.threads import ThreadBudget
+from ..core.telemetry import BatchTelemetry
+from ..core.utils import get_processing_path
+from .predictor import Estimate
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A single video queued for processing."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, input_path: str, output_path: str = None, logo_path: str = None,
+                 priority: int = None, progress_callback=None, start: float = None, end: float = None,
+                 store_id: int = None, profile: dict = None):
+        self.id = next(Job._ids)
+        self.input_path = input_path
+        self.output_path = output_path or input_path
+        self.logo_path = logo_path
+        self.priority = Config.PRIORITY_NORMAL if priority is None else priority
+        self.progress_callback = progress_callback
+        # Optional in/out points (seconds): only that range is processed
+        self.start = start
+        self.end = end
+        self.store_id = store_id    # Row in the JobStore, when the scheduler persists jobs
+        # Pipeline attribute overrides for this job (e.g. a Config.SERVICE_PROFILES entry)
+        self.profile = profile or {}
+
+        self.duration = None        # Probed length in seconds (None = unknown)
+        self.state = "queued"       # queued -> running <-> paused -> validating -> done | failed
+        self.error = None
+        self.resources = None       # ResourceReport of the encode (Linux)
+        self.estimate = None        # Predicted output size and encode time (Predictor)
+        self.progress = 0.0         # Encode progress in percent
+        self.cancelled = False      # cancel() was called while the job owned a pipeline
+        self.committing = False     # Past the point of cancellation: the original is being replaced
+        self.attempts = 0           # Times the job was started (stalled runs are retried)
+        self.measured = False       # Duration and estimate looked up (restored jobs: at dispatch)
+        self.pipeline = None        # Set while the job owns a worker
+        self.slot = None            # Worker slot index (selects the CPU block when pinning)
+        self._done = threading.Event()
+
+    def set_duration(self, source_duration: float) -> None:
+        """Record the work size: the kept range, clipped to the source length."""
+        self.duration = kept_duration(source_duration, self.start, self.end)
+
+    def sort_key(self, seq: int) -> tuple:
+        """Priority first, then shortest job first; unknown durations go last."""
+        duration = self.duration if self.duration is not None else math.inf
+        return (self.priority, duration, seq)
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until the job has finished (successfully or not)."""
+        return self._done.wait(timeout)
+
+    def __repr__(self):
+        return f"Job(#{self.id}, {self.input_path!r}, priority={self.priority}, state={self.state})"
+
+
+class JobScheduler:
+    """
+    Runs jobs on top of VideoPipeline ordered by priority, then by probed
+    duration (shortest job first), which maximizes completed files per hour.
+    With a JobStore, every job and state change is persisted, and restore()
+    re-queues what a previous run left unfinished.
+    With a Predictor, a job only starts when its projected temp output fits in
+    the free disk space (minus what in-flight jobs will still write); otherwise
+    it is deferred until a running job finishes, or refused if nothing is running.
+    A job whose FFmpeg stalls is killed by the executor's watchdog and re-queued,
+    up to Config.JOB_MAX_ATTEMPTS starts, so it never holds a slot forever.
+
+    When an urgent job arrives and every slot is busy, a running job of lower
+    priority is suspended (SIGSTOP) to free its slot and resumed (SIGCONT)
+    once capacity returns, so no encoded work is lost. Preemption needs POSIX;
+    elsewhere jobs simply wait their turn.
+    """
+
+    def __init__(self, max_workers: int = None, pipeline_factory=None, preempt: bool = True,
+                 duration_probe=get_duration, prefetcher=None, store=None, predictor=None):
+        if pipeline_factory is None:
+            from .pipeline import VideoPipeline
+            pipeline_factory = VideoPipeline
+        self.max_workers = max_workers or Config.MAX_CONCURRENT_JOBS
+        self.pipeline_factory = pipeline_factory
+        self.preempt = preempt
+        self.duration_probe = duration_probe
+        # Optional PrefetchCache: upcoming jobs are copied locally while others encode
+        self.prefetcher = prefetcher
+        # Optional JobStore for durable state
+        self.store = store
+        # Resource usage of every encode, for batch-level aggregates
+        self.telemetry = BatchTelemetry()
+        # Optional Predictor for disk-space admission and the batch ETA
+        self.predictor = predictor
+        self._estimate_pipeline = None
+        # Serializes estimates (HTTP submits arrive on several threads): one shared estimate
+        # pipeline, and a profile's first sample encode is recorded before the next job asks
+        self._estimate_lock = threading.Lock()
+        # Optional callable(job), called (under the scheduler lock) after every state change
+        self.state_callback = None
+
+        self._queue = []            # heap of (sort_key, job)
+        self._seq = itertools.count()
+        self._running = []          # jobs holding a slot
+        self._paused = []           # preempted jobs waiting for a slot
+        self._validating = []       # encoded jobs being validated/committed (no slot held)
+        self._deferred = []         # jobs waiting for disk space
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    # --- Public API ---
+
+    def submit(self, job: Job) -> Job:
+        """Queue a job and start it as soon as the policy allows."""
+        if self.store and job.store_id is None:
+            job.store_id = self.store.add(job.input_path, job.output_path, job.logo_path,
+                                          job.priority, job.start, job.end)
+        self._measure(job)
+
+        with self._lock:
+            heapq.heappush(self._queue, (job.sort_key(next(self._seq)), job))
+            logger.info(f"Scheduler: queued {job} (duration={job.duration})")
+            self._dispatch()
+        return job
+
+    def cancel(self, job: Job) -> bool:
+        """Remove a queued job, or stop a running/paused one."""
+        with self._lock:
+            for i, (_, queued) in enumerate(self._queue):
+                if queued is job:
+                    self._queue.pop(i)
+                    heapq.heapify(self._queue)
+                    self._finish(job, "failed", "Cancelled")
+                    # _finish re-queued any deferred jobs: start them now
+                    self._dispatch()
+                    return True
+            if job in self._deferred:
+                self._deferred.remove(job)
+                self._finish(job, "failed", "Cancelled")
+                self._dispatch()
+                return True
+            if job.pipeline is None or job.committing:
+                return False
+            # The worker observes the cancellation and releases the slot itself:
+            # the current FFmpeg run is stopped, later runs are refused and the
+            # commit hook refuses to replace the original
+            job.cancelled = True
+            job.pipeline.executor.cancel()
+            return True
+
+    def wait_all(self, timeout: float = None) -> bool:
+        """Block until nothing is queued, running, paused or validating."""
+        with self._idle:
+            return self._idle.wait_for(
+                lambda: not (self._queue or self._running or self._paused or self._validating or self._deferred),
+                timeout
+            )
+
+    def restore(self) -> list:
+        """
+        Recover interrupted jobs of a previous run and re-queue everything
+        still queued in the store. Returns the submitted jobs.
+        """
+        if not self.store:
+            return []
+        self.store.recover()
+        jobs = []
+        for row in self.store.jobs(state="queued"):
+            job = Job(row['input_path'], row['output_path'], row['logo_path'], row['priority'],
+                      start=row['range_start'], end=row['range_end'], store_id=row['id'])
+            job.attempts = row['attempts']
+            # Stored at submit: nothing is probed here, however long the backlog
+            job.duration = row['duration']
+            if row['estimate_bytes'] is not None:
+                job.estimate = Estimate(row['estimate_bytes'], row['estimate_seconds'],
+                                        row['estimate_source'] or "history")
+            job.measured = row['duration'] is not None and (job.estimate is not None or not self.predictor)
+            jobs.append(job)
+        with self._lock:
+            for job in jobs:
+                heapq.heappush(self._queue, (job.sort_key(next(self._seq)), job))
+            logger.info(f"Scheduler: restored {len(jobs)} queued jobs")
+            self._dispatch()
+        return jobs
+
+    def eta(self) -> float | None:
+        """
+        Predicted seconds until every queued, deferred, running and paused job is
+        encoded (validation excluded); None without estimates for all of them.
+        """
+        with self._lock:
+            jobs = [job for _, job in self._queue] + self._deferred + self._running + self._paused
+            if any(job.estimate is None or job.estimate.seconds is None for job in jobs):
+                return None
+            remaining = sum(job.estimate.seconds * (1 - job.progress / 100) for job in jobs)
+        return remaining / self.max_workers
+
+    @property
+    def pending(self) -> list:
+        """Queued jobs in the order they would be started."""
+        with self._lock:
+            return [job for _, job in sorted(self._queue, key=lambda item: item[0])]
+
+    def _measure(self, job: Job) -> None:
+        """Probe the duration and estimate of `job` and store them. Blocking: never under the lock."""
+        if job.duration is None and self.duration_probe:
+            try:
+                source_duration = self.duration_probe(job.input_path)
+                if source_duration is not None:
+                    job.set_duration(source_duration)
+            except Exception as e:
+                logger.warning(f"Could not probe duration of {job.input_path}: {e}")
+        if self.predictor and job.estimate is None:
+            with self._estimate_lock:
+                if self._estimate_pipeline is None:
+                    # Sample encodes of unknown profiles use the same pipeline settings as the jobs
+                    self._estimate_pipeline = self.pipeline_factory()
+                job.estimate = self.predictor.estimate(job.input_path, self._estimate_pipeline,
+                                                       job.start, job.end)
+            logger.info(f"Scheduler: {job} {job.estimate}")
+        job.measured = True
+        if self.store and job.store_id is not None:
+            estimate = job.estimate
+            try:
+                self.store.annotate(job.store_id, job.duration,
+                                    estimate.output_bytes if estimate else None,
+                                    estimate.seconds if estimate else None,
+                                    estimate.source if estimate else None)
+            except Exception as e:
+                logger.error(f"Scheduler: could not persist the estimate of {job}: {e}")
+
+    # --- Scheduling (callers hold self._lock) ---
+
+    def _dispatch(self) -> None:
+        # 1. Fill free slots; a paused job resumes before a queued job of equal priority
+        while len(self._running) < self.max_workers and (self._queue or self._paused):
+            paused = min(self._paused, key=lambda j: j.priority, default=None)
+            queued = self._queue[0][1] if self._queue else None
+            if paused is not None and (queued is None or paused.priority <= queued.priority):
+                self._paused.remove(paused)
+                # The slot it had may now be used by another job: move it to a free one
+                paused.slot = self._free_slot()
+                budget = ThreadBudget.for_jobs(self.max_workers, slot=paused.slot)
+                paused.pipeline.thread_budget = budget
+                if paused.pipeline.executor.process is not None:
+                    budget.apply_affinity(paused.pipeline.executor.process.pid)
+                paused.pipeline.executor.resume()
+                paused.state = "running"
+                self._notify(paused)
+                self._running.append(paused)
+                logger.info(f"Scheduler: resumed {paused}")
+            else:
+                heapq.heappop(self._queue)
+                if self._admit(queued):
+                    self._start(queued)
+
+        # 2. Preempt lower-priority work for more urgent queued jobs
+        while self.preempt and self._queue:
+            urgent = self._queue[0][1]
+            victims = sorted(
+                (j for j in self._running if j.priority > urgent.priority),
+                key=lambda j: j.priority,
+                reverse=True
+            )
+            if not victims:
+                break
+            # The urgent job must fit on disk like any other (a paused job still holds its reservation)
+            item = heapq.heappop(self._queue)
+            if not self._admit(urgent):
+                continue
+            # A job between FFmpeg runs (probing, validating, committing) cannot be paused
+            victim = next((j for j in victims if j.pipeline.executor.pause()), None)
+            if victim is None:
+                heapq.heappush(self._queue, item)
+                break
+            self._running.remove(victim)
+            victim.state = "paused"
+            self._notify(victim)
+            self._paused.append(victim)
+            logger.info(f"Scheduler: paused {victim} for {urgent}")
+            self._start(urgent)
+
+    def _admit(self, job: Job) -> bool:
+        """Start `job` only if its temp output fits; defer or refuse it otherwise."""
+        if not self.predictor or job.estimate is None:
+            return True
+        in_flight = self._running + self._paused + self._validating
+        reserved = sum(self._reserved_bytes(j) for j in in_flight)
+        try:
+            if self.predictor.fits(job.input_path, job.estimate, reserved):
+                return True
+            free = self.predictor.free_bytes(job.input_path)
+        except OSError as e:
+            logger.warning(f"Scheduler: cannot check free space for {job}: {e}")
+            return True
+
+        needed = self.predictor.required_bytes(job.estimate)
+        if in_flight:
+            # Running jobs will commit (and usually shrink their originals): try again then
+            logger.warning(f"Scheduler: deferring {job}: needs {needed / 1048576:.0f} MB, "
+                           f"{free / 1048576:.0f} MB free, {reserved / 1048576:.0f} MB reserved")
+            self._deferred.append(job)
+        else:
+            self._finish(job, "failed", f"Insufficient disk space: needs {needed / 1048576:.0f} MB, "
+                                        f"{free / 1048576:.0f} MB free")
+        return False
+
+    def _reserved_bytes(self, job: Job) -> int:
+        """What an in-flight job may still write into its temp output."""
+        if job.estimate is None:
+            return 0
+        try:
+            written = os.path.getsize(get_processing_path(job.input_path))
+        except OSError:
+            written = 0
+        return max(self.predictor.required_bytes(job.estimate) - written, 0)
+
+    def _start(self, job: Job) -> None:
+        job.state = "running"
+        job.attempts += 1
+        self._record(job, "running")
+        self._notify(job)
+        job.pipeline = self.pipeline_factory()
+        for name, value in job.profile.items():
+            setattr(job.pipeline, name, value)
+        job.pipeline.executor.batch_telemetry = self.telemetry
+        job.pipeline.commit_callback = lambda _: self._committing(job)
+        # Split the cores between the jobs that can run at once
+        job.slot = self._free_slot()
+        job.pipeline.thread_budget = ThreadBudget.for_jobs(self.max_workers, slot=job.slot)
+        self._running.append(job)
+        logger.info(f"Scheduler: starting {job}")
+        if self.prefetcher:
+            job.pipeline.prefetcher = self.prefetcher
+            upcoming = sorted(self._queue, key=lambda item: item[0])
+            self.prefetcher.schedule([queued.input_path for _, queued in upcoming])
+        # Named after the job, so log records can be attributed to it
+        threading.Thread(target=self._work, args=(job,), name=f"job-{job.id}", daemon=True).start()
+
+    def _committing(self, job: Job) -> None:
+        """Commit hook: last chance to cancel before the original is replaced."""
+        with self._lock:
+            if job.cancelled:
+                raise FFmpegCancelledError("Cancelled")
+            job.committing = True
+        self._record(job, "committing")
+
+    def _free_slot(self) -> int:
+        used = {job.slot for job in self._running}
+        return next(slot for slot in range(self.max_workers + 1) if slot not in used)
+
+    def _work(self, job: Job) -> None:
+        if not job.measured:
+            # A restored job without stored values: probed now, off the lock and the restore
+            self._measure(job)
+
+        def track_progress(percent):
+            pipeline = job.pipeline
+            if job.cancelled and pipeline:
+                # Cancelled before submit_video reset the executor for this job: stop the run now
+                pipeline.executor.cancel()
+            job.progress = percent
+            if job.progress_callback:
+                job.progress_callback(percent)
+
+        try:
+            future = job.pipeline.submit_video(
+                job.input_path, job.output_path, job.logo_path,
+                progress_callback=track_progress, start=job.start, end=job.end
+            )
+        except FFmpegStallError as e:
+            reason = str(e).splitlines()[0]
+            with self._lock:
+                self._release(job)
+                if job.attempts < Config.JOB_MAX_ATTEMPTS:
+                    logger.warning(f"Scheduler: {job} stalled (attempt {job.attempts}); re-queueing")
+                    self._requeue(job, reason)
+                else:
+                    logger.error(f"Scheduler: {job} stalled {job.attempts} times; giving up")
+                    self._finish(job, "failed", reason)
+                self._dispatch()
+            return
+        except Exception as e:
+            logger.error(f"Scheduler: {job} failed: {e}")
+            with self._lock:
+                self._release(job)
+                self._finish(job, "failed", "Cancelled" if job.cancelled else str(e))
+                self._dispatch()
+            return
+
+        job.resources = job.pipeline.executor.last_report
+        # The encode is done: free the slot while validation/commit runs on its own pool
+        with self._lock:
+            self._release(job)
+            job.state = "validating"
+            if not job.committing:
+                # The pool may already have reached the commit hook: never record a step back
+                self._record(job, "validating")
+            self._notify(job)
+            self._validating.append(job)
+            self._dispatch()
+        future.add_done_callback(lambda f: self._validated(job, f))
+
+    def _validated(self, job: Job, future) -> None:
+        error = future.exception()
+        if error:
+            logger.error(f"Scheduler: {job} failed validation/commit: {error}")
+        with self._lock:
+            self._validating.remove(job)
+            if error and job.cancelled:
+                error = "Cancelled"
+            self._finish(job, "failed" if error else "done", str(error) if error else None)
+            self._dispatch()
+
+    def _requeue(self, job: Job, error: str) -> None:
+        """Put a job back in the queue after a failed run; the temp output is already gone."""
+        job.state = "queued"
+        job.error = error
+        job.progress = 0.0
+        job.pipeline = None
+        self._record(job, "queued", error)
+        self._notify(job)
+        heapq.heappush(self._queue, (job.sort_key(next(self._seq)), job))
+
+    def _release(self, job: Job) -> None:
+        if job in self._running:
+            self._running.remove(job)
+        if job in self._paused:
+            self._paused.remove(job)
+
+    def _record(self, job: Job, state: str, error: str = None) -> None:
+        if self.store and job.store_id is not None:
+            try:
+                self.store.mark(job.store_id, state, error)
+            except Exception as e:
+                logger.error(f"Scheduler: could not persist state of {job}: {e}")
+
+    def _notify(self, job: Job) -> None:
+        if self.state_callback:
+            try:
+                self.state_callback(job)
+            except Exception as e:
+                logger.error(f"Scheduler: state callback failed for {job}: {e}")
+
+    def _finish(self, job: Job, state: str, error: str = None) -> None:
+        self._record(job, state, error)
+        job.state = state
+        job.error = error
+        job.pipeline = None
+        job._done.set()
+        self._notify(job)
+        if self._deferred and job not in self._deferred:
+            # Space may have been freed: give deferred jobs another chance
+            for deferred in self._deferred:
+                heapq.heappush(self._queue, (deferred.sort_key(next(self._seq)), deferred))
+            self._deferred.clear()
+        self._idle.notify_all()
@@ -0,0 +1,158 @@
+import os
+import json
+import bisect
+import shutil
+import hashlib
+import logging
+from ..core.config import Config
+from ..core.retention import clone_file
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPlan:
+    """
+    How to rebuild a rendered video after a subtitle change: an ordered list of
+    (start, end, reencode) segments covering [0, duration). Segment bounds are
+    keyframes of the previous output, so the copied segments can be spliced
+    without re-encoding.
+    """
+
+    def __init__(self, duration: float, segments: list):
+        self.duration = duration
+        self.segments = segments
+
+    @property
+    def reencode_seconds(self) -> float:
+        return sum(end - start for start, end, reencode in self.segments if reencode)
+
+    @property
+    def reencode_ratio(self) -> float:
+        return self.reencode_seconds / self.duration if self.duration else 1.0
+
+    def __repr__(self):
+        return (f"RenderPlan({len(self.segments)} segments, "
+                f"{self.reencode_seconds:.1f}s of {self.duration:.1f}s re-encoded)")
+
+
+def plan_segments(keyframes: list, duration: float, ranges: list) -> RenderPlan:
+    """
+    Widen every changed range to the GOPs it overlaps (from the last keyframe at
+    or before its start to the first keyframe at or after its end) and fill the
+    gaps with stream-copied segments.
+    """
+    keyframes = sorted(k for k in keyframes if 0.0 <= k < duration)
+    if not keyframes or keyframes[0] > 0.0:
+        keyframes.insert(0, 0.0)
+
+    dirty = []
+    for start, end in ranges:
+        start, end = max(start, 0.0), min(end, duration)
+        if end <= start:
+            continue
+        gop_start = keyframes[bisect.bisect_right(keyframes, start) - 1]
+        index = bisect.bisect_left(keyframes, end)
+        gop_end = keyframes[index] if index < len(keyframes) else duration
+        if dirty and gop_start <= dirty[-1][1]:
+            dirty[-1] = (dirty[-1][0], max(dirty[-1][1], gop_end))
+        else:
+            dirty.append((gop_start, gop_end))
+
+    segments, position = [], 0.0
+    for start, end in dirty:
+        if start > position:
+            segments.append((position, start, False))
+        segments.append((start, end, True))
+        position = end
+    if position < duration:
+        segments.append((position, duration, False))
+    return RenderPlan(duration, segments)
+
+
+def concat_list(segments: list, previous_output: str, encoded: dict) -> str:
+    """
+    Concat demuxer script: copied segments point into the previous output with
+    inpoint/outpoint, re-encoded ones at their segment files (`encoded[start]`).
+    """
+    def quote(path):
+        return "'" + path.replace("'", "'\\''") + "'"
+
+    lines = ["ffconcat version 1.0"]
+    for start, end, reencode in segments:
+        if reencode:
+            lines.append(f"file {quote(encoded[start])}")
+            continue
+        lines.append(f"file {quote(previous_output)}")
+        lines.append(f"inpoint {start:.6f}")
+        lines.append(f"outpoint {end:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Kept Sources ---
+
+SETTINGS_FILE = "settings.json"
+
+
+def kept_source_dir(rendered_path: str) -> str:
+    """Per-video directory holding the clean source and the SRT it was rendered with."""
+    key = hashlib.sha1(os.path.abspath(rendered_path).encode('utf-8')).hexdigest()
+    return os.path.join(Config.SMART_RENDER_DIR, key)
+
+
+def keep_source(input_path: str, srt_path: str = None, settings: dict = None) -> str:
+    """
+    Keep the clean source of `input_path` and its SRT before the original is
+    replaced. The source is reflinked or hard-linked when possible (the replace
+    only swaps the directory entry, so the link keeps the old content),
+    otherwise copied. `settings` are the render settings besides the SRT
+    (see VideoPipeline._render_settings), which re-encoded GOPs must reproduce.
+    """
+    directory = kept_source_dir(input_path)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    source = os.path.join(directory, "source" + os.path.splitext(input_path)[1])
+    clone_file(input_path, source)
+    if srt_path:
+        # Keep the file name: the subtitle language is read from it
+        shutil.copy2(srt_path, os.path.join(directory, os.path.basename(srt_path)))
+    if settings is not None:
+        with open(os.path.join(directory, SETTINGS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(settings, f)
+    logger.info(f"Smart render: kept clean source of {input_path}")
+    return directory
+
+
+def kept_settings(rendered_path: str) -> dict | None:
+    """Render settings kept with the source of `rendered_path`, or None if they are unknown."""
+    try:
+        with open(os.path.join(kept_source_dir(rendered_path), SETTINGS_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def find_kept_source(rendered_path: str) -> tuple:
+    """(source path, SRT path or None) kept for `rendered_path`, or (None, None)."""
+    directory = kept_source_dir(rendered_path)
+    if not os.path.isdir(directory):
+        return None, None
+    source, srt = None, None
+    for name in os.listdir(directory):
+        if name.startswith("source"):
+            source = os.path.join(directory, name)
+        elif name.lower().endswith(".srt"):
+            srt = os.path.join(directory, name)
+    return source, srt
+
+
+def update_kept_subtitles(rendered_path: str, srt_path: str) -> None:
+    """Remember `srt_path` as the subtitles the rendered video now carries."""
+    directory = kept_source_dir(rendered_path)
+    for name in os.listdir(directory):
+        if name.lower().endswith(".srt"):
+            os.remove(os.path.join(directory, name))
+    shutil.copy2(srt_path, os.path.join(directory, os.path.basename(srt_path)))
+
+
+def drop_source(rendered_path: str) -> None:
+    shutil.rmtree(kept_source_dir(rendered_path), ignore_errors=True)
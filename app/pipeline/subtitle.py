@@ -35,3 +35,28 @@ class SubtitleProcessor:
         )
         
         return filter_cmd
+
+    def get_language(self, srt_path: str) -> str:
+        """
+        ISO 639-2 language tag from the SRT name suffix
+        (e.g. 'lecture_en.srt' -> 'eng'), falling back to the configured default.
+        """
+        stem = Path(srt_path).stem.lower()
+        # Longest suffixes first so '_ar_auto' wins over '_auto'
+        for suffix in sorted(Config.SUBTITLE_LANGUAGES, key=len, reverse=True):
+            if stem.endswith(f"_{suffix}"):
+                return Config.SUBTITLE_LANGUAGES[suffix]
+        return Config.DEFAULT_SUBTITLE_LANGUAGE
+
+    def get_mux_args(self, srt_path: str, output_path: str, track_index: int = 0) -> list:
+        """
+        Output arguments for a selectable (soft) subtitle track.
+        MP4/MOV only carry mov_text; Matroska keeps the SRT as is.
+        """
+        ext = Path(output_path).suffix.lower()
+        codec = 'srt' if ext == '.mkv' else 'mov_text'
+        return [
+            f'-c:s:{track_index}', codec,
+            f'-metadata:s:s:{track_index}', f"language={self.get_language(srt_path)}",
+            f'-disposition:s:{track_index}', 'default',
+        ]
@@ -0,0 +1,122 @@
+import copy
+import math
+import os
+import logging
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailSpec:
+    """
+    Extra image outputs taken from a split of the final filtered stream:
+    - a poster frame at `poster_time`,
+    - tiled seek-preview sprite sheets (one tile every `sprite_interval` seconds),
+    - a WebVTT index mapping time ranges to sprite tiles.
+    They cost no extra decode because they share the encoder's frames.
+    """
+
+    POSTER_NAME = "poster.jpg"
+    SPRITE_PATTERN = "sprite_%03d.jpg"
+    VTT_NAME = "thumbnails.vtt"
+
+    def __init__(self, output_dir: str = None, poster_time: float = 5.0, sprite_interval: float = 10.0,
+                 tile_width: int = 160, tile_height: int = 90, columns: int = 10, rows: int = 10):
+        """
+        output_dir: destination folder; None means '<video stem>_thumbs' next to the video.
+        poster_time / sprite_interval: None disables that output.
+        """
+        self.output_dir = output_dir
+        self.poster_time = poster_time
+        self.sprite_interval = sprite_interval
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.columns = columns
+        self.rows = rows
+
+    def for_video(self, video_path: str) -> "ThumbnailSpec":
+        """Return a copy with a concrete output directory for `video_path`."""
+        spec = copy.copy(self)
+        if spec.output_dir is None:
+            video = Path(os.path.abspath(video_path))
+            spec.output_dir = str(video.parent / f"{video.stem}_thumbs")
+        return spec
+
+    def branch_count(self) -> int:
+        """Number of extra branches needed from the final stream."""
+        return int(self.poster_time is not None) + int(self.sprite_interval is not None)
+
+    def get_outputs(self, streams: list) -> tuple:
+        """
+        Build filters and output arguments for the given split branches.
+        Returns (filter_chains, output_args).
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        out_dir = Path(self.output_dir)
+        filters, args = [], []
+        streams = list(streams)
+
+        if self.poster_time is not None:
+            stream_in = streams.pop(0)
+            label = f"[poster_{stream_in.strip('[]')}]"
+            filters.append(f"{stream_in}trim=start={self.poster_time},setpts=PTS-STARTPTS{label}")
+            args.extend(['-map', label, '-frames:v', '1', '-update', '1', '-q:v', '2',
+                         str(out_dir / self.POSTER_NAME)])
+
+        if self.sprite_interval is not None:
+            stream_in = streams.pop(0)
+            label = f"[sprite_{stream_in.strip('[]')}]"
+            w, h = self.tile_width, self.tile_height
+            filters.append(
+                f"{stream_in}fps=1/{self.sprite_interval},"
+                f"scale={w}:{h}:force_original_aspect_ratio=decrease,"
+                f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,"
+                f"tile={self.columns}x{self.rows}{label}"
+            )
+            args.extend(['-map', label, '-fps_mode', 'passthrough', '-q:v', '4',
+                         str(out_dir / self.SPRITE_PATTERN)])
+
+        return filters, args
+
+    def write_vtt(self, duration: float) -> str | None:
+        """Write the WebVTT thumbnail index for a video of `duration` seconds."""
+        if self.sprite_interval is None or not duration:
+            return None
+
+        per_sheet = self.columns * self.rows
+        count = math.ceil(duration / self.sprite_interval)
+        lines = ["WEBVTT", ""]
+        for index in range(count):
+            start = index * self.sprite_interval
+            end = min(start + self.sprite_interval, duration)
+            sheet = self.SPRITE_PATTERN % (index // per_sheet + 1)
+            x = (index % self.columns) * self.tile_width
+            y = ((index % per_sheet) // self.columns) * self.tile_height
+            lines.append(f"{_vtt_time(start)} --> {_vtt_time(end)}")
+            lines.append(f"{sheet}#xywh={x},{y},{self.tile_width},{self.tile_height}")
+            lines.append("")
+
+        vtt_path = Path(self.output_dir) / self.VTT_NAME
+        vtt_path.write_text("\n".join(lines), encoding='utf-8')
+        logger.info(f"Wrote thumbnail index: {vtt_path}")
+        return str(vtt_path)
+
+    def cleanup(self) -> None:
+        """Remove images written by a failed pass."""
+        out_dir = Path(self.output_dir)
+        if not out_dir.exists():
+            return
+        for item in out_dir.iterdir():
+            if item.name in (self.POSTER_NAME, self.VTT_NAME) or item.name.startswith("sprite_"):
+                try:
+                    item.unlink()
+                except OSError:
+                    pass
+
+
+def _vtt_time(seconds: float) -> str:
+    ms = int(round(seconds * 1000))
+    h, rem = divmod(ms, 3600000)
+    m, rem = divmod(rem, 60000)
+    s, ms = divmod(rem, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}.{ms:03d}"
@@ -0,0 +1,400 @@
+"""
+HTTP job service on top of JobScheduler (python main.py --serve).
+
+    POST   /jobs               {"input", "output"?, "logo"?, "profile"?, "priority"?, "start"?, "end"?}
+    GET    /jobs               all jobs (optionally ?state=running)
+    GET    /jobs/<id>          one job
+    DELETE /jobs/<id>          cancel a queued or running job
+    GET    /jobs/<id>/result   output of a finished job
+    GET    /events             server-sent events for every job
+    GET    /jobs/<id>/events   server-sent events for one job (closed once it finishes)
+
+Local inputs are replaced in place, so "output" only applies to s3:// inputs
+(and must be an s3:// URL); a job's result reports the path it committed to.
+
+Events are 'state' (job snapshot), 'progress' ({id, percent}) and 'log'
+({id, level, message}).
+"""
+import os
+import json
+import asyncio
+import logging
+import threading
+from urllib.parse import urlsplit, parse_qs
+from ..core.config import Config
+from ..core.storage import is_remote
+from ..pipeline.scheduler import Job, JobScheduler
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATES = ("done", "failed")
+PRIORITIES = {'urgent': Config.PRIORITY_URGENT, 'normal': Config.PRIORITY_NORMAL, 'low': Config.PRIORITY_LOW}
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def job_info(job: Job) -> dict:
+    """JSON snapshot of a job."""
+    return {
+        'id': job.id,
+        'input': job.input_path,
+        'output': job.output_path,
+        'logo': job.logo_path,
+        'profile': getattr(job, 'profile_name', None),
+        'priority': job.priority,
+        'start': job.start,
+        'end': job.end,
+        'state': job.state,
+        'progress': round(job.progress, 1),
+        'duration': job.duration,
+        'error': job.error,
+        'estimate': {'output_bytes': job.estimate.output_bytes, 'seconds': job.estimate.seconds}
+        if job.estimate else None,
+    }
+
+
+class Subscriber:
+    """One SSE client: a bounded queue of (event, data), optionally for a single job."""
+
+    def __init__(self, job_id: int = None, size: int = None):
+        self.job_id = job_id
+        self.queue = asyncio.Queue(maxsize=size or Config.SERVICE_CLIENT_QUEUE)
+        self.dropped = 0
+
+
+class EventHub:
+    """
+    Fans job events out to SSE subscribers on the event loop. Worker threads only
+    hand events over (call_soon_threadsafe). Progress is coalesced per job and
+    flushed every SERVICE_PROGRESS_INTERVAL, so the work per client does not grow
+    with FFmpeg's progress rate. A client that cannot keep up loses its oldest
+    events instead of growing the server's memory.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, interval: float = None):
+        self.loop = loop
+        self.interval = interval or Config.SERVICE_PROGRESS_INTERVAL
+        self.subscribers = set()
+        self._progress = {}
+        self._progress_lock = threading.Lock()
+
+    def subscribe(self, job_id: int = None) -> Subscriber:
+        subscriber = Subscriber(job_id)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    # --- Thread-safe producers ---
+
+    def publish(self, event: str, data: dict) -> None:
+        try:
+            self.loop.call_soon_threadsafe(self._deliver, event, data)
+        except RuntimeError:
+            pass  # Loop already closed (shutdown)
+
+    def progress(self, job_id: int, percent: float) -> None:
+        with self._progress_lock:
+            self._progress[job_id] = percent
+
+    # --- Event loop side ---
+
+    async def run(self) -> None:
+        """Flush coalesced progress until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> None:
+        with self._progress_lock:
+            latest, self._progress = self._progress, {}
+        for job_id, percent in latest.items():
+            self._deliver("progress", {'id': job_id, 'percent': round(percent, 1)})
+
+    def _deliver(self, event: str, data: dict) -> None:
+        job_id = data.get('id')
+        for subscriber in self.subscribers:
+            if subscriber.job_id is not None and subscriber.job_id != job_id:
+                continue
+            if subscriber.queue.full():
+                subscriber.queue.get_nowait()
+                subscriber.dropped += 1
+            subscriber.queue.put_nowait((event, data))
+
+
+# Logger of FFmpegExecutor, which logs every stderr line at INFO
+FFMPEG_LOGGER = "app.core.ffmpeg"
+
+
+class _LogForwarder(logging.Handler):
+    """
+    Publishes log records at Config.SERVICE_LOG_LEVEL and above as 'log' events;
+    records from job worker threads carry the job id. FFmpeg's per-line output is
+    never forwarded: clients get coalesced 'progress' events for that.
+    """
+
+    def __init__(self, hub: EventHub):
+        super().__init__(level=Config.SERVICE_LOG_LEVEL)
+        self.hub = hub
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.name == FFMPEG_LOGGER and record.levelno < logging.WARNING:
+            return False
+        return super().filter(record)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        job_id = None
+        if record.threadName.startswith("job-"):
+            try:
+                job_id = int(record.threadName[4:])
+            except ValueError:
+                pass
+        try:
+            message = record.getMessage()
+        except Exception:
+            return
+        self.hub.publish("log", {'id': job_id, 'level': record.levelname, 'message': message})
+
+
+class JobService:
+    """Small asyncio HTTP server: one request per connection, except SSE streams."""
+
+    def __init__(self, scheduler: JobScheduler = None, host: str = None, port: int = None):
+        self.scheduler = scheduler or JobScheduler(max_workers=Config.SERVICE_WORKERS)
+        self.host = host or Config.SERVICE_HOST
+        self.port = Config.SERVICE_PORT if port is None else port
+        # Only touched on the event loop thread, which also iterates it
+        self.jobs = {}
+        self.hub = None
+        self._server = None
+        self._tasks = []
+        self._clients = 0
+        self._log_handler = None
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.hub = EventHub(loop)
+        self.scheduler.state_callback = lambda job: self.hub.publish("state", job_info(job))
+        self._log_handler = _LogForwarder(self.hub)
+        logging.getLogger().addHandler(self._log_handler)
+        self._tasks.append(asyncio.create_task(self.hub.run()))
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Job service listening on http://{self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        logging.getLogger().removeHandler(self._log_handler)
+        self.scheduler.state_callback = None
+        for task in self._tasks:
+            task.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def serve_forever(self) -> None:
+        async def main():
+            await self.start()
+            try:
+                await self._server.serve_forever()
+            finally:
+                await self.stop()
+        asyncio.run(main())
+
+    # --- Jobs ---
+
+    def submit(self, payload: dict) -> Job:
+        """Validate `payload` and queue its job. Blocking (probes the input); the caller registers the job."""
+        input_path = payload.get('input')
+        if not isinstance(input_path, str) or not input_path:
+            raise HTTPError(400, "'input' is required")
+        if not is_remote(input_path):
+            input_path = os.path.abspath(input_path)
+            if not os.path.isfile(input_path):
+                raise HTTPError(400, f"Input not found: {input_path}")
+
+        output_path = payload.get('output')
+        if output_path is not None:
+            if not isinstance(output_path, str) or not output_path:
+                raise HTTPError(400, "'output' must be a path or an s3:// URL")
+            if not is_remote(output_path) and os.path.abspath(output_path) == input_path:
+                output_path = None
+            elif not (is_remote(input_path) and is_remote(output_path)):
+                # Local videos are replaced in place (their SRT is removed): there is no other output to write
+                raise HTTPError(400, "'output' is only supported from an s3:// input to an s3:// URL; "
+                                     "local videos are replaced in place")
+
+        profile_name = payload.get('profile') or 'default'
+        if profile_name not in Config.SERVICE_PROFILES:
+            raise HTTPError(400, f"Unknown profile {profile_name!r} (available: {', '.join(Config.SERVICE_PROFILES)})")
+        priority = payload.get('priority', Config.PRIORITY_NORMAL)
+        priority = PRIORITIES.get(priority, priority)
+        if not isinstance(priority, int):
+            raise HTTPError(400, f"Invalid priority: {payload.get('priority')!r}")
+        try:
+            start = float(payload['start']) if payload.get('start') is not None else None
+            end = float(payload['end']) if payload.get('end') is not None else None
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'start' and 'end' must be seconds")
+
+        job = Job(input_path, output_path, payload.get('logo'), priority,
+                  start=start, end=end, profile=Config.SERVICE_PROFILES[profile_name])
+        job.profile_name = profile_name
+        job.progress_callback = lambda percent, job_id=job.id: self.hub.progress(job_id, percent)
+        self.scheduler.submit(job)
+        return job
+
+    def _job(self, job_id: str) -> Job:
+        try:
+            return self.jobs[int(job_id)]
+        except (ValueError, KeyError):
+            raise HTTPError(404, f"No job {job_id}")
+
+    @staticmethod
+    def result(job: Job) -> dict:
+        if job.state not in FINISHED_STATES:
+            raise HTTPError(409, f"Job {job.id} is {job.state}")
+        result = {'id': job.id, 'state': job.state, 'output': job.output_path, 'error': job.error,
+                  'size': None, 'resources': job.resources.as_dict() if job.resources else None}
+        if job.state == "done" and not is_remote(job.output_path) and os.path.exists(job.output_path):
+            result['size'] = os.path.getsize(job.output_path)
+        return result
+
+    # --- HTTP ---
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._clients += 1
+        try:
+            if self._clients > Config.SERVICE_MAX_CLIENTS:
+                raise HTTPError(503, "Too many connections")
+            method, path, query, body = await asyncio.wait_for(self._read_request(reader), timeout=30)
+            await self._route(method, path, query, body, writer)
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {'error': str(e)})
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Job service: request failed: {e}")
+            try:
+                await self._send_json(writer, 500, {'error': str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            self._clients -= 1
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> tuple:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) != 3:
+            raise HTTPError(400, "Malformed request line")
+        method, target, _ = request_line
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= 100:
+                raise HTTPError(400, "Too many headers")
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length') or 0)
+        if length > Config.SERVICE_MAX_BODY:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        parts = urlsplit(target)
+        return method.upper(), parts.path.rstrip("/") or "/", parse_qs(parts.query), body
+
+    async def _route(self, method: str, path: str, query: dict, body: bytes, writer) -> None:
+        segments = path.strip("/").split("/")
+        loop = asyncio.get_running_loop()
+
+        if path == "/jobs" and method == "POST":
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise HTTPError(400, "Body must be JSON")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Body must be a JSON object")
+            # Submitting may probe the input: keep it off the event loop
+            job = await loop.run_in_executor(None, self.submit, payload)
+            self.jobs[job.id] = job
+            return await self._send_json(writer, 202, job_info(job))
+        if path == "/jobs" and method == "GET":
+            states = query.get('state')
+            jobs = [job_info(job) for job in self.jobs.values() if not states or job.state in states]
+            return await self._send_json(writer, 200, {'jobs': jobs})
+        if path == "/events" and method == "GET":
+            return await self._stream(writer)
+
+        if segments[0] == "jobs" and len(segments) in (2, 3):
+            job = self._job(segments[1])
+            action = segments[2] if len(segments) == 3 else None
+            if action is None and method == "GET":
+                return await self._send_json(writer, 200, job_info(job))
+            if action is None and method == "DELETE":
+                if job.state in FINISHED_STATES:
+                    raise HTTPError(409, f"Job {job.id} already {job.state}")
+                cancelled = await loop.run_in_executor(None, self.scheduler.cancel, job)
+                if not cancelled:
+                    raise HTTPError(409, f"Job {job.id} can no longer be cancelled ({job.state})")
+                return await self._send_json(writer, 200, {'id': job.id, 'cancelled': True})
+            if action == "result" and method == "GET":
+                return await self._send_json(writer, 200, self.result(job))
+            if action == "events" and method == "GET":
+                return await self._stream(writer, job)
+            raise HTTPError(405, f"{method} not allowed on {path}")
+        raise HTTPError(404, f"No route for {method} {path}")
+
+    async def _send_json(self, writer, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+            .encode('latin-1') + body
+        )
+        await writer.drain()
+
+    async def _stream(self, writer, job: Job = None) -> None:
+        """Server-sent events until the client leaves (or `job` finishes)."""
+        subscriber = self.hub.subscribe(job.id if job else None)
+        try:
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                         b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+            # Current state first, so a client never waits for the next change
+            snapshot = [job] if job else list(self.jobs.values())
+            for item in snapshot:
+                writer.write(_sse("state", job_info(item)))
+            await writer.drain()
+            if job and job.state in FINISHED_STATES:
+                return
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(subscriber.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    writer.write(b": keep-alive\n\n")
+                    await writer.drain()
+                    continue
+                writer.write(_sse(event, data))
+                await writer.drain()
+                if job and event == "state" and data['state'] in FINISHED_STATES:
+                    return
+        finally:
+            self.hub.unsubscribe(subscriber)
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode('utf-8')
+
+
+def serve(host: str = None, port: int = None, workers: int = None) -> None:
+    """Run the job service until interrupted."""
+    scheduler = JobScheduler(max_workers=workers or Config.SERVICE_WORKERS)
+    JobService(scheduler, host, port).serve_forever()
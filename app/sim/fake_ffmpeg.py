@@ -0,0 +1,234 @@
+"""
+FFmpeg stand-in for orchestration tests and load testing.
+
+Select it with Config.use_simulator() or VIDEO_APP_FFMPEG=<path to this file>.
+It parses FFmpeg-style arguments, prints the usual banner and '\\r'-terminated
+progress lines at a configurable speed, honours 'q' on stdin, and writes
+outputs of plausible (sparse) size. Nothing is decoded or encoded.
+
+Behaviour is set through environment variables:
+  FAKE_FFMPEG_SPEED          Simulated media seconds per wall second (default 50)
+  FAKE_FFMPEG_TICK           Wall seconds between progress lines (default 0.1)
+  FAKE_FFMPEG_BYTES_PER_SEC  Output bytes per media second (default 250000)
+  FAKE_FFMPEG_FAIL           Probability that a run fails midway (default 0)
+  FAKE_FFMPEG_STALL          Probability that a run stops making progress (default 0)
+  FAKE_FFMPEG_HOLD           Seconds the output stays open and unfinished after exit (default 0)
+  FAKE_FFMPEG_SEED           Seed for the failure draws (per input path)
+Input names containing '__fail__', '__stall__' or '__hold__' force that behaviour.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import threading
+import subprocess
+
+from fakemedia import read_media, write_header
+
+# Options that take no value
+FLAGS = {'-y', '-n', '-nostdin', '-hide_banner', '-copyts', '-an', '-vn', '-sn', '-dn',
+         '-shortest', '-re', '-stats', '-nostats'}
+ENCODERS = ("hevc_nvenc", "h264_nvenc", "libx265", "libx264", "aac", "libopus", "mov_text", "srt")
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def parse_args(argv: list) -> tuple:
+    """Split an FFmpeg command line into [(input, options)] and [(output, options)]."""
+    inputs, outputs, pending = [], [], {}
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg == '-i' and i + 1 < len(argv):
+            inputs.append((argv[i + 1], pending))
+            pending = {}
+            i += 2
+        elif arg in FLAGS:
+            pending[arg] = True
+            i += 1
+        elif arg.startswith('-') and arg != '-' and i + 1 < len(argv):
+            pending[arg] = argv[i + 1]
+            i += 2
+        else:
+            outputs.append((arg, pending))
+            pending = {}
+            i += 1
+    return inputs, outputs
+
+
+def timestamp(seconds: float) -> str:
+    centis = int(round(max(seconds, 0.0) * 100))
+    h, rem = divmod(centis, 360000)
+    m, rem = divmod(rem, 6000)
+    s, cs = divmod(rem, 100)
+    return f"{h:02d}:{m:02d}:{s:02d}.{cs:02d}"
+
+
+def open_input(path: str, options: dict) -> dict:
+    """Header of the main input; lavfi sources read their duration from 'd='."""
+    if options.get('-f') == 'lavfi':
+        match = re.search(r"\bd=([\d.]+)", path)
+        return {'duration': float(match.group(1)) if match else 1.0, 'width': 640, 'height': 360,
+                'fps': "25/1", 'video_codec': 'rawvideo', 'audio_codec': None, 'channels': 0}
+    if not os.path.exists(path):
+        fail(f"{path}: No such file or directory")
+    media = read_media(path)
+    if media is None:
+        fail(f"{path}: Invalid data found when processing input")
+    return media
+
+
+def fail(message: str, code: int = 1) -> None:
+    sys.stderr.write(message + "\n")
+    sys.stderr.flush()
+    sys.exit(code)
+
+
+def decide(flag: str, env: str, input_path: str) -> bool:
+    if f"__{flag}__" in os.path.basename(input_path):
+        return True
+    rate = env_float(env, 0.0)
+    if rate <= 0:
+        return False
+    seed = os.environ.get('FAKE_FFMPEG_SEED')
+    rng = random.Random(f"{seed}:{flag}:{input_path}") if seed is not None else random
+    return rng.random() < rate
+
+
+def watch_stdin(quit_event: threading.Event) -> None:
+    """FFmpeg finishes early and writes a valid file when it reads 'q'."""
+    try:
+        while True:
+            char = sys.stdin.read(1)
+            if not char:
+                return
+            if char == 'q':
+                quit_event.set()
+                return
+    except (OSError, ValueError):
+        return
+
+
+def output_files(outputs: list) -> list:
+    """Files to write: skip null muxers and pipes; image patterns produce one frame."""
+    files = []
+    for path, options in outputs:
+        if path == '-' or options.get('-f') == 'null':
+            continue
+        files.append((re.sub(r"%0?\d*d", "1".zfill(4), path), options))
+    return files
+
+
+def finish_outputs(files: list, media: dict, duration: float, hold: float) -> None:
+    bytes_per_sec = env_float('FAKE_FFMPEG_BYTES_PER_SEC', 250000)
+    for path, options in files:
+        header = dict(media, duration=round(duration, 3))
+        if options.get('-c:v') and options['-c:v'] != 'copy':
+            header['video_codec'] = 'hevc' if '265' in options['-c:v'] or 'hevc' in options['-c:v'] else 'h264'
+        if options.get('-an'):
+            header['audio_codec'], header['channels'] = None, 0
+        size = int(duration * bytes_per_sec)
+        if hold > 0:
+            # Another process keeps the handle and finalizes late (AV scanner, slow muxer flush)
+            subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), '--hold', path, str(hold), json.dumps(header), str(size)],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                start_new_session=(os.name == 'posix')
+            )
+            continue
+        with open(path, 'r+b') as f:
+            write_header(f, header, size)
+
+
+def hold_main(path: str, seconds: str, header: str, size: str) -> int:
+    with open(path, 'r+b') as f:
+        time.sleep(float(seconds))
+        write_header(f, json.loads(header), int(size))
+    return 0
+
+
+def loudness_main(media: dict) -> int:
+    sys.stderr.write("[Parsed_loudnorm_0 @ 0x0] \n" + json.dumps({
+        "input_i": "-23.10", "input_tp": "-4.20", "input_lra": "6.30", "input_thresh": "-33.40",
+        "output_i": "-16.00", "output_tp": "-1.50", "output_lra": "5.90", "output_thresh": "-26.30",
+        "normalization_type": "linear", "target_offset": "0.10"
+    }, indent=1) + "\n")
+    return 0
+
+
+def main(argv: list) -> int:
+    if argv and argv[0] == '--hold':
+        return hold_main(*argv[1:5])
+    if '-encoders' in argv:
+        print("Encoders:\n" + "\n".join(f" V..... {name}" for name in ENCODERS))
+        return 0
+    if '-version' in argv:
+        print("ffmpeg version fake (orchestration simulator)")
+        return 0
+
+    inputs, outputs = parse_args(argv)
+    if not inputs:
+        fail("Output file #0 does not contain any stream")
+    input_path, input_options = inputs[0]
+    media = open_input(input_path, input_options)
+
+    if any('print_format=json' in arg for arg in argv):
+        return loudness_main(media)
+
+    # Seeking and duration limits on the input
+    start = float(input_options.get('-ss') or 0)
+    duration = max(float(media['duration']) - start, 0.0)
+    if input_options.get('-t'):
+        duration = min(duration, float(input_options['-t']))
+
+    sys.stderr.write(
+        f"ffmpeg version fake (orchestration simulator)\n"
+        f"Input #0, mov,mp4,m4a,3gp,3g2,mj2, from '{input_path}':\n"
+        f"  Duration: {timestamp(float(media['duration']))}, start: 0.000000, bitrate: 2000 kb/s\n"
+    )
+    sys.stderr.flush()
+
+    files = output_files(outputs)
+    for path, _ in files:
+        # Created up front and unreadable until finished, like an MP4 without its moov atom
+        with open(path, 'wb') as f:
+            f.write(b"\0" * 1024)
+
+    speed = max(env_float('FAKE_FFMPEG_SPEED', 50.0), 0.001)
+    tick = max(env_float('FAKE_FFMPEG_TICK', 0.1), 0.001)
+    fail_at = duration * 0.5 if decide('fail', 'FAKE_FFMPEG_FAIL', input_path) else None
+    stall_at = duration * 0.5 if decide('stall', 'FAKE_FFMPEG_STALL', input_path) else None
+    hold = env_float('FAKE_FFMPEG_HOLD', 0.0) or (2.0 if '__hold__' in os.path.basename(input_path) else 0.0)
+    fps = 30.0
+
+    quit_event = threading.Event()
+    threading.Thread(target=watch_stdin, args=(quit_event,), daemon=True).start()
+
+    position = 0.0
+    while position < duration and not quit_event.is_set():
+        if fail_at is not None and position >= fail_at:
+            fail("Error while processing the decoded data for stream #0:0\nConversion failed!")
+        if stall_at is not None and position >= stall_at:
+            # No more progress lines until someone sends 'q' or kills us
+            quit_event.wait()
+            break
+        time.sleep(tick)
+        position = min(position + speed * tick, duration)
+        sys.stderr.write(f"frame={int(position * fps):6d} fps={speed * fps:.0f} q=28.0 size=N/A "
+                         f"time={timestamp(position)} bitrate=N/A speed={speed:.1f}x\r")
+        sys.stderr.flush()
+
+    finish_outputs(files, media, position, hold)
+    sys.stderr.write("\nvideo:0kB audio:0kB subtitle:0kB other streams:0kB global headers:0kB\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,50 @@
+"""
+FFprobe stand-in that describes the fake media files written by fake_ffmpeg.py.
+Unfinished or foreign files are rejected like a truncated MP4.
+"""
+import sys
+import json
+from fractions import Fraction
+
+from fakemedia import read_media
+
+
+def describe(media: dict, count_packets: bool) -> dict:
+    duration = float(media['duration'])
+    fps = media.get('fps') or "30/1"
+    video = {
+        'index': 0, 'codec_type': 'video', 'codec_name': media.get('video_codec') or 'h264',
+        'width': media.get('width'), 'height': media.get('height'),
+        'avg_frame_rate': fps, 'r_frame_rate': fps, 'duration': f"{duration:.6f}",
+    }
+    streams = [video]
+    if media.get('audio_codec'):
+        streams.append({
+            'index': 1, 'codec_type': 'audio', 'codec_name': media['audio_codec'],
+            'channels': media.get('channels') or 2, 'sample_rate': "48000", 'duration': f"{duration:.6f}",
+        })
+    if count_packets:
+        video['nb_read_packets'] = str(int(duration * float(Fraction(fps))))
+        for stream in streams[1:]:
+            stream['nb_read_packets'] = str(int(duration * 48000 / 1024))
+    return {
+        'streams': streams,
+        'format': {'duration': f"{duration:.6f}", 'nb_streams': len(streams), 'format_name': 'mov,mp4,m4a,3gp,3g2,mj2'},
+    }
+
+
+def main(argv: list) -> int:
+    if not argv:
+        sys.stderr.write("No input specified\n")
+        return 1
+    path = argv[-1]
+    media = read_media(path)
+    if media is None:
+        sys.stderr.write(f"{path}: Invalid data found when processing input\n")
+        return 1
+    print(json.dumps(describe(media, '-count_packets' in argv), indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
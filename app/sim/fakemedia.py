@@ -0,0 +1,49 @@
+"""
+Fake media files understood by the FFmpeg/FFprobe stand-ins.
+A fake file starts with one JSON header line and is padded (sparsely) to a
+plausible size, so disk usage stays small even for very large batches.
+"""
+import json
+
+MAGIC = b"FAKEMEDIA "
+
+
+def write_media(path: str, duration: float, width: int = 1920, height: int = 1080, fps: str = "30/1",
+                video_codec: str = "h264", audio_codec: str = "aac", channels: int = 2,
+                size: int = 0) -> str:
+    """Write a fake media file of `duration` seconds; `size` pads it to that many bytes."""
+    header = {
+        'duration': round(float(duration), 3),
+        'width': width,
+        'height': height,
+        'fps': fps,
+        'video_codec': video_codec,
+        'audio_codec': audio_codec,
+        'channels': channels,
+    }
+    with open(path, 'wb') as f:
+        write_header(f, header, size)
+    return path
+
+
+def write_header(f, header: dict, size: int = 0) -> None:
+    """Write `header` at the start of an open binary file and pad it to `size`."""
+    data = MAGIC + json.dumps(header).encode('utf-8') + b"\n"
+    f.seek(0)
+    f.write(data)
+    f.truncate(max(size, len(data)))
+
+
+def read_media(path: str) -> dict | None:
+    """Header of a fake media file; None for anything else (including unfinished outputs)."""
+    try:
+        with open(path, 'rb') as f:
+            line = f.readline(4096)
+    except OSError:
+        return None
+    if not line.startswith(MAGIC):
+        return None
+    try:
+        return json.loads(line[len(MAGIC):])
+    except ValueError:
+        return None
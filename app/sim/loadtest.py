@@ -0,0 +1,190 @@
+"""
+Load-test harness for the orchestration layer (scheduler, pipeline, validation,
+commit, job store and UI) running against the FFmpeg simulator.
+
+    python -m app.sim.loadtest --jobs 10000 --workers 4 --speed 2000
+    python -m app.sim.loadtest --jobs 500 --ui
+
+Reports orchestration overhead per job (time a worker slot spends outside
+FFmpeg), end-to-end throughput and memory growth (tracemalloc and RSS).
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from ..core.config import Config
+from ..core.telemetry import read_process_stats, telemetry_supported
+from .fakemedia import write_media
+
+logger = logging.getLogger(__name__)
+
+
+def make_batch(directory: str, count: int, duration: float, with_srt: bool = True,
+               fail_every: int = 0) -> list:
+    """Create `count` fake inputs (with SRTs); every `fail_every`-th one fails in FFmpeg."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for n in range(count):
+        marker = "__fail__" if fail_every and (n + 1) % fail_every == 0 else ""
+        path = os.path.join(directory, f"video_{n:06d}{marker}.mp4")
+        write_media(path, duration, size=int(duration * 250000))
+        if with_srt:
+            with open(os.path.splitext(path)[0] + ".srt", 'w', encoding='utf-8') as f:
+                f.write("1\n00:00:01,000 --> 00:00:02,000\nمرحبا\n")
+        paths.append(path)
+    return paths
+
+
+class MemoryProbe:
+    """Python heap (tracemalloc) and process RSS, before and after a run."""
+
+    def __init__(self):
+        tracemalloc.start()
+        self.heap_before = tracemalloc.get_traced_memory()[0]
+        self.rss_before = self._rss()
+
+    @staticmethod
+    def _rss() -> int:
+        if not telemetry_supported():
+            return 0
+        sample = read_process_stats(os.getpid())
+        return sample.rss_bytes if sample else 0
+
+    def result(self, jobs: int) -> dict:
+        heap_after, heap_peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics('lineno')[:5]
+        tracemalloc.stop()
+        growth = heap_after - self.heap_before
+        return {
+            'heap_growth_mb': round(growth / 1048576, 2),
+            'heap_growth_per_job_kb': round(growth / 1024 / max(jobs, 1), 2),
+            'heap_peak_mb': round(heap_peak / 1048576, 2),
+            'rss_growth_mb': round((self._rss() - self.rss_before) / 1048576, 2),
+            'top_allocations': [str(stat) for stat in top],
+        }
+
+
+def run_scheduler(paths: list, workers: int, store_path: str = None) -> dict:
+    """Push the batch through JobScheduler + VideoPipeline."""
+    # Imported before measuring, so module loading does not count as growth
+    from ..pipeline.pipeline import VideoPipeline
+    from ..pipeline.scheduler import Job, JobScheduler
+    from ..core.jobstore import JobStore
+
+    store = JobStore(store_path) if store_path else None
+    memory = MemoryProbe()
+    started = time.monotonic()
+
+    scheduler = JobScheduler(max_workers=workers, pipeline_factory=VideoPipeline, store=store)
+    jobs = [scheduler.submit(Job(path)) for path in paths]
+    scheduler.wait_all()
+    wall = time.monotonic() - started
+
+    failed = [job for job in jobs if job.state != "done"]
+    reports = scheduler.telemetry.reports
+    ffmpeg_seconds = sum(report.wall_seconds for report in reports)
+    result = {
+        'jobs': len(jobs),
+        'failed': len(failed),
+        'wall_seconds': round(wall, 2),
+        'jobs_per_second': round(len(jobs) / wall, 2) if wall else 0.0,
+        # Slot time not spent inside FFmpeg: probing, graph building, process start-up, scheduling
+        'overhead_per_job_ms': round((wall * workers - ffmpeg_seconds) / max(len(jobs), 1) * 1000, 1)
+        if reports else None,
+    }
+    result.update(memory.result(len(jobs)))
+    if store:
+        result['store_counts'] = store.counts()
+        store.close()
+    return result
+
+
+def run_ui(paths: list) -> dict:
+    """Drive MainWindow's batch loop (hidden window) and measure its growth."""
+    import tkinter as tk
+    from tkinter import messagebox
+
+    try:
+        from ..ui.main_window import MainWindow
+        window = MainWindow()
+    except tk.TclError as e:
+        return {'skipped': f"no display: {e}"}
+    window.withdraw()
+    # Completion dialogs would block an unattended run
+    messagebox.showinfo = messagebox.showwarning = lambda *args, **kwargs: None
+
+    for path in paths:
+        window.job_ids[path] = window.job_store.add(path)
+        window.video_files.append(path)
+        window.files_listbox.insert(tk.END, os.path.basename(path))
+
+    memory = MemoryProbe()
+    started = time.monotonic()
+    window.start_processing()
+    while window.is_processing:
+        window.update()
+        time.sleep(0.005)
+    # Let queued log lines and callbacks land in the widgets
+    for _ in range(50):
+        window.update()
+    wall = time.monotonic() - started
+
+    result = {
+        'jobs': len(paths),
+        'wall_seconds': round(wall, 2),
+        'jobs_per_second': round(len(paths) / wall, 2) if wall else 0.0,
+        'log_lines': int(window.log_area.index('end-1c').split('.')[0]),
+    }
+    result.update(memory.result(len(paths)))
+    window.destroy()
+    return result
+
+
+def main(argv: list = None) -> int:
+    parser = argparse.ArgumentParser(description="Orchestration load test against the FFmpeg simulator")
+    parser.add_argument('--jobs', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--duration', type=float, default=60.0, help="Media seconds per input")
+    parser.add_argument('--speed', type=float, default=2000.0, help="Simulated encode speed (x realtime)")
+    parser.add_argument('--fail-every', type=int, default=0, help="Make every Nth input fail")
+    parser.add_argument('--store', action='store_true', help="Persist jobs in a JobStore")
+    parser.add_argument('--ui', action='store_true', help="Drive the Tk main window instead of the scheduler")
+    parser.add_argument('--keep', action='store_true', help="Keep the scratch directory")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    scratch = tempfile.mkdtemp(prefix="loadtest_")
+    Config.use_simulator()
+    Config.JOB_DB_PATH = os.path.join(scratch, "jobs.sqlite3")
+    Config.PROBE_CACHE_DIR = os.path.join(scratch, "probe")
+    os.environ['FAKE_FFMPEG_SPEED'] = str(args.speed)
+    os.environ.setdefault('FAKE_FFMPEG_TICK', "0.02")
+
+    try:
+        paths = make_batch(os.path.join(scratch, "inputs"), args.jobs, args.duration, fail_every=args.fail_every)
+        if args.ui:
+            result = run_ui(paths)
+        else:
+            result = run_scheduler(paths, args.workers, Config.JOB_DB_PATH if args.store else None)
+    finally:
+        if not args.keep:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    for key, value in result.items():
+        if isinstance(value, list):
+            print(f"{key}:")
+            for item in value:
+                print(f"  {item}")
+        else:
+            print(f"{key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
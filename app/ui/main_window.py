@@ -2,11 +2,16 @@ import tkinter as tk
 from tkinter import filedialog, ttk, scrolledtext, messagebox
 import threading
 import queue
+import concurrent.futures
 import logging
 import os
 from ..pipeline.pipeline import VideoPipeline
+from ..pipeline.predictor import Predictor
 from ..core.utils import get_output_path
 from ..core.config import Config
+from ..core.prefetch import PrefetchCache
+from ..core.jobstore import JobStore
+from ..core.telemetry import BatchTelemetry
 
 logger = logging.getLogger(__name__)
 
@@ -31,13 +36,24 @@ class MainWindow(tk.Tk):
         self.logo_path = None
         self.queue = queue.Queue()
         self.pipeline = VideoPipeline()
+        if Config.PREFETCH_ENABLED:
+            self.pipeline.prefetcher = PrefetchCache()
+        # Learns throughput from every encode; sizes and times upcoming batches
+        self.pipeline.predictor = Predictor()
         self.is_processing = False
+        # Durable queue: the batch survives crashes and restarts
+        self.job_store = JobStore()
+        self.job_ids = {}   # absolute video path -> JobStore id
+        # Marked before validation is queued: the pool may reach the commit right away
+        self.pipeline.encoded_callback = lambda path: self._mark_job(path, "validating")
+        self.pipeline.commit_callback = lambda path: self._mark_job(path, "committing")
         
         # Logging setup
         self.setup_logging()
         
         # UI Setup
         self.create_widgets()
+        self.restore_jobs()
         
         # Start periodic check for log messages
         self.after(100, self.process_queue)
@@ -95,17 +111,48 @@ class MainWindow(tk.Tk):
         self.log_area = scrolledtext.ScrolledText(log_frame, state='disabled', height=10)
         self.log_area.pack(fill="both", expand=True, padx=5, pady=5)
 
+    def restore_jobs(self):
+        """Resolve jobs interrupted by a crash and reload the unfinished batch."""
+        try:
+            summary = self.job_store.recover()
+        except Exception as e:
+            logger.error(f"Job recovery failed: {e}")
+            summary = {}
+        for row in self.job_store.jobs(state="queued"):
+            path = row['input_path']
+            if path not in self.job_ids:
+                self.job_ids[path] = row['id']
+                self.video_files.append(path)
+                self.files_listbox.insert(tk.END, os.path.basename(path))
+        if self.video_files:
+            self.queue.put(f"Restored {len(self.video_files)} unfinished videos from the last session {summary}")
+
     def add_videos(self):
         files = filedialog.askopenfilenames(filetypes=[("Video files", "*.mp4 *.mkv *.avi *.mov")])
         for f in files:
+            f = os.path.abspath(f)
             if f not in self.video_files:
+                self.job_ids[f] = self.job_store.add(f, get_output_path(f))
                 self.video_files.append(f)
                 self.files_listbox.insert(tk.END, os.path.basename(f))
 
     def clear_videos(self):
+        for path in self.video_files:
+            job_id = self.job_ids.pop(path, None)
+            if job_id is not None:
+                self.job_store.remove(job_id)
         self.video_files = []
         self.files_listbox.delete(0, tk.END)
 
+    def _mark_job(self, video_path: str, state: str, error: str = None):
+        job_id = self.job_ids.get(os.path.abspath(video_path))
+        if job_id is None:
+            return
+        try:
+            self.job_store.mark(job_id, state, error)
+        except Exception as e:
+            logger.error(f"Could not persist state of {video_path}: {e}")
+
     def select_logo(self):
         f = filedialog.askopenfilename(filetypes=[("Images", "*.png")])
         if f:
@@ -149,32 +196,67 @@ class MainWindow(tk.Tk):
         failed_videos = []
         try:
             total_files = len(self.video_files)
+            # Validation/commit of finished encodes runs on its own pool,
+            # so the next encode starts immediately.
+            pending = []
+            batch = list(self.video_files)
+            self.pipeline.executor.batch_telemetry = BatchTelemetry()
+
+            # Up-front size and time estimate for the whole batch
+            predictor = self.pipeline.predictor
+            estimates = {path: predictor.estimate(path, self.pipeline) for path in batch}
+            total_bytes = sum(e.output_bytes for e in estimates.values())
+            eta = predictor.batch_eta(list(estimates.values()))
+            eta_text = f"{int(eta // 3600)}h {int(eta % 3600 // 60):02d}m" if eta is not None else "unknown"
+            self.queue.put(f"Batch estimate: {len(batch)} videos, ~{total_bytes / 1024 ** 3:.1f} GB output, ETA {eta_text}")
             
-            for i, video_path in enumerate(list(self.video_files)):
+            for i, video_path in enumerate(batch):
                 filename = os.path.basename(video_path)
                 try:
+                    # Read-ahead: copy the next inputs locally while this one encodes
+                    if self.pipeline.prefetcher:
+                        self.pipeline.prefetcher.schedule(batch[i + 1:])
+                    
                     output_path = get_output_path(video_path)
+
+                    # Refuse up front instead of filling the disk halfway through the encode
+                    if not predictor.fits(video_path, estimates[video_path]):
+                        needed = predictor.required_bytes(estimates[video_path])
+                        raise RuntimeError(f"Insufficient disk space: needs {needed / 1048576:.0f} MB, "
+                                           f"{predictor.free_bytes(video_path) / 1048576:.0f} MB free")
                     
                     self.queue.put(f"Starting: {filename}")
+                    if os.path.abspath(video_path) not in self.job_ids:
+                        self.job_ids[os.path.abspath(video_path)] = self.job_store.add(video_path, output_path)
+                    self._mark_job(video_path, "running")
                     
                     # Define callback for this specific file
-                    def update_progress(p):
+                    def update_progress(p, i=i):
                         file_weight = 100 / total_files
                         base = i * file_weight
                         actual = base + (p / 100 * file_weight)
                         self.after(0, lambda v=actual, t=f"{int(p)}%": self._update_ui_progress(v, t))
 
-                    self.pipeline.process_video(video_path, output_path, self.logo_path, progress_callback=update_progress)
-                    self.queue.put(f"Finished: {filename}")
-                    
-                    # Auto-Removal Logic (UX Enhancement)
-                    if Config.AUTO_REMOVE_AFTER_SUCCESS:
-                        self.after(0, lambda p=video_path: self.remove_video_from_list(p))
+                    future = self.pipeline.submit_video(video_path, output_path, self.logo_path, progress_callback=update_progress)
+                    future.add_done_callback(
+                        lambda f, name=filename, path=video_path: self._on_video_committed(f, name, path, failed_videos)
+                    )
+                    pending.append(future)
                         
                 except Exception as e:
                     logger.error(f"Failed to process {filename}: {str(e)}")
+                    self._mark_job(video_path, "failed", str(e))
                     failed_videos.append((filename, str(e)))
                     self.queue.put(f"FAILED: {filename} - {str(e)}")
+
+            concurrent.futures.wait(pending)
+
+            resources = self.pipeline.executor.batch_telemetry.summary()
+            if resources['runs']:
+                self.queue.put(
+                    f"Resources: {resources['cores_used']} of {resources['cores_available']} cores, "
+                    f"peak RSS {resources['peak_rss_mb']} MB, disk {resources['disk_mb_per_sec']} MB/s"
+                )
             
             if not failed_videos:
                 self.queue.put("ALL TASKS COMPLETED SUCCESSFULLY.")
@@ -197,6 +279,23 @@ class MainWindow(tk.Tk):
             else:
                 self.after(0, lambda: messagebox.showinfo("Done", "Processing Complete Successfully"))
 
+    def _on_video_committed(self, future, filename: str, video_path: str, failed_videos: list):
+        """Runs on the validation pool once a video is validated and committed (or not)."""
+        error = future.exception()
+        if error:
+            logger.error(f"Failed to process {filename}: {str(error)}")
+            self._mark_job(video_path, "failed", str(error))
+            failed_videos.append((filename, str(error)))
+            self.queue.put(f"FAILED: {filename} - {str(error)}")
+            return
+
+        self._mark_job(video_path, "done")
+        self.queue.put(f"Finished: {filename}")
+        
+        # Auto-Removal Logic (UX Enhancement)
+        if Config.AUTO_REMOVE_AFTER_SUCCESS:
+            self.after(0, lambda p=video_path: self.remove_video_from_list(p))
+
     def _update_ui_progress(self, value, text):
         self.progress['value'] = value
         # Optional: could add a label for text if created, but prompt said "progress bar move".
@@ -210,6 +309,7 @@ class MainWindow(tk.Tk):
             if video_path in self.video_files:
                 index = self.video_files.index(video_path)
                 self.video_files.remove(video_path)
+                self.job_ids.pop(video_path, None)
                 self.files_listbox.delete(index)
                 logger.info(f"UI Clean: Removed {os.path.basename(video_path)} from list.")
                 
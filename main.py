@@ -1,17 +1,43 @@
-from app.ui.main_window import MainWindow
 from app.core.config import Config, GPUNotAvailableError
-import tkinter as tk
-from tkinter import messagebox
+import argparse
 import sys
 
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Video processing desktop app")
+    parser.add_argument('--serve', nargs='?', const=f"{Config.SERVICE_HOST}:{Config.SERVICE_PORT}",
+                        metavar="HOST:PORT", help="Run the HTTP job service instead of the window")
+    parser.add_argument('--workers', type=int, default=None, help="Concurrent encodes in service mode")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
+    args = parse_args()
+
+    if args.serve:
+        from app.service.server import serve
+        host, _, port = args.serve.rpartition(':')
+        try:
+            Config.require_gpu_support()
+            serve(host or Config.SERVICE_HOST, int(port), args.workers)
+        except KeyboardInterrupt:
+            pass
+        except Exception as e:
+            print(f"Critical Startup Error: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    from app.ui.main_window import MainWindow
+    import tkinter as tk
+    from tkinter import messagebox
+
     try:
         # Bootstrap: Strict GPU Contract Enforcement
         Config.require_gpu_support()
-        
+
         app = MainWindow()
         app.mainloop()
-        
+
     except GPUNotAvailableError as e:
         # Since GUI might not be initialized, use a temporary root for messagebox
         root = tk.Tk()
@@ -21,5 +47,5 @@ if __name__ == "__main__":
         sys.exit(1)
     except Exception as e:
         # Fallback for other critical startup errors
-        print(f"Critical Startup Error: {e}") 
+        print(f"Critical Startup Error: {e}")
         sys.exit(1)
@@ -0,0 +1,94 @@
+import json
+import pytest
+from unittest.mock import patch
+from app.core.ffmpeg import FFmpegExecutor, FFmpegCancelledError
+from app.pipeline.audio import AudioProcessor
+from app.pipeline.pipeline import VideoPipeline
+
+def probe_with(*audio):
+    return {"streams": [{"codec_type": "video"}] + [dict(codec_type="audio", **a) for a in audio]}
+
+def test_efficient_audio_is_copied():
+    processor = AudioProcessor(policy="auto")
+    with patch('app.pipeline.audio.probe_media', return_value=probe_with({"codec_name": "aac", "channels": 2})):
+        assert processor.get_output_args("input.mp4") == ['-c:a', 'copy']
+
+def test_pcm_surround_is_transcoded_to_stereo():
+    processor = AudioProcessor(policy="auto")
+    with patch('app.pipeline.audio.probe_media', return_value=probe_with({"codec_name": "pcm_s24le", "channels": 6})):
+        args = processor.get_output_args("input.mov")
+    assert args[args.index('-c:a') + 1] == 'aac'
+    assert args[args.index('-b:a') + 1] == '128k'
+    assert args[args.index('-ac') + 1] == '2'
+
+def test_speech_mono_downmix():
+    processor = AudioProcessor(policy="auto", mono=True)
+    with patch('app.pipeline.audio.probe_media', return_value=probe_with({"codec_name": "aac", "channels": 2})):
+        args = processor.get_output_args("input.mp4")
+    assert args[args.index('-ac') + 1] == '1'
+    assert args[args.index('-b:a') + 1] == '64k'
+
+def test_no_audio_stream():
+    processor = AudioProcessor(policy="transcode")
+    with patch('app.pipeline.audio.probe_media', return_value=probe_with()):
+        assert processor.get_output_args("screen.mp4") == ['-an']
+
+def test_loudnorm_uses_cached_measurement(tmp_path):
+    video = tmp_path / "lecture.mp4"
+    video.write_text("video content")
+    stats = {"input_i": "-27.1", "input_tp": "-8.0", "input_lra": "5.2",
+             "input_thresh": "-37.5", "target_offset": "0.3"}
+    stderr = ["[Parsed_loudnorm_0 @ 0x1]"] + json.dumps(stats, indent=1).splitlines()
+    processor = AudioProcessor(policy="auto", loudnorm=True)
+
+    def measure(args, output_callback=None, **kwargs):
+        for line in stderr:
+            output_callback(line)
+        return True
+
+    with patch('app.core.config.Config.PROBE_CACHE_DIR', str(tmp_path / "cache")), \
+         patch('app.pipeline.audio.probe_media', return_value=probe_with({"codec_name": "aac", "channels": 2})), \
+         patch('app.core.ffmpeg.FFmpegExecutor.run', side_effect=measure) as mock_run:
+        first = processor.get_output_args(str(video))
+        second = processor.get_output_args(str(video))
+
+    # Measured once, then served from the cache
+    assert mock_run.call_count == 1
+    assert first == second
+    af = first[first.index('-af') + 1]
+    assert "measured_I=-27.1" in af and "linear=true" in af
+    # loudnorm would otherwise hand the encoder 192 kHz
+    assert first[first.index('-ar') + 1] == '48000'
+
+def test_loudness_measurement_runs_on_the_jobs_executor(tmp_path):
+    """Cancelling the job must stop a measurement like any other stage."""
+    video = tmp_path / "lecture.mp4"
+    video.write_text("video content")
+    executor = FFmpegExecutor()
+    executor.cancel()
+    processor = AudioProcessor(policy="auto", loudnorm=True)
+
+    with patch('app.core.config.Config.PROBE_CACHE_DIR', str(tmp_path / "cache")), \
+         patch('app.pipeline.audio.probe_media', return_value=probe_with({"codec_name": "aac", "channels": 2})), \
+         patch('asyncio.create_subprocess_exec') as spawn:
+        with pytest.raises(FFmpegCancelledError):
+            processor.get_output_args(str(video), executor=executor)
+    spawn.assert_not_called()
+
+def test_loudnorm_keeps_source_sample_rate():
+    processor = AudioProcessor(policy="auto", loudnorm=True)
+    stream = {"codec_name": "aac", "channels": 2, "sample_rate": "44100"}
+    with patch('app.pipeline.audio.probe_media', return_value=probe_with(stream)):
+        args = processor.get_output_args("input.mp4", measure=False)
+    assert args[args.index('-ar') + 1] == '44100'
+    assert args.index('-af') < args.index('-ar')
+
+def test_pipeline_maps_audio_optionally(mock_ffmpeg):
+    """Videos without audio must not fail on the audio map."""
+    pipeline = VideoPipeline()
+    with patch('app.pipeline.audio.probe_media', return_value=probe_with()):
+        pipeline._run_pass("input.mp4", "output.mp4")
+    call_args = mock_ffmpeg.call_args[0][0]
+    assert '0:a?' in call_args
+    assert '0:a' not in call_args
+    assert '-an' in call_args
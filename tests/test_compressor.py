@@ -14,3 +14,13 @@ def test_compressor_args():
     
     idx_preset = args.index('-preset')
     assert args[idx_preset + 1] == 'fast'
+
+def test_compressor_static_content_x265():
+    processor = Compressor(codec='libx265')
+    args = processor.get_encoding_args(x265_params={'pools': '4'}, static_content=True)
+
+    # Thread and static-content settings share one -x265-params
+    assert args.count('-x265-params') == 1
+    params = args[args.index('-x265-params') + 1]
+    assert 'pools=4' in params and 'bframes=8' in params
+    assert '-g' in args
@@ -0,0 +1,105 @@
+import asyncio
+import sys
+import threading
+import time
+import pytest
+from app.core.ffmpeg import FFmpegExecutor, FFmpegCancelledError, FFmpegTimeoutError, FFmpegStallError
+
+# A stand-in child that talks like FFmpeg (progress lines end with '\r')
+FAKE_PROGRESS = (
+    "import sys\n"
+    "sys.stderr.write('  Duration: 00:00:10.00, start: 0.000000\\n')\n"
+    "for t in (2, 5, 8):\n"
+    "    sys.stderr.write(f'frame=  {t*25} time=00:00:0{t}.00 bitrate=1k\\r')\n"
+    "sys.stderr.flush()\n"
+)
+
+def make_executor():
+    # The interpreter plays the role of the ffmpeg binary
+    return FFmpegExecutor(executable_path=sys.executable)
+
+def test_run_reports_progress():
+    executor = make_executor()
+    progress = []
+    assert executor.run(['-c', FAKE_PROGRESS], callback=progress.append) is True
+    assert progress == [20.0, 50.0, 80.0, 100.0]
+
+def test_run_failure_includes_stderr():
+    executor = make_executor()
+    script = "import sys; sys.stderr.write('Unknown encoder\\n'); sys.exit(3)"
+    with pytest.raises(RuntimeError, match="Code 3"):
+        executor.run(['-c', script])
+
+def test_run_timeout_terminates_child():
+    executor = make_executor()
+    executor.GRACE_PERIOD = 0.5
+    start = time.time()
+    with pytest.raises(FFmpegTimeoutError):
+        executor.run(['-c', "import time; time.sleep(30)"], timeout=0.5)
+    assert time.time() - start < 5
+    assert executor.process.returncode is not None
+
+def test_cancel_from_other_thread():
+    executor = make_executor()
+    executor.GRACE_PERIOD = 0.5
+    threading.Timer(0.5, executor.cancel).start()
+    with pytest.raises(FFmpegCancelledError):
+        executor.run(['-c', "import time; time.sleep(30)"])
+    assert executor.process.returncode is not None
+    # A cancelled job gets no further runs (e.g. between the encode and a remux)
+    process = executor.process
+    with pytest.raises(FFmpegCancelledError):
+        executor.run(['-c', FAKE_PROGRESS])
+    assert executor.process is process
+    # ...until its owner starts the next job
+    executor.reset()
+    assert executor.run(['-c', FAKE_PROGRESS]) is True
+
+def test_one_loop_supervises_many_children():
+    async def main():
+        executors = [make_executor() for _ in range(8)]
+        return await asyncio.gather(*[
+            ex.run_async(['-c', "import time; time.sleep(0.3)"]) for ex in executors
+        ])
+
+    start = time.time()
+    assert asyncio.run(main()) == [True] * 8
+    # Children run concurrently, not one after another
+    assert time.time() - start < 2.0
+
+# Reports progress, then keeps printing the same position (or nothing) as if its input hung
+FAKE_STALL = (
+    "import sys, time\n"
+    "sys.stderr.write('frame=   50 time=00:00:02.00 bitrate=1k\\r'); sys.stderr.flush()\n"
+    "for _ in range(300):\n"
+    "    sys.stderr.write('frame=   50 time=00:00:02.00 bitrate=1k\\r'); sys.stderr.flush()\n"
+    "    time.sleep(0.1)\n"
+)
+
+def test_watchdog_kills_stalled_child():
+    executor = make_executor()
+    executor.GRACE_PERIOD = 0.5
+    executor.stall_timeout = 0.5
+    start = time.time()
+    with pytest.raises(FFmpegStallError, match="no progress"):
+        executor.run(['-c', FAKE_STALL])
+    assert time.time() - start < 5
+    assert executor.process.returncode is not None
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="SIGSTOP is POSIX-only")
+def test_watchdog_ignores_steady_progress_and_paused_time():
+    executor = make_executor()
+    executor.stall_timeout = 0.3
+    script = (
+        "import sys, time\n"
+        "for n in range(10):\n"
+        "    sys.stderr.write(f'frame={n} time=00:00:0{n}.00\\r'); sys.stderr.flush()\n"
+        "    time.sleep(0.1)\n"
+    )
+    assert executor.run(['-c', script]) is True
+
+    # A paused child makes no progress, but that is not a stall
+    executor.stall_timeout = 0.5
+    threading.Timer(0.1, executor.pause).start()
+    threading.Timer(0.9, executor.resume).start()
+    assert executor.run(['-c', "import time; time.sleep(0.3)"]) is True
@@ -0,0 +1,200 @@
+import os
+import struct
+from unittest.mock import patch, MagicMock
+from app.core import fmp4
+from app.core.config import Config
+from app.core.utils import get_processing_path
+from app.core.validation import check_output_structure
+
+def box(kind, payload=b""):
+    return struct.pack('>I4s', 8 + len(payload), kind.encode()) + payload
+
+def full_box(kind, payload, version=0, flags=0):
+    return box(kind, struct.pack('>I', version << 24 | flags) + payload)
+
+def trak(track_id, handler, timescale):
+    tkhd = full_box('tkhd', struct.pack('>IIII', 0, 0, track_id, 0))
+    mdhd = full_box('mdhd', struct.pack('>IIII', 0, 0, timescale, 0))
+    hdlr = full_box('hdlr', struct.pack('>I4s', 0, handler.encode()))
+    return box('trak', tkhd + box('mdia', mdhd + hdlr))
+
+def header(fragmented=True):
+    mvex = box('mvex', full_box('trex', struct.pack('>IIII', 1, 1, 0, 0))
+                       + full_box('trex', struct.pack('>IIII', 2, 1, 1024, 0)))
+    moov = trak(1, 'vide', 90000) + trak(2, 'soun', 48000) + (mvex if fragmented else b"")
+    return box('ftyp', b"isom" + b"\0" * 4) + box('moov', moov)
+
+def fragment(n, seconds=2, audio_seconds=None):
+    frames = 30 * seconds
+    video = box('traf', full_box('tfhd', struct.pack('>I', 1))
+                + full_box('tfdt', struct.pack('>Q', n * seconds * 90000), version=1)
+                + full_box('trun', struct.pack('>I', frames) + struct.pack('>I', 3000) * frames, flags=0x100))
+    # Audio relies on the trex default sample duration
+    samples = (audio_seconds or seconds) * 48000 // 1024
+    audio = box('traf', full_box('tfhd', struct.pack('>I', 2))
+                + full_box('tfdt', struct.pack('>I', n * (seconds * 48000 // 1024) * 1024))
+                + full_box('trun', struct.pack('>I', samples)))
+    return box('moof', video + audio) + box('mdat', b"\0" * 64)
+
+def write_fragmented(path, count, partial=False, audio_ahead=False):
+    # audio_ahead: the last fragment carries a second more audio than video
+    data = header() + b"".join(fragment(n, audio_seconds=3 if audio_ahead and n == count - 1 else None)
+                               for n in range(count))
+    if partial:
+        data += fragment(count)[:-20]  # moof written, mdat cut short
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+def test_scan_reads_tracks_and_fragment_durations(tmp_path):
+    scan = fmp4.scan(write_fragmented(tmp_path / "out.mp4", 3))
+    assert scan.fragmented and scan.fragments == 3
+    assert scan.track_duration(1) == 6.0
+    assert abs(scan.track_duration(2) - 6.0) < 0.05
+    assert [s['codec_type'] for s in scan.streams] == ['video', 'audio']
+    assert scan.streams[0]['nb_read_packets'] == '180'
+
+def test_interrupted_output_is_truncated_to_last_fragment(tmp_path):
+    path = write_fragmented(tmp_path / "out.mp4", 3, partial=True)
+    assert not check_output_structure(path)
+
+    kept = fmp4.truncate_incomplete(path)
+    assert kept.fragments == 3 and os.path.getsize(path) == kept.complete_size
+    assert check_output_structure(path, expected_duration=6.0)
+    assert not check_output_structure(path, expected_duration=60.0)
+
+def test_regular_mp4_and_other_files_are_not_fragmented(tmp_path):
+    regular = tmp_path / "regular.mp4"
+    regular.write_bytes(header(fragmented=False) + box('mdat', b"\0" * 64))
+    other = tmp_path / "other.mp4"
+    other.write_bytes(b"FAKEMEDIA {}")
+    assert not fmp4.is_fragmented(str(regular))
+    assert not fmp4.is_fragmented(str(other))
+
+def test_fragmented_pipeline_sets_movflags(mock_ffmpeg):
+    from app.pipeline.pipeline import VideoPipeline
+    from app.pipeline.outputs import OutputSpec
+    pipeline = VideoPipeline()
+    pipeline.fragmented = True
+    cmd = pipeline._build_command("in.mp4", [OutputSpec("out.processing.mp4")], measure_loudness=False)
+    assert cmd[cmd.index('-movflags') + 1] == fmp4.FRAGMENT_MOVFLAGS
+
+def resume_from(pipeline, video, temp_output, tmp_path, run=None):
+    """Render `video` over the fragments in `temp_output`, recorded as made by `pipeline`."""
+    from app.pipeline import pipeline as module
+    with patch.object(Config, 'PROBE_CACHE_DIR', str(tmp_path / "cache")), \
+         patch('app.pipeline.pipeline.find_srt_file', return_value=None), \
+         patch('app.pipeline.pipeline.get_duration', return_value=100.0):
+        module._write_resume_key(temp_output, pipeline._resume_key(str(video)))
+        if run:
+            run()
+        return pipeline._render(str(video), str(video))
+
+def test_interrupted_encode_resumes_after_kept_fragments(tmp_path, mock_ffmpeg):
+    from app.pipeline.pipeline import VideoPipeline
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"source")
+    temp_output = get_processing_path(str(video))
+    write_fragmented(temp_output, 20, partial=True)     # 40 s survived the crash
+
+    concat_inputs, watched = [], []
+    def run(cmd, callback=None, **kwargs):
+        watched.append(kwargs.get('stall_timeout'))
+        if '-f' in cmd:
+            concat_inputs.append(open(cmd[cmd.index('-i') + 1], encoding='utf-8').read())
+        open(cmd[-1], 'wb').close()
+        return True
+    mock_ffmpeg.side_effect = run
+
+    pipeline = VideoPipeline()
+    pipeline.fragmented = True
+    rendered = resume_from(pipeline, video, temp_output, tmp_path)
+
+    tail, join = [call[0][0] for call in mock_ffmpeg.call_args_list]
+    assert tail[tail.index('-ss') + 1] == '40.0' and '-t' not in tail
+    assert join[join.index('-c') + 1] == 'copy'
+    assert ".head.mp4" in concat_inputs[0] and ".tail.mp4" in concat_inputs[0]
+    assert not os.path.exists(temp_output.replace(".processing", ".processing.head"))
+    assert rendered[1] == temp_output
+    # The watchdog covers the encode only; the concat copies without reporting much progress
+    assert watched == [Config.FFMPEG_STALL_TIMEOUT, None] and pipeline.executor.stall_timeout is None
+
+def test_resume_continues_after_the_last_video_fragment(tmp_path, mock_ffmpeg):
+    """Audio that ran ahead of the video is cut from the head and encoded again."""
+    from app.pipeline.pipeline import VideoPipeline
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"source")
+    temp_output = write_fragmented(get_processing_path(str(video)), 20, audio_ahead=True)
+    assert fmp4.scan(temp_output).duration > 40.5
+
+    concat_inputs = []
+    def run(cmd, callback=None, **kwargs):
+        if '-f' in cmd:
+            concat_inputs.append(open(cmd[cmd.index('-i') + 1], encoding='utf-8').read())
+        open(cmd[-1], 'wb').close()
+        return True
+    mock_ffmpeg.side_effect = run
+
+    pipeline = VideoPipeline()
+    pipeline.fragmented = True
+    resume_from(pipeline, video, temp_output, tmp_path)
+
+    tail = mock_ffmpeg.call_args_list[0][0][0]
+    assert tail[tail.index('-ss') + 1] == '40.0'
+    assert "outpoint 40.000000" in concat_inputs[0]
+
+def test_fragments_of_other_settings_are_encoded_again(tmp_path, mock_ffmpeg):
+    from app.pipeline.pipeline import VideoPipeline
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"source")
+    temp_output = write_fragmented(get_processing_path(str(video)), 20)
+
+    pipeline = VideoPipeline()
+    pipeline.fragmented = True
+    # The fragments were written before the quality was changed
+    resume_from(pipeline, video, temp_output, tmp_path,
+                run=lambda: setattr(pipeline.compressor, 'quality', pipeline.compressor.quality + 2))
+
+    cmd = mock_ffmpeg.call_args[0][0]
+    assert mock_ffmpeg.call_count == 1 and '-ss' not in cmd
+
+def test_short_leftover_is_encoded_again(tmp_path, mock_ffmpeg):
+    from app.pipeline.pipeline import VideoPipeline
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"source")
+    temp_output = write_fragmented(get_processing_path(str(video)), 2)
+
+    pipeline = VideoPipeline()
+    pipeline.fragmented = True
+    resume_from(pipeline, video, temp_output, tmp_path)
+
+    cmd = mock_ffmpeg.call_args[0][0]
+    assert mock_ffmpeg.call_count == 1 and '-ss' not in cmd
+
+def test_recovery_keeps_resumable_fragments(tmp_path):
+    from app.core.jobstore import JobStore
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"original")
+    temp_output = write_fragmented(get_processing_path(str(video)), 3, partial=True)
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.add(str(video))
+    store.mark(job_id, "running")
+
+    with patch.object(Config, 'FRAGMENTED_OUTPUT', True):
+        assert store.recover()["requeued"] == 1
+    assert os.path.exists(temp_output)
+    assert store.get(job_id)['state'] == "queued"
+
+def test_faststart_does_not_share_the_encode_executor(tmp_path, mock_ffmpeg):
+    from app.pipeline.pipeline import VideoPipeline
+    temp = tmp_path / "lecture.processing.mp4"
+    temp.write_bytes(b"fragmented")
+    mock_ffmpeg.side_effect = lambda cmd, callback=None, **kwargs: open(cmd[-1], 'wb').write(b"faststart") and True
+
+    pipeline = VideoPipeline()
+    pipeline.executor = MagicMock(executable="ffmpeg")
+    pipeline._faststart(str(temp))
+    # The next video's encode may be running on pipeline.executor meanwhile
+    assert not pipeline.executor.run.called
+    assert mock_ffmpeg.call_count == 1
+    assert temp.read_bytes() == b"faststart"
@@ -0,0 +1,93 @@
+from unittest.mock import patch
+from app.core.jobstore import JobStore
+from app.core.utils import get_processing_path
+
+def make_store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+def test_states_attempts_and_timings(tmp_path):
+    store = make_store(tmp_path)
+    job_id = store.add(str(tmp_path / "a.mp4"))
+    assert store.get(job_id)['state'] == "queued"
+
+    store.mark(job_id, "running")
+    store.mark(job_id, "validating")
+    store.mark(job_id, "done")
+    row = store.get(job_id)
+    assert row['state'] == "done" and row['attempts'] == 1
+    assert row['created_at'] <= row['started_at'] <= row['finished_at']
+
+def test_persists_across_reopen_in_priority_order(tmp_path):
+    store = make_store(tmp_path)
+    store.add_many([str(tmp_path / f"{n}.mp4") for n in range(1000)])
+    urgent = store.add(str(tmp_path / "urgent.mp4"), priority=0)
+    store.close()
+
+    reopened = make_store(tmp_path)
+    queued = reopened.jobs(state="queued", limit=2)
+    assert queued[0]['id'] == urgent
+    assert reopened.counts() == {"queued": 1001}
+
+def test_remove_only_drops_queued_jobs(tmp_path):
+    store = make_store(tmp_path)
+    queued, running = store.add_many([str(tmp_path / "a.mp4"), str(tmp_path / "b.mp4")])
+    store.mark(running, "running")
+    assert store.remove(queued) is True
+    assert store.remove(running) is False
+
+def test_recover_requeues_interrupted_encode_and_deletes_partial(tmp_path):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"original")
+    partial = tmp_path / "lecture.processing.mp4"
+    partial.write_bytes(b"half")
+    store = make_store(tmp_path)
+    job_id = store.add(str(video))
+    store.mark(job_id, "running")
+
+    assert store.recover()["requeued"] == 1
+    assert store.get(job_id)['state'] == "queued"
+    assert not partial.exists()
+    assert video.read_bytes() == b"original"
+
+def test_recover_reuses_validated_output(tmp_path):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"original")
+    (tmp_path / "lecture.srt").write_text("1\n00:00:01,000 --> 00:00:02,000\nhi\n", encoding='utf-8')
+    finished = tmp_path / "lecture.processing.mp4"
+    finished.write_bytes(b"encoded")
+    store = make_store(tmp_path)
+    job_id = store.add(str(video))
+    store.mark(job_id, "running")
+    store.mark(job_id, "validating")
+
+    with patch('app.core.jobstore.get_duration', return_value=60.0), \
+         patch('app.core.jobstore.check_output_structure', return_value=True):
+        assert store.recover()["committed"] == 1
+
+    assert store.get(job_id)['state'] == "done"
+    assert video.read_bytes() == b"encoded"
+    assert not finished.exists()
+    assert not (tmp_path / "lecture.srt").exists()
+
+def test_recover_completed_commit_is_done(tmp_path):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"encoded")
+    store = make_store(tmp_path)
+    job_id = store.add(str(video))
+    store.mark(job_id, "committing")
+
+    assert store.recover()["done"] == 1
+    assert store.get(job_id)['state'] == "done"
+
+def test_recover_gives_up_after_max_attempts(tmp_path):
+    store = make_store(tmp_path)
+    job_id = store.add(str(tmp_path / "crashy.mp4"))
+    with patch('app.core.config.Config.JOB_MAX_ATTEMPTS', 2):
+        for _ in range(2):
+            store.mark(job_id, "running")
+            store.recover()
+    row = store.get(job_id)
+    assert row['state'] == "failed" and row['attempts'] == 2
+
+def test_processing_path():
+    assert get_processing_path("/videos/a.mkv") == "/videos/a.processing.mkv"
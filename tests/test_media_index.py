@@ -0,0 +1,140 @@
+import os
+import threading
+from array import array
+from unittest.mock import patch, MagicMock
+import pytest
+from app.core import media_index, probe
+from app.core.config import Config
+from app.core.media_index import MediaIndex
+
+# ffprobe -show_entries packet=pts_time,pos,flags -of csv=p=0 (decode order, one B-frame)
+PACKETS = "0.000000,48,K__\n0.080000,9120,___\n0.040000,10020,___\n2.000000,50210,K__\nN/A,N/A,K__\n4.000000,99871,K_\n"
+
+@pytest.fixture
+def cache(tmp_path):
+    with patch.object(Config, 'PROBE_CACHE_DIR', str(tmp_path / "cache")):
+        media_index._memory_cache.clear()
+        yield tmp_path
+        media_index._memory_cache.clear()
+
+def test_lookups_and_binary_round_trip():
+    index = MediaIndex(array('d', [0.0, 2.0, 4.0]), array('q', [48, -1, 99871]),
+                       array('d', [3.5]), array('f', [0.75]))
+    assert index.keyframe_before(3.9) == 2.0 and index.keyframe_before(4.0) == 4.0
+    assert index.keyframe_after(2.1) == 4.0 and index.keyframe_after(4.5) is None
+    assert index.is_keyframe(2.0) and not index.is_keyframe(2.5)
+    assert index.snap(2.4, tolerance=0.5) == 2.0 and index.snap(3.0, tolerance=0.5) == 3.0
+    assert index.offset_of(4.0) == 99871 and index.offset_of(2.0) is None
+
+    restored = MediaIndex.from_bytes(index.to_bytes())
+    assert list(restored.keyframes) == [0.0, 2.0, 4.0]
+    assert list(restored.offsets) == [48, -1, 99871]
+    assert restored.scene_cuts() == [(3.5, 0.75)]
+    # Keyframes only: no scene data, and not mistaken for "no cuts found"
+    assert not MediaIndex.from_bytes(MediaIndex(array('d'), array('q')).to_bytes()).has_scenes
+    with pytest.raises(ValueError):
+        MediaIndex.from_bytes(index.to_bytes()[:-4])
+
+def test_file_is_scanned_once(cache):
+    video = cache / "lecture.mp4"
+    video.write_bytes(b"video")
+    result = MagicMock(returncode=0, stdout=PACKETS, stderr="")
+    with patch('subprocess.run', return_value=result) as mock_run:
+        assert probe.probe_keyframes(str(video)) == [0.0, 2.0, 4.0]
+        media_index._memory_cache.clear()
+        index = media_index.get_index(str(video))
+        assert mock_run.call_count == 1
+    assert list(index.offsets) == [48, 50210, 99871]
+    assert os.path.exists(probe.cache_path(probe.file_signature(str(video)), ".idx"))
+
+    # A rewritten file is a new signature: scanned again
+    video.write_bytes(b"re-encoded video")
+    with patch('subprocess.run', return_value=result) as mock_run:
+        media_index.get_index(str(video))
+        assert mock_run.call_count == 1
+
+def test_keyframes_are_relative_to_the_container_start(cache):
+    video = cache / "broadcast.ts"
+    video.write_bytes(b"video")
+    # MPEG-TS: the first packet is stamped 1.4 s, the format section follows the packets
+    packets = "1.400000,564,K__\n3.400000,188000,K__\n1.480000,9400,___\n1.400000\n"
+    with patch('subprocess.run', return_value=MagicMock(returncode=0, stdout=packets, stderr="")):
+        index = media_index.get_index(str(video))
+    assert list(index.keyframes) == [pytest.approx(0.0), pytest.approx(2.0)]
+    # -ss 2 lands on the second keyframe, not 0.6 s before it
+    assert index.is_keyframe(2.0) and not index.is_keyframe(3.4)
+
+    media_index._memory_cache.clear()
+    restored = media_index.cached_index(str(video))
+    assert restored.start_time == 1.4 and list(restored.keyframes) == list(index.keyframes)
+
+def test_unreadable_sidecar_is_rebuilt(cache):
+    video = cache / "lecture.mp4"
+    video.write_bytes(b"video")
+    with open(probe.cache_path(probe.file_signature(str(video)), ".idx"), 'wb') as f:
+        f.write(b"VIDX\x01")
+    result = MagicMock(returncode=0, stdout=PACKETS, stderr="")
+    with patch('subprocess.run', return_value=result) as mock_run:
+        assert list(media_index.get_index(str(video)).keyframes) == [0.0, 2.0, 4.0]
+        assert mock_run.call_count == 1
+
+def test_background_build_fills_the_cache_once(cache):
+    video = cache / "lecture.mp4"
+    video.write_bytes(b"video")
+    assert media_index.cached_index(str(video)) is None
+
+    release, threads = threading.Event(), []
+    def scan(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        release.wait(5)
+        return MagicMock(returncode=0, stdout=PACKETS, stderr="")
+
+    with patch('subprocess.run', side_effect=scan) as mock_run:
+        first = media_index.build_in_background(str(video))
+        # Still scanning: the caller is not held up and a second request joins the first
+        assert media_index.build_in_background(str(video)) is first
+        release.set()
+        first.result(timeout=5)
+        assert mock_run.call_count == 1
+    # Its own pool: scans never hold up validation and commits
+    assert threads[0].startswith("index")
+    assert list(media_index.cached_index(str(video)).keyframes) == [0.0, 2.0, 4.0]
+
+def test_scene_scores_are_added_to_an_existing_index(cache):
+    video = cache / "lecture.mp4"
+    video.write_bytes(b"video")
+    log = [
+        "[Parsed_metadata_2 @ 0x55d0] frame:0    pts:37376   pts_time:2.92",
+        "[Parsed_metadata_2 @ 0x55d0] lavfi.scene_score=0.412",
+        "frame=  310 fps=0.0 q=-0.0 size=N/A time=00:00:12.40 bitrate=N/A",
+        "[Parsed_metadata_2 @ 0x55d0] frame:1    pts:122880  pts_time:9.6",
+        "[Parsed_metadata_2 @ 0x55d0] lavfi.scene_score=0.871",
+    ]
+
+    async def run(args, callback=None, timeout=None, output_callback=None):
+        assert "scale=160:-2,select='gt(scene,0.3)',metadata=print" in args
+        for line in log:
+            output_callback(line)
+        return True
+
+    result = MagicMock(returncode=0, stdout=PACKETS, stderr="")
+    with patch('subprocess.run', return_value=result) as mock_run, \
+         patch('app.core.ffmpeg.FFmpegExecutor.run_async', side_effect=run) as mock_decode:
+        assert not media_index.get_index(str(video)).has_scenes
+        index = media_index.get_index(str(video), scenes=True)
+        media_index._memory_cache.clear()
+        assert media_index.get_index(str(video), scenes=True).scene_cuts(min_score=0.5) == [(9.6, pytest.approx(0.871))]
+        assert mock_run.call_count == 1 and mock_decode.call_count == 1
+    assert [t for t, _ in index.scene_cuts()] == [2.92, 9.6]
+
+def test_trim_on_keyframe_keeps_soft_subtitle_remux(mock_ffmpeg, tmp_path):
+    from app.pipeline.pipeline import VideoPipeline
+    pipeline = VideoPipeline()
+    pipeline.subtitle_mode = "mux"
+    index = MediaIndex(array('d', [0.0, 120.0, 180.0]), array('q', [0, 1, 2]))
+    with patch.object(media_index, 'get_index', return_value=index):
+        pipeline._run_pass("input.mp4", "output.mp4", srt_path="input_ar.srt", input_args=['-ss', '120', '-t', '60'])
+        assert mock_ffmpeg.call_args[0][0][mock_ffmpeg.call_args[0][0].index('-c:v') + 1] == 'copy'
+
+        pipeline._run_pass("input.mp4", "output.mp4", srt_path="input_ar.srt", input_args=['-ss', '121', '-t', '60'])
+        assert mock_ffmpeg.call_args[0][0][mock_ffmpeg.call_args[0][0].index('-c:v') + 1] == pipeline.compressor.codec
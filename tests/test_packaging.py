@@ -0,0 +1,63 @@
+from app.pipeline.packaging import Packager
+from app.pipeline.outputs import OutputSpec
+from app.pipeline.pipeline import VideoPipeline
+import pytest
+
+def test_hls_output_args():
+    packager = Packager("hls", segment_duration=4)
+    args = packager.get_output_args("/out/lecture.m3u8")
+
+    assert args[args.index('-f') + 1] == 'hls'
+    assert args[args.index('-hls_time') + 1] == '4'
+    assert args[args.index('-hls_segment_type') + 1] == 'fmp4'
+    assert args[args.index('-hls_segment_filename') + 1] == '/out/lecture_%05d.m4s'
+    assert args[-1] == '/out/lecture.m3u8'
+
+def test_dash_output_args_with_hls_playlist():
+    packager = Packager("dash", segment_duration=6, hls_playlist=True)
+    args = packager.get_output_args("/out/lecture.mpd")
+
+    assert args[args.index('-f') + 1] == 'dash'
+    assert args[args.index('-seg_duration') + 1] == '6'
+    assert '-hls_playlist' in args
+    assert args[-1] == '/out/lecture.mpd'
+
+def test_keyframes_aligned_to_segments():
+    packager = Packager("hls", segment_duration=6)
+    args = packager.get_keyframe_args("hevc_nvenc")
+
+    assert args[args.index('-force_key_frames') + 1] == "expr:gte(t,n_forced*6)"
+    assert '-forced-idr' in args
+    assert args[args.index('-tag:v') + 1] == 'hvc1'
+
+def test_invalid_mode():
+    with pytest.raises(ValueError):
+        Packager("smooth")
+
+def test_pipeline_packaged_output(mock_ffmpeg):
+    """Test that a packaged spec is written by the encoder in the same pass."""
+    pipeline = VideoPipeline()
+    spec = OutputSpec("/out/lecture.m3u8", packager=Packager("hls"))
+    pipeline._run_pass("input.mp4", [spec])
+
+    call_args = mock_ffmpeg.call_args[0][0]
+    assert call_args.count('-i') == 1
+    assert 'hls' in call_args
+    assert call_args[-1] == "/out/lecture.m3u8"
+
+def test_commit_moves_segments_then_manifest(tmp_path):
+    packager = Packager("hls")
+    manifest = tmp_path / "lecture.m3u8"
+    staged = packager.staging_path(str(manifest))
+
+    staging_dir = tmp_path / "lecture.processing"
+    (staging_dir / "lecture_00000.m4s").write_bytes(b"segment")
+    (staging_dir / "lecture_init.mp4").write_bytes(b"init")
+    (staging_dir / "lecture.m3u8").write_text("#EXTM3U")
+
+    assert packager.validate(staged)
+    packager.commit(staged, str(manifest))
+
+    assert manifest.read_text() == "#EXTM3U"
+    assert (tmp_path / "lecture_00000.m4s").exists()
+    assert not staging_dir.exists()
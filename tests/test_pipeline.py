@@ -38,6 +38,19 @@ def test_pipeline_execution_gpu_only(mock_ffmpeg):
         # Assert cleanup flow
         mock_replace.assert_called_once() # Startup check + Atomic replace
 
+def test_cancel_does_not_outlive_its_job(mock_ffmpeg):
+    pipeline = VideoPipeline()
+    pipeline.executor.cancel()      # The previous video of a reused pipeline was cancelled
+    refused = []
+    mock_ffmpeg.side_effect = lambda cmd, callback=None, **kwargs: refused.append(pipeline.executor.cancelled) or True
+    with patch('app.pipeline.pipeline.find_srt_file', return_value=None), \
+         patch('app.core.utils.validate_output_video', return_value=True), \
+         patch('app.core.utils.wait_for_file_release', return_value=True), \
+         patch('os.path.exists', return_value=True), \
+         patch('os.replace'):
+        pipeline.process_video("input.mp4", "output.mp4")
+    assert refused == [False]
+
 def test_pipeline_failure_no_fallback(mock_ffmpeg):
     """Test that pipeline raises exception immediately on failure without fallback."""
     pipeline = VideoPipeline()
@@ -57,3 +70,163 @@ def test_pipeline_failure_no_fallback(mock_ffmpeg):
         
         # Verify temp file cleanup
         mock_remove.assert_called()
+
+def test_multi_output_single_decode(mock_ffmpeg):
+    """Test that several output specs share one decode through a split filter."""
+    from app.pipeline.outputs import OutputSpec
+    pipeline = VideoPipeline()
+
+    specs = [
+        OutputSpec("out_1080.mp4", height=1080, srt_path="ar.srt"),
+        OutputSpec("out_720.mp4", height=720, srt_path="en.srt"),
+        OutputSpec("out_480.mp4", height=480),
+    ]
+    pipeline._run_pass("input.mp4", specs)
+
+    # One FFmpeg process for all outputs
+    assert mock_ffmpeg.call_count == 1
+    call_args = mock_ffmpeg.call_args[0][0]
+
+    # Single input, split into three branches
+    assert call_args.count('-i') == 1
+    graph = call_args[call_args.index('-filter_complex') + 1]
+    assert "[0:v]split=3[b0][b1][b2]" in graph
+    assert "min(720,ih)" in graph
+    assert "ar.srt" in graph and "en.srt" in graph
+
+    # Every output gets its own encoder and path
+    assert call_args.count('-c:v') == 3
+    for spec in specs:
+        assert spec.output_path in call_args
+    assert call_args[-1] == "out_480.mp4"
+
+def test_soft_subtitles_remux_copies_video(mock_ffmpeg):
+    """Mux mode without other filters is a pure remux: no decode, no encode."""
+    pipeline = VideoPipeline()
+    pipeline.subtitle_mode = "mux"
+    pipeline._run_pass("input.mp4", "output.mp4", srt_path="input_ar.srt")
+
+    call_args = mock_ffmpeg.call_args[0][0]
+    assert '-filter_complex' not in call_args
+    assert call_args[call_args.index('-c:v') + 1] == 'copy'
+    assert '1:s' in call_args
+    assert 'language=ara' in call_args
+    assert call_args[-1] == "output.mp4"
+
+def test_soft_subtitles_with_watermark_still_encodes(mock_ffmpeg):
+    pipeline = VideoPipeline()
+    pipeline.subtitle_mode = "mux"
+    with patch('os.path.exists', return_value=True):
+        pipeline._run_pass("input.mp4", "output.mp4", srt_path="input.srt", logo_path="logo.png")
+
+    call_args = mock_ffmpeg.call_args[0][0]
+    graph = call_args[call_args.index('-filter_complex') + 1]
+    assert "subtitles=" not in graph
+    assert "overlay=" in graph
+    assert call_args[call_args.index('-c:v') + 1] == pipeline.compressor.codec
+    assert call_args[call_args.index('-c:s:0') + 1] == 'mov_text'
+
+def test_normalization_runs_first(mock_ffmpeg):
+    """4K60 sources are capped to 1080p30 before subtitles are rendered."""
+    pipeline = VideoPipeline()
+    pipeline.max_height, pipeline.max_fps = 1080, 30
+    source = {"streams": [{"codec_type": "video", "height": 2160, "avg_frame_rate": "60/1"}]}
+
+    with patch('app.pipeline.pipeline.probe_media', return_value=source):
+        pipeline._run_pass("input.mp4", "output.mp4", srt_path="test.srt")
+
+    call_args = mock_ffmpeg.call_args[0][0]
+    graph = call_args[call_args.index('-filter_complex') + 1]
+    normalize, subtitles = graph.split(";")
+    assert normalize.startswith("[0:v]fps=fps=30,scale=-2:'min(1080,ih)':flags=lanczos")
+    assert subtitles.startswith("[n0]subtitles=")
+
+def test_normalization_skipped_within_caps(mock_ffmpeg):
+    """Never upscale or duplicate frames: a 720p25 source is left alone."""
+    pipeline = VideoPipeline()
+    pipeline.max_height, pipeline.max_fps = 1080, 30
+    source = {"streams": [{"codec_type": "video", "height": 720, "avg_frame_rate": "25/1"}]}
+
+    with patch('app.pipeline.pipeline.probe_media', return_value=source):
+        pipeline._run_pass("input.mp4", "output.mp4")
+
+    call_args = mock_ffmpeg.call_args[0][0]
+    assert '-filter_complex' not in call_args
+
+def test_lecture_mode_drops_duplicates_after_overlays(mock_ffmpeg):
+    """Duplicate dropping runs on composited frames and the output is VFR."""
+    pipeline = VideoPipeline()
+    pipeline.content_mode = "lecture"
+    with patch('os.path.exists', return_value=True):
+        pipeline._run_pass("input.mp4", "output.mp4", srt_path="test.srt", logo_path="logo.png")
+
+    call_args = mock_ffmpeg.call_args[0][0]
+    graph = call_args[call_args.index('-filter_complex') + 1]
+    assert graph.index("subtitles=") < graph.index("overlay=") < graph.index("mpdecimate=")
+    assert call_args[call_args.index('-fps_mode') + 1] == 'vfr'
+    assert '-force_key_frames' in call_args
+    assert '-temporal-aq' in call_args
+
+def test_silent_lecture_output_may_end_on_a_dropped_still(tmp_path):
+    """mpdecimate drops a still ending; without audio the output ends up to max= frames early."""
+    source = tmp_path / "lecture.mp4"
+    source.write_bytes(b"source")
+    temp_output = tmp_path / "lecture.processing.mp4"
+    probe = {"streams": [{"codec_type": "video", "avg_frame_rate": "30/1"}]}
+    # The last 2 s (60 frames at 30 fps) showed the same slide; there is no audio track
+    structure = {"streams": [{"index": 0, "codec_type": "video", "nb_read_packets": "900"}],
+                 "format": {"duration": "58.000000", "nb_streams": 1}}
+
+    def finalize(content_mode):
+        temp_output.write_bytes(b"encoded")
+        pipeline = VideoPipeline()
+        pipeline.content_mode = content_mode
+        pipeline._finalize(str(source), str(temp_output), expected_duration=60.0)
+
+    with patch('app.pipeline.pipeline.probe_media', return_value=probe), \
+         patch('app.core.validation.probe_structure', return_value=structure), \
+         patch('app.core.utils.wait_for_file_release', return_value=True):
+        with pytest.raises(RuntimeError, match="validation failed"):
+            finalize("default")
+        finalize("lecture")
+    assert source.read_bytes() == b"encoded"
+
+def test_time_range_seeks_and_slices_subtitles(mock_ffmpeg, tmp_path):
+    """Only the kept range is decoded; the SRT is sliced and rebased to it."""
+    srt = tmp_path / "input.srt"
+    srt.write_text("1\n00:00:05,000 --> 00:00:07,000\nbefore\n\n"
+                   "2\n00:01:59,000 --> 00:02:01,000\nacross start\n", encoding='utf-8')
+    pipeline = VideoPipeline()
+    pipeline.subtitle_mode = "mux"
+    seen = {}
+
+    def capture(cmd, callback=None, **kwargs):
+        sub_input = cmd[[i for i, a in enumerate(cmd) if a == '-i'][1] + 1]
+        seen['srt'] = open(sub_input, encoding='utf-8').read()
+        callback(10.0)
+
+    mock_ffmpeg.side_effect = capture
+    progress = []
+    with patch('app.pipeline.pipeline.find_srt_file', return_value=str(srt)), \
+         patch('app.pipeline.pipeline.get_duration', return_value=600.0):
+        rendered = pipeline._render(str(tmp_path / "input.mp4"), "out.mp4",
+                                    progress_callback=progress.append, start=120, end=180)
+
+    cmd = mock_ffmpeg.call_args[0][0]
+    assert cmd[cmd.index('-ss') + 1] == '120' and cmd[cmd.index('-t') + 1] == '60'
+    assert cmd.index('-ss') < cmd.index('-i')
+    # Trimmed soft-subtitle jobs are re-encoded: stream copy can only cut on keyframes
+    assert cmd[cmd.index('-c:v') + 1] == pipeline.compressor.codec
+    assert seen['srt'] == "1\n00:00:00,000 --> 00:00:01,000\nacross start\n"
+    # Validation expects the range length; progress is relative to the range
+    assert rendered[4] == 60.0
+    assert progress == [99.0]
+
+def test_encoded_callback_runs_before_validation_is_queued():
+    pipeline = VideoPipeline()
+    states = []
+    pipeline.encoded_callback = lambda path: states.append("validating")
+    with patch.object(VideoPipeline, '_render', return_value=("input.mp4",)), \
+         patch.object(VideoPipeline, '_finalize', side_effect=lambda *args: states.append("committing")):
+        pipeline.submit_video("input.mp4", "input.mp4").result(5)
+    assert states == ["validating", "committing"]
@@ -0,0 +1,177 @@
+import time
+import threading
+from unittest.mock import patch, MagicMock
+from app.pipeline.predictor import Predictor, Estimate
+from app.pipeline.scheduler import Job, JobScheduler
+
+MB = 1024 * 1024
+INFO = {"format": {"duration": "600.0"},
+        "streams": [{"codec_type": "video", "height": 1080, "avg_frame_rate": "30/1"}]}
+
+def make_input(tmp_path, size=100 * MB):
+    video = tmp_path / "lecture.mp4"
+    with open(video, 'wb') as f:
+        f.truncate(size)
+    return str(video)
+
+def fake_pipeline(sample=(10.0, 2.0, 1 * MB)):
+    pipeline = MagicMock()
+    pipeline.compressor.codec, pipeline.compressor.preset = "hevc_nvenc", "p5"
+    pipeline.max_height = pipeline.max_fps = None
+    pipeline.sample_encode.return_value = sample
+    return pipeline
+
+def test_estimate_from_history(tmp_path):
+    predictor = Predictor(str(tmp_path / "history.json"))
+    pipeline = fake_pipeline()
+    predictor.record("hevc_nvenc|1080|p5", fps=300.0, bytes_per_second=50000)
+
+    with patch('app.pipeline.predictor.probe_media', return_value=INFO):
+        estimate = predictor.estimate(make_input(tmp_path), pipeline, start=0, end=300)
+
+    assert estimate.source == "history"
+    assert estimate.output_bytes == 300 * 50000
+    assert estimate.seconds == 300 * 30 / 300.0
+    pipeline.sample_encode.assert_not_called()
+
+def test_unknown_profile_is_sampled_once_and_remembered(tmp_path):
+    history = str(tmp_path / "history.json")
+    pipeline = fake_pipeline(sample=(10.0, 2.0, 1 * MB))
+    with patch('app.pipeline.predictor.probe_media', return_value=INFO):
+        first = Predictor(history).estimate(make_input(tmp_path), pipeline)
+        second = Predictor(history).estimate(make_input(tmp_path), pipeline)
+
+    assert first.source == "sample" and second.source == "history"
+    assert pipeline.sample_encode.call_count == 1
+    # 10 s of 30 fps in 2 s -> 150 fps; 600 s * 30 fps / 150 fps
+    assert second.seconds == 120.0
+    assert second.output_bytes == 600 * MB // 10
+
+def test_fallback_assumes_a_second_copy(tmp_path):
+    predictor = Predictor(str(tmp_path / "history.json"))
+    with patch('app.pipeline.predictor.probe_media', return_value=INFO):
+        estimate = predictor.estimate(make_input(tmp_path, size=100 * MB))
+    assert estimate.source == "fallback" and estimate.seconds is None
+    assert estimate.output_bytes == 100 * MB
+
+class SlowPipeline:
+    def __init__(self, log, gates):
+        self.log, self.gates = log, gates
+        self.executor = MagicMock()
+
+    def submit_video(self, input_path, *args, **kwargs):
+        self.log.append(input_path)
+        gate = self.gates.get(input_path)
+        if gate:
+            assert gate.wait(5)
+        future = MagicMock()
+        future.exception.return_value = None
+        future.add_done_callback.side_effect = lambda cb: cb(future)
+        return future
+
+def test_scheduler_defers_until_space_is_freed(tmp_path):
+    log, gate = [], threading.Event()
+    predictor = Predictor(str(tmp_path / "history.json"))
+    scheduler = JobScheduler(max_workers=2, pipeline_factory=lambda: SlowPipeline(log, {"a.mp4": gate}),
+                             duration_probe=None, predictor=predictor)
+
+    with patch.object(Predictor, 'free_bytes', return_value=2000 * MB), \
+         patch('app.core.config.Config.DISK_RESERVE_BYTES', 0):
+        first = Job("a.mp4")
+        first.estimate = Estimate(1000 * MB, 60)
+        second = Job("b.mp4")
+        second.estimate = Estimate(1000 * MB, 60)
+        scheduler.submit(first)
+        scheduler.submit(second)
+
+        # 1200 MB reserved for the first job: the second does not fit yet
+        assert log == ["a.mp4"]
+        assert scheduler.eta() == 60.0
+        gate.set()
+        assert scheduler.wait_all(5)
+
+    assert log == ["a.mp4", "b.mp4"]
+    assert second.state == "done"
+
+def test_scheduler_refuses_job_that_can_never_fit(tmp_path):
+    predictor = Predictor(str(tmp_path / "history.json"))
+    scheduler = JobScheduler(max_workers=1, pipeline_factory=lambda: SlowPipeline([], {}),
+                             duration_probe=None, predictor=predictor)
+    with patch.object(Predictor, 'free_bytes', return_value=500 * MB):
+        job = Job("huge.mp4")
+        job.estimate = Estimate(4000 * MB, 600)
+        scheduler.submit(job)
+    assert job.state == "failed"
+    assert "Insufficient disk space" in job.error
+
+def test_preemption_respects_disk_admission(tmp_path):
+    from app.core.config import Config
+    log, gate = [], threading.Event()
+    predictor = Predictor(str(tmp_path / "history.json"))
+    pipelines = []
+    def factory():
+        pipelines.append(SlowPipeline(log, {"low.mp4": gate}))
+        return pipelines[-1]
+    scheduler = JobScheduler(max_workers=1, pipeline_factory=factory, duration_probe=None, predictor=predictor)
+
+    with patch.object(Predictor, 'free_bytes', return_value=2000 * MB), \
+         patch('app.core.config.Config.DISK_RESERVE_BYTES', 0):
+        low = Job("low.mp4", priority=Config.PRIORITY_LOW)
+        low.estimate = Estimate(1000 * MB, 60)
+        urgent = Job("urgent.mp4", priority=Config.PRIORITY_URGENT)
+        urgent.estimate = Estimate(1000 * MB, 60)
+        scheduler.submit(low)
+        scheduler.submit(urgent)
+
+        # The urgent job does not fit next to the running one: deferred, nothing paused
+        assert not pipelines[0].executor.pause.called
+        assert urgent.state == "queued" and "urgent.mp4" not in log
+        gate.set()
+        assert scheduler.wait_all(5)
+    assert log == ["low.mp4", "urgent.mp4"]
+
+def test_cancelling_a_deferred_job_starts_the_others(tmp_path):
+    log, gate = [], threading.Event()
+    predictor = Predictor(str(tmp_path / "history.json"))
+    scheduler = JobScheduler(max_workers=2, pipeline_factory=lambda: SlowPipeline(log, {"a.mp4": gate}),
+                             duration_probe=None, predictor=predictor)
+    free = [2000 * MB]
+    with patch.object(Predictor, 'free_bytes', side_effect=lambda path: free[0]), \
+         patch('app.core.config.Config.DISK_RESERVE_BYTES', 0):
+        jobs = [Job(name) for name in ("a.mp4", "b.mp4", "c.mp4")]
+        for job in jobs:
+            job.estimate = Estimate(1000 * MB, 60)
+            scheduler.submit(job)
+        assert jobs[1].state == jobs[2].state == "queued"
+
+        # Space was freed elsewhere: the cancellation alone must start the remaining job
+        free[0] = 4000 * MB
+        assert scheduler.cancel(jobs[2])
+        assert jobs[1].state in ("running", "validating", "done")
+        gate.set()
+        assert scheduler.wait_all(5)
+    assert jobs[1].state == "done" and jobs[2].error == "Cancelled"
+
+def test_concurrent_submits_sample_an_unknown_profile_once(tmp_path):
+    pipeline = fake_pipeline()
+    busy, overlapped = threading.Lock(), []
+    def sample(*args):
+        overlapped.append(not busy.acquire(blocking=False))
+        time.sleep(0.05)
+        busy.release()
+        return (10.0, 2.0, 1 * MB)
+    pipeline.sample_encode.side_effect = sample
+
+    scheduler = JobScheduler(max_workers=1, pipeline_factory=lambda: pipeline, preempt=False,
+                             duration_probe=None, predictor=Predictor(str(tmp_path / "history.json")))
+    scheduler.max_workers = 0   # Queue only: this is about the submit path
+    with patch('app.pipeline.predictor.probe_media', return_value=INFO), \
+         patch('app.pipeline.predictor.os.path.getsize', return_value=100 * MB):
+        threads = [threading.Thread(target=scheduler.submit, args=(Job(f"{n}.mp4"),)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+    # The shared estimate pipeline is never used by two submits at once; the first sample serves all
+    assert overlapped == [False]
+    assert [job.estimate.source for job in scheduler.pending].count("sample") == 1
@@ -0,0 +1,90 @@
+import os
+import time
+from app.core.prefetch import PrefetchCache
+
+def make_inputs(tmp_path, sizes):
+    src = tmp_path / "nas"
+    src.mkdir()
+    paths = []
+    for i, size in enumerate(sizes):
+        path = src / f"video{i}.mp4"
+        path.write_bytes(os.urandom(size))
+        paths.append(str(path))
+    return paths
+
+def wait_cached(cache, count, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with cache._lock:
+            if len(cache._entries) >= count and all(e.ready.is_set() for e in cache._entries.values()):
+                return True
+        time.sleep(0.01)
+    return False
+
+def test_fetch_returns_local_copy_with_srt(tmp_path):
+    paths = make_inputs(tmp_path, [1000])
+    srt = tmp_path / "nas" / "video0.srt"
+    srt.write_text("1\n00:00:01,000 --> 00:00:02,000\nhello\n")
+    cache = PrefetchCache(cache_dir=str(tmp_path / "cache"), max_bytes=10_000, lookahead=2)
+
+    cache.schedule(paths)
+    assert wait_cached(cache, 2)
+
+    local = cache.fetch(paths[0])
+    assert local != paths[0]
+    assert local.startswith(str(tmp_path / "cache"))
+    assert open(local, 'rb').read() == open(paths[0], 'rb').read()
+    assert cache.fetch(str(srt)).endswith(".srt")
+
+def test_unknown_file_reads_in_place(tmp_path):
+    paths = make_inputs(tmp_path, [100])
+    cache = PrefetchCache(cache_dir=str(tmp_path / "cache"), max_bytes=10_000)
+    assert cache.fetch(paths[0]) == paths[0]
+
+def test_lru_eviction_respects_byte_limit(tmp_path):
+    paths = make_inputs(tmp_path, [400, 400, 400])
+    cache = PrefetchCache(cache_dir=str(tmp_path / "cache"), max_bytes=1000, lookahead=3)
+
+    cache.schedule(paths[:2])
+    assert wait_cached(cache, 2)
+    # Touch video0 so video1 becomes least recently used
+    cache.fetch(paths[0])
+    cache.release(paths[0])
+
+    cache.schedule(paths[2:])
+    deadline = time.time() + 5
+    while paths[2] not in cache._entries and time.time() < deadline:
+        time.sleep(0.01)
+    assert wait_cached(cache, 2)
+
+    assert cache.used_bytes <= 1000
+    assert paths[1] not in cache._entries
+    assert paths[0] in cache._entries
+
+def test_pinned_entries_are_not_evicted(tmp_path):
+    paths = make_inputs(tmp_path, [600, 600])
+    cache = PrefetchCache(cache_dir=str(tmp_path / "cache"), max_bytes=1000, lookahead=2)
+
+    cache.schedule(paths[:1])
+    assert wait_cached(cache, 1)
+    local = cache.fetch(paths[0])       # pinned by the running encode
+    cache.schedule(paths[1:])
+    time.sleep(0.2)
+    assert os.path.exists(local)
+    assert paths[1] not in cache._entries
+
+    # Job done: the original was replaced, so its copy is discarded and room is made
+    cache.release(paths[0], discard=True)
+    assert wait_cached(cache, 1)
+    assert paths[1] in cache._entries
+    assert not os.path.exists(local)
+
+def test_stale_copy_is_ignored(tmp_path):
+    paths = make_inputs(tmp_path, [100])
+    cache = PrefetchCache(cache_dir=str(tmp_path / "cache"), max_bytes=10_000)
+    cache.schedule(paths)
+    assert wait_cached(cache, 1)
+
+    with open(paths[0], 'ab') as f:
+        f.write(b"changed")
+    assert cache.fetch(paths[0]) == paths[0]
@@ -0,0 +1,85 @@
+from unittest.mock import patch, AsyncMock
+from app.pipeline.pipeline import VideoPipeline
+
+SRT = """1
+00:00:10,000 --> 00:00:12,000
+short
+
+2
+00:05:00,000 --> 00:05:03,000
+a much longer cue that stresses the subtitle renderer
+"""
+
+def test_preview_windows(tmp_path):
+    srt = tmp_path / "lecture.srt"
+    srt.write_text(SRT, encoding='utf-8')
+    pipeline = VideoPipeline()
+
+    with patch('app.pipeline.pipeline.get_duration', return_value=7200.0), \
+         patch('app.pipeline.pipeline.find_srt_file', return_value=str(srt)), \
+         patch('app.core.ffmpeg.FFmpegExecutor.run_async', new_callable=AsyncMock) as mock_run:
+        outputs = pipeline.preview(str(tmp_path / "lecture.mp4"), scratch_dir=str(tmp_path / "scratch"))
+
+    assert [o.rsplit('_', 1)[-1] for o in outputs] == ["start.mp4", "middle.mp4", "end.mp4", "subtitle.mp4"]
+    assert mock_run.call_count == 4
+
+    seeks = sorted(float(c.args[0][c.args[0].index('-ss') + 1]) for c in mock_run.call_args_list)
+    assert seeks == [0.0, 300.0, 3598.5, 7197.0]
+
+    args = mock_run.call_args_list[0].args[0]
+    # Fast input seeking; the start window holds no cue, so no subtitle filter
+    assert args.index('-ss') < args.index('-i')
+    assert '-filter_complex' not in args
+    assert '-copyts' not in args
+
+    # The subtitle window renders its cue sliced and rebased to the window start
+    args = mock_run.call_args_list[3].args[0]
+    assert "subtitles=" in args[args.index('-filter_complex') + 1]
+    # Same codec, fast preset
+    assert args[args.index('-c:v') + 1] == pipeline.compressor.codec
+    assert args[args.index('-preset') + 1] == 'p1'
+
+def test_preview_short_video_deduplicates(tmp_path):
+    pipeline = VideoPipeline()
+    with patch('app.pipeline.pipeline.get_duration', return_value=2.0), \
+         patch('app.pipeline.pipeline.find_srt_file', return_value=None), \
+         patch('app.core.ffmpeg.FFmpegExecutor.run_async', new_callable=AsyncMock) as mock_run:
+        outputs = pipeline.preview(str(tmp_path / "clip.mp4"), scratch_dir=str(tmp_path))
+    assert len(outputs) == 1
+    assert mock_run.call_count == 1
+
+def test_preview_windows_start_on_keyframes(tmp_path):
+    from array import array
+    from app.core import media_index
+    from app.core.media_index import MediaIndex
+    pipeline = VideoPipeline()
+    index = MediaIndex(array('d', [0.0, 58.0, 118.0]), array('q', [0, 1, 2]))
+    with patch('app.pipeline.pipeline.get_duration', return_value=120.0), \
+         patch('app.pipeline.pipeline.find_srt_file', return_value=None), \
+         patch.object(media_index, 'cached_index', return_value=index), \
+         patch('app.core.ffmpeg.FFmpegExecutor.run_async', new_callable=AsyncMock) as mock_run:
+        pipeline.preview(str(tmp_path / "clip.mp4"), scratch_dir=str(tmp_path))
+
+    seeks = sorted(float(c.args[0][c.args[0].index('-ss') + 1]) for c in mock_run.call_args_list)
+    # Middle (58.5) snaps back to 58; end (117) is too far past 58 and keeps its position
+    assert seeks == [0.0, 58.0, 117.0]
+
+def test_preview_never_waits_for_an_index_scan(tmp_path):
+    from app.core import media_index
+    from app.core.config import Config
+    video = tmp_path / "clip.mp4"
+    video.write_bytes(b"video")
+    pipeline = VideoPipeline()
+    with patch('app.pipeline.pipeline.get_duration', return_value=120.0), \
+         patch('app.pipeline.pipeline.find_srt_file', return_value=None), \
+         patch.object(Config, 'INDEX_SCENES', True), \
+         patch.object(media_index, 'cached_index', return_value=None), \
+         patch.object(media_index, 'get_index', side_effect=AssertionError("scanned inline")), \
+         patch.object(media_index, 'build_in_background') as mock_build, \
+         patch('app.core.ffmpeg.FFmpegExecutor.run_async', new_callable=AsyncMock) as mock_run:
+        pipeline.preview(str(video), scratch_dir=str(tmp_path))
+
+    # Timestamp seeks this time; the index (with scene scores) is built for the next call
+    seeks = sorted(float(c.args[0][c.args[0].index('-ss') + 1]) for c in mock_run.call_args_list)
+    assert seeks == [0.0, 58.5, 117.0]
+    mock_build.assert_called_once_with(str(video), scenes=True)
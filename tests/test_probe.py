@@ -0,0 +1,35 @@
+import json
+from unittest.mock import patch, MagicMock
+from app.core import probe
+from app.core.config import Config
+
+PROBE_OUTPUT = {
+    "format": {"duration": "125.400000"},
+    "streams": [
+        {"codec_type": "video", "width": 1920, "height": 1080, "disposition": {"attached_pic": 0}},
+        {"codec_type": "audio", "codec_name": "aac", "channels": 2},
+    ]
+}
+
+def test_probe_is_cached_on_disk(tmp_path):
+    video = tmp_path / "movie.mp4"
+    video.write_text("video content")
+
+    result = MagicMock(returncode=0, stdout=json.dumps(PROBE_OUTPUT), stderr="")
+    with patch.object(Config, 'PROBE_CACHE_DIR', str(tmp_path / "cache")), \
+         patch('subprocess.run', return_value=result) as mock_run:
+        assert probe.get_duration(str(video)) == 125.4
+        probe._memory_cache.clear()
+        # Second lookup is served from the on-disk cache
+        info = probe.probe_media(str(video))
+        assert mock_run.call_count == 1
+
+    assert probe.get_video_stream(info)["height"] == 1080
+    assert probe.get_audio_streams(info)[0]["codec_name"] == "aac"
+
+def test_signature_changes_when_file_changes(tmp_path):
+    video = tmp_path / "movie.mp4"
+    video.write_text("original")
+    before = probe.file_signature(str(video))
+    video.write_text("processed content")
+    assert probe.file_signature(str(video)) != before
@@ -0,0 +1,92 @@
+import os
+import time
+from unittest.mock import patch
+from app.core import retention
+from app.core.config import Config
+from app.core.retention import RetentionPolicy, clone_file
+from app.pipeline.pipeline import VideoPipeline
+
+def test_clone_survives_replace_by_rename(tmp_path):
+    original = tmp_path / "lecture.mp4"
+    original.write_bytes(b"original")
+    backup = tmp_path / "backup.mp4"
+    # ext4 has no FICLONE: falls back to a hard link; btrfs/XFS clone
+    assert clone_file(str(original), str(backup)) in ("reflink", "hardlink")
+
+    encoded = tmp_path / "lecture.processing.mp4"
+    encoded.write_bytes(b"encoded")
+    os.replace(encoded, original)
+    assert backup.read_bytes() == b"original"
+
+def test_clone_falls_back_to_copy(tmp_path):
+    original = tmp_path / "lecture.mp4"
+    original.write_bytes(b"original")
+    with patch.object(retention, 'reflink', return_value=False), \
+         patch.object(retention.os, 'link', side_effect=OSError("cross-device link")):
+        assert clone_file(str(original), str(tmp_path / "copy.mp4")) == "copy"
+    assert (tmp_path / "copy.mp4").read_bytes() == b"original"
+
+def test_prune_by_age_and_size_keeps_newest(tmp_path):
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    policy = RetentionPolicy(str(tmp_path / "originals"), max_age_days=None, max_bytes=None)
+    paths = []
+    for name in ("a.mp4", "b.mp4", "c.mp4"):
+        video = videos / name
+        video.write_bytes(b"x" * 100)
+        paths.append(policy.preserve(str(video)))
+    assert [b.path for b in policy.backups()] == paths
+    assert paths[0].startswith(os.path.join(policy.root, str(videos).lstrip("/"), "a.mp4"))
+
+    policy.max_bytes = 250
+    assert [b.path for b in policy.prune()] == [paths[0]]
+    assert not os.path.exists(os.path.dirname(paths[0]))     # Empty parents are removed too
+
+    policy.max_age_days = 30
+    assert [b.path for b in policy.prune(now=time.time() + 31 * 86400)] == [paths[1]]
+    assert [b.path for b in policy.backups()] == [paths[2]]
+
+def test_commits_do_not_walk_the_tree(tmp_path):
+    videos = tmp_path / "videos"
+    videos.mkdir()
+    policy = RetentionPolicy(str(tmp_path / "originals"), max_age_days=None, max_bytes=250)
+    first = videos / "a.mp4"
+    first.write_bytes(b"x" * 100)
+    policy.preserve(str(first))
+    assert policy.prune() == []             # The first prune walks the tree once
+
+    with patch.object(retention.os, 'walk', side_effect=AssertionError("walked the tree")):
+        paths = []
+        for name in ("b.mp4", "c.mp4"):
+            video = videos / name
+            video.write_bytes(b"x" * 100)
+            paths.append(policy.preserve(str(video)))
+            policy.prune()
+        assert [b.path for b in policy.backups()] == paths
+        assert [b.size for b in policy.backups()] == [100, 100]
+
+    # Backups made elsewhere show up with the next walk
+    other = RetentionPolicy(policy.root, max_age_days=None, max_bytes=None)
+    elsewhere = other.preserve(str(first))
+    assert elsewhere not in [b.path for b in policy.backups()]
+    with patch.object(Config, 'RETENTION_RESCAN_INTERVAL', 0):
+        assert elsewhere in [b.path for b in policy.backups()]
+
+def test_pipeline_backs_up_original_and_srt(tmp_path, mock_ffmpeg):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"original")
+    srt = tmp_path / "lecture_ar.srt"
+    srt.write_text("1\n00:00:01,000 --> 00:00:02,000\nمرحبا\n", encoding='utf-8')
+    mock_ffmpeg.side_effect = lambda cmd, callback=None, **kwargs: open(cmd[-1], 'wb').write(b"encoded") and True
+
+    pipeline = VideoPipeline()
+    pipeline.retention = RetentionPolicy(str(tmp_path / "originals"), max_age_days=None, max_bytes=None)
+    with patch.object(VideoPipeline, '_probe_duration', return_value=60.0), \
+         patch('app.core.utils.validate_output_video', return_value=True), \
+         patch('app.core.utils.wait_for_file_release', return_value=True):
+        pipeline.process_video(str(video), str(video))
+
+    assert video.read_bytes() == b"encoded" and not srt.exists()
+    [backup] = pipeline.retention.backups()
+    assert sorted(os.listdir(backup.path)) == ["lecture.mp4", "lecture_ar.srt"]
+    assert open(os.path.join(backup.path, "lecture.mp4"), 'rb').read() == b"original"
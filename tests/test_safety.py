@@ -22,7 +22,7 @@ def test_pipeline_success_replacement_and_cleanup(tmp_path, mock_ffmpeg):
          patch('app.core.utils.wait_for_file_release', return_value=True):
         
         # We also need to mock the pass actually creating the temp file
-        def side_effect(cmd, callback=None):
+        def side_effect(cmd, callback=None, **kwargs):
             output_file = cmd[-1]
             Path(output_file).write_text("processed content")
             
@@ -69,7 +69,7 @@ def test_pipeline_validation_failure_preservation(tmp_path, mock_ffmpeg):
     pipeline = VideoPipeline()
     
     # Mock pass creating a tiny/invalid file
-    def side_effect(cmd, callback=None):
+    def side_effect(cmd, callback=None, **kwargs):
         output_file = cmd[-1]
         Path(output_file).write_text("tiny")
         
@@ -0,0 +1,242 @@
+import time
+import threading
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+from app.pipeline.scheduler import Job, JobScheduler
+
+class FakePipeline:
+    """Pipeline stand-in whose process_video blocks until released."""
+    def __init__(self, log, gates):
+        self.log = log
+        self.gates = gates
+        self.executor = MagicMock()
+        self.executor.pause.return_value = True
+
+    def process_video(self, input_path, output_path, logo_path=None, progress_callback=None,
+                      start=None, end=None):
+        self.log.append(input_path)
+        gate = self.gates.get(input_path)
+        if gate:
+            assert gate.wait(5)
+
+    def submit_video(self, *args, **kwargs):
+        self.process_video(*args, **kwargs)
+        future = Future()
+        future.set_result(None)
+        return future
+
+def make_scheduler(durations, max_workers=1, gates=None, preempt=True):
+    log, pipelines = [], []
+    gates = gates or {}
+    def factory():
+        pipelines.append(FakePipeline(log, gates))
+        return pipelines[-1]
+    scheduler = JobScheduler(max_workers=max_workers, pipeline_factory=factory,
+                             preempt=preempt, duration_probe=durations.get)
+    return scheduler, log, pipelines
+
+def test_priority_then_shortest_job_first():
+    gate = threading.Event()
+    durations = {"blocker.mp4": 1, "lecture.mp4": 10800, "clip.mp4": 300, "urgent.mp4": 7200}
+    scheduler, log, _ = make_scheduler(durations, gates={"blocker.mp4": gate}, preempt=False)
+
+    scheduler.submit(Job("blocker.mp4"))
+    scheduler.submit(Job("lecture.mp4"))
+    scheduler.submit(Job("clip.mp4"))
+    scheduler.submit(Job("urgent.mp4", priority=0))
+
+    assert [j.input_path for j in scheduler.pending] == ["urgent.mp4", "clip.mp4", "lecture.mp4"]
+    gate.set()
+    assert scheduler.wait_all(5)
+    assert log == ["blocker.mp4", "urgent.mp4", "clip.mp4", "lecture.mp4"]
+
+def test_urgent_job_preempts_and_resumes():
+    lecture_gate, urgent_gate = threading.Event(), threading.Event()
+    gates = {"lecture.mp4": lecture_gate, "urgent.mp4": urgent_gate}
+    scheduler, log, pipelines = make_scheduler({}, gates=gates)
+
+    lecture = scheduler.submit(Job("lecture.mp4", priority=20))
+    urgent = scheduler.submit(Job("urgent.mp4", priority=0))
+
+    # The lecture was suspended to give the urgent clip its slot
+    assert lecture.state == "paused"
+    assert urgent.state == "running"
+    pipelines[0].executor.pause.assert_called_once()
+
+    urgent_gate.set()
+    assert urgent.wait(5)
+    # The slot came back: the lecture continues where it stopped
+    pipelines[0].executor.resume.assert_called_once()
+    assert lecture.state == "running"
+
+    lecture_gate.set()
+    assert scheduler.wait_all(5)
+    assert lecture.state == "done" and urgent.state == "done"
+
+def test_no_preemption_when_pause_unsupported():
+    gate = threading.Event()
+    scheduler, log, pipelines = make_scheduler({}, gates={"lecture.mp4": gate})
+
+    lecture = scheduler.submit(Job("lecture.mp4", priority=20))
+    pipelines[0].executor.pause.return_value = False
+    urgent = scheduler.submit(Job("urgent.mp4", priority=0))
+
+    assert lecture.state == "running"
+    assert urgent.state == "queued"
+    gate.set()
+    assert scheduler.wait_all(5)
+    assert log == ["lecture.mp4", "urgent.mp4"]
+
+def test_failed_job_frees_slot():
+    scheduler, log, pipelines = make_scheduler({})
+    job = Job("broken.mp4")
+    original_factory = scheduler.pipeline_factory
+    def failing_factory():
+        pipeline = original_factory()
+        pipeline.submit_video = MagicMock(side_effect=RuntimeError("NVENC Error"))
+        return pipeline
+    scheduler.pipeline_factory = failing_factory
+
+    scheduler.submit(job)
+    assert scheduler.wait_all(5)
+    assert job.state == "failed"
+    assert "NVENC Error" in job.error
+
+def test_validation_does_not_hold_the_slot():
+    validation = Future()
+    scheduler, log, pipelines = make_scheduler({})
+    original_factory = scheduler.pipeline_factory
+    def factory():
+        pipeline = original_factory()
+        if not pipelines[:-1]:
+            # First job: encode finishes, validation stays pending
+            pipeline.submit_video = lambda *a, **k: (log.append(a[0]), validation)[1]
+        return pipeline
+    scheduler.pipeline_factory = factory
+
+    first = scheduler.submit(Job("first.mp4"))
+    second = scheduler.submit(Job("second.mp4"))
+    assert second.wait(5)
+    assert first.state == "validating"
+
+    validation.set_exception(RuntimeError("duration mismatch"))
+    assert scheduler.wait_all(5)
+    assert first.state == "failed" and "duration mismatch" in first.error
+    assert log == ["first.mp4", "second.mp4"]
+
+def test_time_range_orders_by_kept_length():
+    """A short excerpt of a long recording is a short job."""
+    gate = threading.Event()
+    durations = {"blocker.mp4": 1, "lecture.mp4": 10800, "clip.mp4": 300}
+    scheduler, log, _ = make_scheduler(durations, gates={"blocker.mp4": gate}, preempt=False)
+
+    scheduler.submit(Job("blocker.mp4"))
+    excerpt = scheduler.submit(Job("lecture.mp4", start=3600, end=3660))
+    scheduler.submit(Job("clip.mp4"))
+    assert excerpt.duration == 60
+    gate.set()
+    assert scheduler.wait_all(5)
+    assert log == ["blocker.mp4", "lecture.mp4", "clip.mp4"]
+
+def test_store_records_states_and_restores_queue(tmp_path):
+    from app.core.jobstore import JobStore
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    leftover = store.add("left.mp4")
+
+    log = []
+    scheduler = JobScheduler(max_workers=1, pipeline_factory=lambda: FakePipeline(log, {}),
+                             duration_probe=None, store=store)
+    job = scheduler.submit(Job("new.mp4"))
+    assert scheduler.wait_all(5)
+    assert store.get(job.store_id)['state'] == "done"
+
+    restored = scheduler.restore()
+    assert [j.store_id for j in restored] == [leftover]
+    assert scheduler.wait_all(5)
+    assert store.counts() == {"done": 2}
+
+def test_restore_reuses_stored_measurements(tmp_path):
+    import os
+    from app.core.jobstore import JobStore
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    stored = store.add("long.mp4")
+    store.annotate(stored, 3600.0)
+    legacy = store.add("short.mp4")     # Queued before durations were stored
+
+    probe = MagicMock(side_effect={os.path.abspath("short.mp4"): 60.0}.get)
+    log = []
+    scheduler = JobScheduler(max_workers=1, pipeline_factory=lambda: FakePipeline(log, {}),
+                             duration_probe=probe, store=store)
+    jobs = {job.store_id: job for job in scheduler.restore()}
+    # Nothing is probed while restoring: the stored duration is used as it is
+    assert jobs[stored].duration == 3600.0
+    assert scheduler.wait_all(5)
+    # The legacy row is probed once, when it is dispatched, and its duration stored
+    probe.assert_called_once_with(os.path.abspath("short.mp4"))
+    assert jobs[legacy].duration == 60.0 and store.get(legacy)['duration'] == 60.0
+
+def test_stalled_job_is_requeued_then_failed(tmp_path):
+    from app.core.config import Config
+    from app.core.ffmpeg import FFmpegStallError
+    from app.core.jobstore import JobStore
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    scheduler, log, pipelines = make_scheduler({})
+    scheduler.store = store
+    original_submit = FakePipeline.submit_video
+    def submit(pipeline, input_path, *args, **kwargs):
+        if input_path == "hung.mp4":
+            log.append(input_path)
+            raise FFmpegStallError("FFmpeg made no progress for 120s and was killed:\nframe=50")
+        return original_submit(pipeline, input_path, *args, **kwargs)
+
+    with patch.object(FakePipeline, 'submit_video', submit):
+        hung = scheduler.submit(Job("hung.mp4"))
+        other = scheduler.submit(Job("other.mp4"))
+        assert scheduler.wait_all(5)
+    # The other job was not held up; the hung one was retried until it ran out of attempts
+    assert other.state == "done"
+    assert hung.state == "failed" and hung.error == "FFmpeg made no progress for 120s and was killed:"
+    assert log.count("hung.mp4") == hung.attempts == Config.JOB_MAX_ATTEMPTS
+    assert store.get(hung.store_id)['attempts'] == Config.JOB_MAX_ATTEMPTS
+
+def test_cancel_during_validation_stops_the_commit():
+    scheduler, log, pipelines = make_scheduler({}, max_workers=2)
+    gates = {name: threading.Event() for name in ("a.mp4", "b.mp4")}
+    committing, replaced = threading.Event(), threading.Event()
+
+    def submit(pipeline, input_path, *args, **kwargs):
+        future = Future()
+        def finalize():
+            # Validation, then the commit hook right before the original is replaced
+            gates[input_path].wait(5)
+            try:
+                pipeline.commit_callback(input_path)
+            except Exception as e:
+                return future.set_exception(e)
+            committing.set()
+            replaced.wait(5)
+            future.set_result(None)
+        threading.Thread(target=finalize, daemon=True).start()
+        return future
+
+    with patch.object(FakePipeline, 'submit_video', submit):
+        cancelled = scheduler.submit(Job("a.mp4"))
+        committed = scheduler.submit(Job("b.mp4"))
+        for _ in range(500):
+            if cancelled.state == committed.state == "validating":
+                break
+            time.sleep(0.01)
+
+        # Between FFmpeg runs there is nothing to kill, but the commit must not happen
+        assert scheduler.cancel(cancelled)
+        assert pipelines[0].executor.cancel.called
+        gates["a.mp4"].set()
+
+        gates["b.mp4"].set()
+        assert committing.wait(5)
+        assert not scheduler.cancel(committed)   # The original is being replaced
+        replaced.set()
+        assert scheduler.wait_all(5)
+
+    assert cancelled.state == "failed" and cancelled.error == "Cancelled"
+    assert committed.state == "done"
@@ -0,0 +1,181 @@
+import json
+import asyncio
+import threading
+import http.client
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+import pytest
+from app.core.config import Config
+from app.pipeline.scheduler import JobScheduler
+import logging
+from app.service.server import JobService, EventHub, _LogForwarder
+
+class FakePipeline:
+    """Reports 50% and blocks until its input's gate is released."""
+    def __init__(self, gates):
+        self.gates = gates
+        self.executor = MagicMock()
+        self.executor.last_report = None
+
+    def submit_video(self, input_path, output_path, logo_path=None, progress_callback=None, start=None, end=None):
+        progress_callback(50.0)
+        gate = self.gates.get(input_path)
+        if gate:
+            assert gate.wait(5)
+        future = Future()
+        future.set_result(None)
+        return future
+
+@pytest.fixture
+def service(tmp_path):
+    gates = {}
+    scheduler = JobScheduler(max_workers=1, pipeline_factory=lambda: FakePipeline(gates), duration_probe=None)
+    svc = JobService(scheduler, "127.0.0.1", 0)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(svc.start())
+        started.set()
+        loop.run_forever()
+
+    with patch.object(Config, 'SERVICE_PROGRESS_INTERVAL', 0.02):
+        threading.Thread(target=run, daemon=True).start()
+        assert started.wait(5)
+        yield svc, gates, tmp_path
+        asyncio.run_coroutine_threadsafe(svc.stop(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+
+def call(svc, method, path, payload=None):
+    conn = http.client.HTTPConnection("127.0.0.1", svc.port, timeout=5)
+    conn.request(method, path, body=json.dumps(payload) if payload is not None else None)
+    response = conn.getresponse()
+    body = json.loads(response.read() or b"{}")
+    conn.close()
+    return response.status, body
+
+def video(tmp_path, name):
+    path = tmp_path / name
+    path.write_bytes(b"video")
+    return str(path)
+
+def read_events(response, until):
+    events, event = [], None
+    while True:
+        line = response.readline().decode('utf-8')
+        if not line:
+            return events
+        if line.startswith("event: "):
+            event = line[7:].strip()
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[6:])))
+            if until(events[-1]):
+                return events
+
+def test_job_lifecycle_over_http_and_sse(service):
+    svc, gates, tmp_path = service
+    path = video(tmp_path, "lecture.mp4")
+    gates[path] = threading.Event()
+
+    status, job = call(svc, "POST", "/jobs", {"input": path, "profile": "lecture", "priority": "urgent"})
+    assert status == 202 and job['priority'] == Config.PRIORITY_URGENT and job['profile'] == "lecture"
+
+    conn = http.client.HTTPConnection("127.0.0.1", svc.port, timeout=5)
+    conn.request("GET", f"/jobs/{job['id']}/events")
+    stream = conn.getresponse()
+    assert stream.getheader("Content-Type") == "text/event-stream"
+    events = read_events(stream, lambda e: e[0] == "progress")
+    assert events[-1][1] == {'id': job['id'], 'percent': 50.0}
+
+    assert call(svc, "GET", f"/jobs/{job['id']}/result")[0] == 409
+    gates[path].set()
+    events += read_events(stream, lambda e: False)   # The stream ends with the job
+    assert events[-1][0] == "state" and events[-1][1]['state'] == "done"
+    conn.close()
+
+    status, result = call(svc, "GET", f"/jobs/{job['id']}/result")
+    assert status == 200 and result['state'] == "done" and result['size'] == 5
+    assert svc.scheduler.wait_all(5)
+
+def test_list_cancel_and_errors(service):
+    svc, gates, tmp_path = service
+    first, second = video(tmp_path, "a.mp4"), video(tmp_path, "b.mp4")
+    gates[first] = threading.Event()
+    _, running = call(svc, "POST", "/jobs", {"input": first})
+    _, queued = call(svc, "POST", "/jobs", {"input": second})
+
+    status, listing = call(svc, "GET", "/jobs?state=queued")
+    assert status == 200 and [j['id'] for j in listing['jobs']] == [queued['id']]
+    assert call(svc, "DELETE", f"/jobs/{queued['id']}") == (200, {'id': queued['id'], 'cancelled': True})
+    assert call(svc, "GET", f"/jobs/{queued['id']}")[1]['error'] == "Cancelled"
+    assert call(svc, "DELETE", f"/jobs/{queued['id']}")[0] == 409
+
+    assert call(svc, "GET", "/jobs/999")[0] == 404
+    assert call(svc, "POST", "/jobs", {"input": first, "profile": "8k"})[0] == 400
+    assert call(svc, "POST", "/jobs", {"input": str(tmp_path / "missing.mp4")})[0] == 400
+    assert call(svc, "PUT", "/jobs")[0] == 404
+    gates[first].set()
+    assert svc.scheduler.wait_all(5)
+
+def test_local_job_rejects_a_separate_output(service):
+    svc, gates, tmp_path = service
+    path = video(tmp_path, "lecture.mp4")
+    status, body = call(svc, "POST", "/jobs", {"input": path, "output": str(tmp_path / "copy.mp4")})
+    assert status == 400 and "replaced in place" in body['error']
+    assert call(svc, "GET", "/jobs")[1]['jobs'] == []
+    assert open(path, 'rb').read() == b"video" and not (tmp_path / "copy.mp4").exists()
+
+    # Naming the input itself is the in-place default; the result reports the committed path
+    _, job = call(svc, "POST", "/jobs", {"input": path, "output": path})
+    assert svc.scheduler.wait_all(5)
+    assert call(svc, "GET", f"/jobs/{job['id']}/result")[1]['output'] == path
+
+def test_hub_coalesces_progress_and_bounds_slow_clients():
+    async def scenario():
+        hub = EventHub(asyncio.get_running_loop(), interval=60)
+        watcher = hub.subscribe(job_id=1)
+        everything = hub.subscribe()
+        everything.queue = asyncio.Queue(maxsize=3)
+
+        for percent in range(100):
+            hub.progress(1, float(percent))
+        hub.progress(2, 10.0)
+        hub.flush()
+        assert watcher.queue.qsize() == 1
+        assert watcher.queue.get_nowait() == ("progress", {'id': 1, 'percent': 99.0})
+
+        for n in range(10):
+            hub.publish("log", {'id': None, 'message': str(n)})
+        await asyncio.sleep(0)
+        assert everything.queue.qsize() == 3 and everything.dropped == 9
+        assert everything.queue.get_nowait()[1]['message'] == "7"
+        # Job-specific subscribers do not receive other jobs' events
+        assert watcher.queue.empty()
+
+    asyncio.run(scenario())
+
+def test_log_forwarder_skips_ffmpeg_output_and_info():
+    async def scenario():
+        hub = EventHub(asyncio.get_running_loop(), interval=60)
+        everything = hub.subscribe()
+        handler = _LogForwarder(hub)
+        ffmpeg_logger = logging.getLogger("app.core.ffmpeg")
+        for logger_ in (ffmpeg_logger, logging.getLogger("app.pipeline.scheduler")):
+            logger_.addHandler(handler)
+        try:
+            for n in range(500):
+                ffmpeg_logger.info(f"FFmpeg Output: frame={n}")
+            logging.getLogger("app.pipeline.scheduler").info("Scheduler: starting")
+            ffmpeg_logger.error("FFmpeg failed with exit code 1")
+            logging.getLogger("app.pipeline.scheduler").warning("Scheduler: deferring job")
+        finally:
+            for logger_ in (ffmpeg_logger, logging.getLogger("app.pipeline.scheduler")):
+                logger_.removeHandler(handler)
+        await asyncio.sleep(0)
+        messages = []
+        while not everything.queue.empty():
+            messages.append(everything.queue.get_nowait()[1]['message'])
+        assert messages == ["FFmpeg failed with exit code 1", "Scheduler: deferring job"]
+
+    asyncio.run(scenario())
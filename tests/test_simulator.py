@@ -0,0 +1,53 @@
+import pytest
+from unittest.mock import patch
+from app.core.config import Config
+from app.core.ffmpeg import FFmpegExecutor, FFmpegTimeoutError
+from app.core.validation import check_output_structure
+from app.sim.fakemedia import write_media, read_media
+from app.sim import loadtest
+
+@pytest.fixture
+def simulator(monkeypatch):
+    monkeypatch.setenv('FAKE_FFMPEG_SPEED', "100")
+    monkeypatch.setenv('FAKE_FFMPEG_TICK', "0.01")
+    with patch.object(Config, 'FFMPEG_BIN', Config.FFMPEG_BIN), \
+         patch.object(Config, 'FFPROBE_BIN', Config.FFPROBE_BIN):
+        Config.use_simulator()
+        yield
+
+def test_progress_and_valid_output(simulator, tmp_path):
+    source = write_media(str(tmp_path / "in.mp4"), 10.0)
+    output = str(tmp_path / "in.processing.mp4")
+    progress = []
+    FFmpegExecutor().run(['-y', '-ss', '2', '-i', source, '-c:v', 'hevc_nvenc', output],
+                         callback=progress.append)
+
+    assert progress[-1] == 100.0 and len(progress) > 2
+    assert read_media(output)['duration'] == 8.0
+    assert read_media(output)['video_codec'] == 'hevc'
+    assert check_output_structure(output, expected_duration=8.0)
+
+def test_injected_failure_leaves_unreadable_output(simulator, tmp_path):
+    source = write_media(str(tmp_path / "in__fail__.mp4"), 10.0)
+    output = str(tmp_path / "out.mp4")
+    with pytest.raises(RuntimeError, match="Conversion failed"):
+        FFmpegExecutor().run(['-i', source, output])
+    assert not check_output_structure(output)
+
+def test_stall_is_terminated_with_q(simulator, tmp_path):
+    source = write_media(str(tmp_path / "in__stall__.mp4"), 10.0)
+    executor = FFmpegExecutor()
+    executor.GRACE_PERIOD = 2.0
+    with pytest.raises(FFmpegTimeoutError):
+        executor.run(['-i', source, str(tmp_path / "out.mp4")], timeout=0.5)
+    assert executor.process.returncode == 0
+
+def test_loadtest_scheduler_run(simulator, tmp_path):
+    paths = loadtest.make_batch(str(tmp_path / "batch"), 4, duration=5.0, fail_every=4)
+    with patch.object(Config, 'PROBE_CACHE_DIR', str(tmp_path / "probe")):
+        result = loadtest.run_scheduler(paths, workers=2, store_path=str(tmp_path / "jobs.sqlite3"))
+    assert result['jobs'] == 4 and result['failed'] == 1
+    assert result['store_counts'] == {'done': 3, 'failed': 1}
+    # Committed outputs replaced the inputs and the SRTs were consumed
+    assert read_media(paths[0])['video_codec'] == 'hevc'
+    assert not (tmp_path / "batch" / "video_000000.srt").exists()
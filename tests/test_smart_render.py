@@ -0,0 +1,101 @@
+import os
+from unittest.mock import patch
+import pytest
+from app.core.config import Config
+from app.pipeline import smart_render
+from app.pipeline.pipeline import VideoPipeline
+from app.pipeline.smart_render import plan_segments, concat_list
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0]
+
+def test_plan_widens_changes_to_gops_and_merges_neighbours():
+    plan = plan_segments(KEYFRAMES, 10.0, [(3.0, 3.5), (4.2, 4.8), (9.5, 12.0)])
+    assert plan.segments == [(0.0, 2.0, False), (2.0, 6.0, True), (6.0, 8.0, False), (8.0, 10.0, True)]
+    assert plan.reencode_seconds == 6.0
+
+    # A cue ending exactly on a keyframe leaves the next GOP alone
+    assert plan_segments(KEYFRAMES, 10.0, [(2.5, 4.0)]).segments == [
+        (0.0, 2.0, False), (2.0, 4.0, True), (4.0, 10.0, False)]
+    assert plan_segments(KEYFRAMES, 10.0, []).segments == [(0.0, 10.0, False)]
+
+def test_concat_list_points_copied_segments_into_previous_output():
+    segments = [(0.0, 2.0, False), (2.0, 4.0, True), (4.0, 10.0, False)]
+    script = concat_list(segments, "/videos/it's.mp4", {2.0: "/tmp/segment_0000.mp4"})
+    assert script.splitlines() == [
+        "ffconcat version 1.0",
+        "file '/videos/it'\\''s.mp4'", "inpoint 0.000000", "outpoint 2.000000",
+        "file '/tmp/segment_0000.mp4'",
+        "file '/videos/it'\\''s.mp4'", "inpoint 4.000000", "outpoint 10.000000",
+    ]
+
+def test_rerender_reencodes_only_dirty_gops(tmp_path, mock_ffmpeg):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"clean source")
+    old_srt = tmp_path / "lecture.srt"
+    old_srt.write_text("1\n00:00:01,000 --> 00:00:02,000\nok\n\n2\n00:00:05,000 --> 00:00:05,500\ntpyo\n",
+                       encoding='utf-8')
+
+    logo = tmp_path / "logo.png"
+    logo.write_bytes(b"png")
+    renderer = VideoPipeline()
+    renderer.content_mode = "lecture"
+
+    with patch.object(Config, 'SMART_RENDER_DIR', str(tmp_path / "sources")):
+        smart_render.keep_source(str(video), str(old_srt), renderer._render_settings(str(logo)))
+        rendered = tmp_path / "rendered.tmp"
+        rendered.write_bytes(b"rendered output")
+        os.replace(rendered, video)
+        old_srt.write_text("1\n00:00:01,000 --> 00:00:02,000\nok\n\n2\n00:00:05,000 --> 00:00:05,500\ntypo\n",
+                           encoding='utf-8')
+        source, kept_srt = smart_render.find_kept_source(str(video))
+        assert open(source, 'rb').read() == b"clean source"
+
+        scripts = []
+        def run(cmd, callback=None, **kwargs):
+            if '-f' in cmd:
+                scripts.append(open(cmd[cmd.index('-i') + 1], encoding='utf-8').read())
+            open(cmd[-1], 'wb').close()
+            return True
+        mock_ffmpeg.side_effect = run
+
+        with patch('app.pipeline.pipeline.get_duration', return_value=10.0), \
+             patch('app.core.probe.probe_keyframes', return_value=KEYFRAMES), \
+             patch('app.core.utils.validate_output_video', return_value=True), \
+             patch('app.core.utils.wait_for_file_release', return_value=True), \
+             patch('app.core.utils.safe_replace') as replace, \
+             patch('os.path.exists', side_effect=lambda p: not p.endswith('.processing.mp4') or True):
+            plan = VideoPipeline().rerender_subtitles(str(video))
+
+        assert plan.segments == [(0.0, 4.0, False), (4.0, 6.0, True), (6.0, 10.0, False)]
+        encode, splice = [call[0][0] for call in mock_ffmpeg.call_args_list]
+        # The dirty GOP is encoded from the clean source with the new cue, without audio
+        assert encode[encode.index('-ss') + 1] == '4.0' and encode[encode.index('-t') + 1] == '2.0'
+        assert encode[encode.index('-i') + 1] == source and encode[-2] == '-an'
+        assert "subtitles=" in encode[encode.index('-filter_complex') + 1]
+        # ...and with the logo and filters of the first render, not this pipeline's defaults
+        assert str(logo) in encode and "mpdecimate" in encode[encode.index('-filter_complex') + 1]
+        # Untouched GOPs and the audio are stream-copied from the rendered video
+        assert splice[splice.index('-c') + 1] == 'copy'
+        assert splice[splice.index('-i', splice.index('-i') + 1) + 1] == str(video)
+        assert "inpoint 6.000000" in scripts[0]
+        replace.assert_called_once()
+        # The new SRT becomes the reference for the next correction and is consumed
+        assert not old_srt.exists()
+        assert "typo" in open(smart_render.find_kept_source(str(video))[1], encoding='utf-8').read()
+
+def test_rerender_refuses_without_kept_settings(tmp_path):
+    video = tmp_path / "lecture.mp4"
+    video.write_bytes(b"clean source")
+    logo = tmp_path / "logo.png"
+    with patch.object(Config, 'SMART_RENDER_DIR', str(tmp_path / "sources")):
+        smart_render.keep_source(str(video))
+        with pytest.raises(RuntimeError, match="render settings"):
+            VideoPipeline().rerender_subtitles(str(video), str(tmp_path / "lecture.srt"))
+
+        smart_render.keep_source(str(video), settings=VideoPipeline()._render_settings(str(logo)))
+        with pytest.raises(RuntimeError, match="no longer exists"):
+            VideoPipeline().rerender_subtitles(str(video), str(tmp_path / "lecture.srt"))
+        logo.write_bytes(b"png")
+        with pytest.raises(RuntimeError, match="rendered with logo"):
+            VideoPipeline().rerender_subtitles(str(video), str(tmp_path / "lecture.srt"),
+                                               logo_path=str(tmp_path / "other.png"))
@@ -0,0 +1,64 @@
+from app.core.srt import parse_srt, write_srt, format_timestamp, SubtitleCue
+
+SAMPLE = """1
+00:00:01,000 --> 00:00:03,500
+مرحبا بكم
+
+2
+00:01:02,250 --> 00:01:04,000
+React هو إطار عمل
+شهير
+"""
+
+def test_parse_srt(tmp_path):
+    srt = tmp_path / "test.srt"
+    srt.write_text(SAMPLE, encoding='utf-8')
+
+    cues = parse_srt(str(srt))
+    assert len(cues) == 2
+    assert cues[0].start == 1.0 and cues[0].end == 3.5
+    assert cues[1].start == 62.25
+    assert cues[1].text == "React هو إطار عمل\nشهير"
+
+def test_write_srt_roundtrip(tmp_path):
+    cues = [SubtitleCue(0.5, 2.0, "first"), SubtitleCue(3661.001, 3662.0, "second")]
+    srt = tmp_path / "out.srt"
+    write_srt(cues, str(srt))
+
+    assert "01:01:01,001 --> 01:01:02,000" in srt.read_text(encoding='utf-8')
+    assert parse_srt(str(srt)) == cues
+
+def test_format_timestamp_clamps_negative():
+    assert format_timestamp(-1) == "00:00:00,000"
+
+def test_slice_cues_drops_clips_and_rebases():
+    from app.core.srt import slice_cues
+    cues = [
+        SubtitleCue(1.0, 4.0, "before"),
+        SubtitleCue(9.0, 12.0, "crosses start"),
+        SubtitleCue(20.0, 22.0, "inside"),
+        SubtitleCue(29.0, 33.0, "crosses end"),
+        SubtitleCue(40.0, 42.0, "after"),
+    ]
+    sliced = slice_cues(cues, 10.0, 30.0)
+
+    assert [c.text for c in sliced] == ["crosses start", "inside", "crosses end"]
+    assert (sliced[0].start, sliced[0].end) == (0.0, 2.0)
+    assert (sliced[1].start, sliced[1].end) == (10.0, 12.0)
+    assert (sliced[2].start, sliced[2].end) == (19.0, 20.0)
+
+def test_changed_ranges_covers_edits_moves_and_deletions():
+    from app.core.srt import changed_ranges
+    old = [
+        SubtitleCue(1.0, 2.0, "same"),
+        SubtitleCue(5.0, 6.0, "typo"),
+        SubtitleCue(10.0, 11.0, "moved"),
+        SubtitleCue(20.0, 21.0, "deleted"),
+    ]
+    new = [
+        SubtitleCue(1.0, 2.0, "same"),
+        SubtitleCue(5.0, 6.0, "fixed"),
+        SubtitleCue(10.5, 11.5, "moved"),
+    ]
+    assert changed_ranges(old, new) == [(5.0, 6.0), (10.0, 11.5), (20.0, 21.0)]
+    assert changed_ranges(old, list(old)) == []
@@ -22,3 +22,17 @@ def test_subtitle_filter_generation():
     assert "Outline=0.3" in result
     assert "Shadow=0.2" in result
     assert "PrimaryColour=&H00FFFFFF" in result
+
+def test_subtitle_mux_args_mp4():
+    processor = SubtitleProcessor()
+    args = processor.get_mux_args("/videos/lecture_en.srt", "/videos/lecture.mp4")
+
+    assert args[args.index('-c:s:0') + 1] == 'mov_text'
+    assert args[args.index('-metadata:s:s:0') + 1] == 'language=eng'
+
+def test_subtitle_mux_args_mkv_default_language():
+    processor = SubtitleProcessor()
+    args = processor.get_mux_args("/videos/lecture.srt", "/videos/lecture.mkv")
+
+    assert args[args.index('-c:s:0') + 1] == 'srt'
+    assert args[args.index('-metadata:s:s:0') + 1] == 'language=ara'
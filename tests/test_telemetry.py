@@ -0,0 +1,68 @@
+import sys
+import pytest
+from unittest.mock import patch
+from app.core import telemetry
+from app.core.telemetry import (ProcessTelemetry, BatchTelemetry, ResourceReport,
+                                read_process_stats, telemetry_supported)
+from app.core.ffmpeg import FFmpegExecutor
+
+def write_proc(root, pid, utime, stime, rss_kb, read_bytes, write_bytes, switches=(10, 2)):
+    base = root / str(pid)
+    base.mkdir(exist_ok=True)
+    # The command name contains a space and a ')' on purpose
+    fields = ["S"] + ["0"] * 10 + [str(utime), str(stime)] + ["0"] * 10
+    (base / "stat").write_text(f"{pid} (ff mpeg) x) " + " ".join(fields))
+    (base / "status").write_text(
+        f"Name:\tffmpeg\nVmRSS:\t{rss_kb} kB\n"
+        f"voluntary_ctxt_switches:\t{switches[0]}\nnonvoluntary_ctxt_switches:\t{switches[1]}\n"
+    )
+    (base / "io").write_text(f"rchar: 999999\nread_bytes: {read_bytes}\nwrite_bytes: {write_bytes}\n")
+
+def test_read_process_stats(tmp_path):
+    write_proc(tmp_path, 42, utime=250, stime=50, rss_kb=2048, read_bytes=4096, write_bytes=1024)
+    with patch.object(telemetry, 'PROC_ROOT', str(tmp_path)), patch.object(telemetry, '_CLOCK_TICKS', 100):
+        sample = read_process_stats(42)
+        assert read_process_stats(43) is None
+    assert sample.cpu_seconds == 3.0
+    assert sample.rss_bytes == 2048 * 1024
+    assert (sample.read_bytes, sample.write_bytes) == (4096, 1024)
+    assert (sample.voluntary_switches, sample.involuntary_switches) == (10, 2)
+
+def test_report_keeps_peak_and_counters_of_exiting_child(tmp_path):
+    with patch.object(telemetry, 'PROC_ROOT', str(tmp_path)), patch.object(telemetry, '_CLOCK_TICKS', 100):
+        tracker = ProcessTelemetry(7)
+        write_proc(tmp_path, 7, 100, 0, rss_kb=300 * 1024, read_bytes=10 * 1048576, write_bytes=0)
+        tracker.sample()
+        # Zombie: no RSS or io accounting any more, CPU time still readable
+        write_proc(tmp_path, 7, 400, 0, rss_kb=0, read_bytes=0, write_bytes=0)
+        tracker.sample()
+    report = tracker.report()
+    assert report.cpu_seconds == 4.0
+    assert report.peak_rss_bytes == 300 * 1048576
+    assert report.read_bytes == 10 * 1048576
+
+def test_batch_summary():
+    batch = BatchTelemetry()
+    batch._started, batch._finished = 100.0, 110.0
+    batch.reports = [
+        ResourceReport(10.0, 30.0, 500 * 1048576, 50 * 1048576, 50 * 1048576, 100, 5),
+        ResourceReport(10.0, 10.0, 200 * 1048576, 0, 0, 50, 1),
+    ]
+    summary = batch.summary()
+    assert summary['cores_used'] == 4.0
+    assert summary['disk_mb_per_sec'] == 10.0
+    assert summary['peak_rss_mb'] == 500.0
+    assert summary['involuntary_switches'] == 6
+
+@pytest.mark.skipif(not telemetry_supported(), reason="needs /proc")
+def test_executor_attaches_report():
+    executor = FFmpegExecutor(executable_path=sys.executable)
+    executor.telemetry_interval = 0.05
+    executor.batch_telemetry = BatchTelemetry()
+    script = "import time\nend = time.time() + 0.3\nwhile time.time() < end: pass\n"
+    executor.run(['-c', script])
+
+    report = executor.last_report
+    assert report.cpu_seconds > 0
+    assert report.peak_rss_bytes > 0
+    assert executor.batch_telemetry.summary()['runs'] == 1
@@ -0,0 +1,39 @@
+from unittest.mock import patch
+from app.core.threads import ThreadBudget
+from app.core.config import Config
+from app.pipeline.compressor import Compressor
+from app.pipeline.pipeline import VideoPipeline
+
+def test_budget_splits_cores_between_jobs():
+    with patch('app.core.threads.available_cpus', return_value=list(range(16))):
+        budget = ThreadBudget.for_jobs(4, slot=2, pin=True)
+    assert budget.threads == 4
+    assert budget.cpus == [8, 9, 10, 11]
+    assert budget.frame_threads == 2
+
+def test_budget_never_below_one_thread():
+    with patch('app.core.threads.available_cpus', return_value=[0, 1]):
+        budget = ThreadBudget.for_jobs(8, pin=False)
+    assert budget.threads == 1
+    assert budget.cpus is None
+
+def test_configured_threads_override():
+    with patch.object(Config, 'THREADS_PER_JOB', 3):
+        assert ThreadBudget.for_jobs(1, pin=False).threads == 3
+
+def test_x265_thread_pools():
+    args = Compressor(codec='libx265').get_encoding_args(x265_params=ThreadBudget(6).x265_params())
+    assert args[args.index('-x265-params') + 1] == "pools=6:frame-threads=2"
+
+def test_pipeline_applies_budget(mock_ffmpeg):
+    pipeline = VideoPipeline()
+    pipeline.thread_budget = ThreadBudget(4)
+    pipeline._run_pass("input.mp4", "output.mp4")
+
+    call_args = mock_ffmpeg.call_args[0][0]
+    assert call_args[call_args.index('-filter_complex_threads') + 1] == '4'
+    # Decoder threads are an input option: before '-i'
+    assert call_args.index('-threads') < call_args.index('-i')
+    # Encoder threads are an output option
+    assert call_args.count('-threads') == 2
+    assert pipeline.executor.thread_budget is pipeline.thread_budget
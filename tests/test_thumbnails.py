@@ -0,0 +1,39 @@
+from unittest.mock import patch
+from app.pipeline.thumbnails import ThumbnailSpec
+from app.pipeline.pipeline import VideoPipeline
+
+def test_thumbnails_share_the_decode(tmp_path, mock_ffmpeg):
+    """Poster and sprites are split off the final stream of the same pass."""
+    pipeline = VideoPipeline()
+    thumbs = ThumbnailSpec(str(tmp_path), poster_time=12, sprite_interval=10)
+
+    with patch('app.pipeline.pipeline.get_duration', return_value=25.0):
+        pipeline._run_pass("input.mp4", "output.mp4", srt_path="test.srt", thumbnails=thumbs)
+
+    call_args = mock_ffmpeg.call_args[0][0]
+    assert call_args.count('-i') == 1
+    graph = call_args[call_args.index('-filter_complex') + 1]
+    # Subtitled stream is split three ways: encoder, poster, sprites
+    assert "split=3" in graph
+    assert "trim=start=12" in graph
+    assert "fps=1/10" in graph and "tile=10x10" in graph
+    assert str(tmp_path / "poster.jpg") in call_args
+    # The video stays the last output
+    assert call_args[-1] == "output.mp4"
+
+def test_vtt_index(tmp_path):
+    thumbs = ThumbnailSpec(str(tmp_path), sprite_interval=10, tile_width=160, tile_height=90,
+                           columns=2, rows=2)
+    vtt = (tmp_path / "thumbnails.vtt")
+    thumbs.write_vtt(45.0)
+
+    lines = vtt.read_text(encoding='utf-8').splitlines()
+    assert lines[0] == "WEBVTT"
+    assert "00:00:00.000 --> 00:00:10.000" in lines
+    assert "sprite_001.jpg#xywh=160,90,160,90" in lines   # 4th tile of the first sheet
+    assert "00:00:40.000 --> 00:00:45.000" in lines
+    assert "sprite_002.jpg#xywh=0,0,160,90" in lines      # 5th tile starts a new sheet
+
+def test_default_output_dir_next_to_video(tmp_path):
+    spec = ThumbnailSpec().for_video(str(tmp_path / "lecture.mp4"))
+    assert spec.output_dir == str(tmp_path / "lecture_thumbs")